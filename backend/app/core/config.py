@@ -29,6 +29,15 @@ class Settings(BaseSettings):
     # Ollama 配置
     ollama_api_base: str = "http://localhost:11434/v1"
     ollama_model: str = "qwen3:30b-a3b"
+    # 并发 LLM 请求上限（与 Ollama 服务端 OLLAMA_NUM_PARALLEL 保持一致）
+    ollama_num_parallel: int = 4
+
+    # 引用整合: 引用数不超过此值时跳过 LLM 整合，原样返回
+    # (默认 1 与材料级整合一致；设为 3 等可让小文档完全不走 LLM)
+    consolidation_skip_llm_max_quotes: int = 1
+
+    # 统一提取: 每分钟 LLM 请求上限（按 API 账户等级的 RPM 配置）
+    extraction_requests_per_minute: int = 500
 
     # Azure OpenAI (备选)
     azure_openai_api_key: str = ""
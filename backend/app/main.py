@@ -17,6 +17,7 @@ from app.routers.extraction import router as extraction_router
 from app.models.document import Document, OCRStatus
 from app.services import storage
 from app.services.model_preloader import preload_models_async, get_preload_state
+from app.services.llm_client import aclose_http_client
 
 
 def recover_interrupted_ocr():
@@ -89,6 +90,7 @@ async def lifespan(app: FastAPI):
 
     # 关闭时执行
     print("[Shutdown] Document Pipeline API shutting down...")
+    await aclose_http_client()
 
 
 # Create database tables
@@ -113,7 +113,9 @@ async def generate_arguments(
         result = await full_legal_pipeline(
             project_id=project_id,
             applicant_name=request.applicant_name or "the applicant",
-            provider=request.provider
+            provider=request.provider,
+            # 强制重新生成时跳过细分结果缓存
+            use_cache=not request.force_reanalyze
         )
 
         return GenerateResponse(
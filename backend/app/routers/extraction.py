@@ -10,7 +10,7 @@ Extraction Router - 统一提取 API
 这将替代旧的 analysis router 的提取功能。
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
@@ -20,7 +20,13 @@ from ..services.unified_extractor import (
     extract_all_unified,
     load_combined_extraction,
     load_exhibit_extraction,
-    get_extraction_status
+    get_extraction_status,
+    list_exhibit_ids,
+    start_batch_extraction,
+    submit_batch_extraction,
+    refresh_batch_extraction,
+    collect_batch_extraction,
+    EXTRACTION_BATCH_MIN_EXHIBITS
 )
 from ..services.entity_merger import (
     suggest_entity_merges,
@@ -40,6 +46,7 @@ router = APIRouter(prefix="/api/extraction", tags=["extraction"])
 class ExtractionRequest(BaseModel):
     applicant_name: str
     provider: str = "deepseek"  # LLM provider: "deepseek" or "openai"
+    use_batch_api: bool = False  # 整项目提取时使用 OpenAI Batch API（仅 openai，费用减半但需排队）
 
 
 class MergeConfirmation(BaseModel):
@@ -58,12 +65,15 @@ class ManualMergeRequest(BaseModel):
 @router.post("/{project_id}/extract")
 async def extract_project(
     project_id: str,
-    request: ExtractionRequest
+    request: ExtractionRequest,
+    background_tasks: BackgroundTasks
 ):
     """
     统一提取整个项目
 
-    一次性提取所有 exhibits 的 snippets + entities + relations
+    一次性提取所有 exhibits 的 snippets + entities + relations。
+    use_batch_api 且满足条件时只在后台提交 OpenAI Batch 并立即返回任务状态，
+    之后通过 GET /{project_id}/extract/batch 轮询，batch 结束后自动收取结果。
     """
     applicant_name = request.applicant_name
     provider = request.provider
@@ -71,6 +81,15 @@ async def extract_project(
     if not applicant_name:
         raise HTTPException(status_code=400, detail="applicant_name is required")
 
+    if (request.use_batch_api and provider == "openai"
+            and len(list_exhibit_ids(project_id)) >= EXTRACTION_BATCH_MIN_EXHIBITS):
+        try:
+            job = start_batch_extraction(project_id, applicant_name)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        background_tasks.add_task(submit_batch_extraction, project_id)
+        return {"success": True, "batch": True, "job": job}
+
     try:
         result = await extract_all_unified(
             project_id=project_id,
@@ -87,6 +106,26 @@ async def extract_project(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/{project_id}/extract/batch")
+async def get_batch_extraction(project_id: str, background_tasks: BackgroundTasks):
+    """
+    查询 OpenAI Batch 提取任务状态
+
+    每次调用查询一次 batch 状态；batch 结束后在后台收取结果并写出合并结果，
+    任务状态依次为 submitting -> submitted -> collecting -> completed（或 failed）。
+    """
+    try:
+        job, should_collect = await refresh_batch_extraction(project_id)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="No batch extraction found")
+    if should_collect:
+        background_tasks.add_task(collect_batch_extraction, project_id)
+    return job
+
+
 @router.post("/{project_id}/extract/{exhibit_id}")
 async def extract_exhibit(
     project_id: str,
@@ -124,7 +163,7 @@ async def get_project_extraction_status(project_id: str):
     """
     获取提取状态
     """
-    return get_extraction_status(project_id)
+    return await get_extraction_status(project_id)
 
 
 @router.get("/{project_id}/combined")
@@ -23,6 +23,7 @@ from app.db.database import get_db, SessionLocal
 from app.models.document import Document, TextBlock, Highlight, HighlightStatus, OCRStatus
 from app.services import highlight_service
 from app.services import storage
+from app.services.llm_client import run_in_new_event_loop
 
 try:
     import fitz  # PyMuPDF
@@ -127,20 +128,13 @@ async def trigger_highlight_analysis(
 
 
 def run_highlight_analysis_background(document_id: str):
-    """后台执行高亮分析"""
-    import asyncio
-
+    """后台执行高亮分析（独立事件循环，结束时关闭该循环的 HTTP 客户端）"""
     db = SessionLocal()
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(
-                highlight_service.analyze_and_highlight(document_id, db)
-            )
-            print(f"[Highlight] Analysis completed for {document_id}: {result}")
-        finally:
-            loop.close()
+        result = run_in_new_event_loop(
+            highlight_service.analyze_and_highlight(document_id, db)
+        )
+        print(f"[Highlight] Analysis completed for {document_id}: {result}")
     except Exception as e:
         print(f"[Highlight] ERROR for {document_id}: {e}")
         import traceback
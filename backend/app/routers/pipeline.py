@@ -40,7 +40,7 @@ from app.services.l1_analyzer import (
 )
 from app.services.quote_merger import merge_chunk_analyses, generate_summary, prepare_for_writing, format_citation
 from app.services.quote_consolidator import (
-    consolidate_all_document_quotes,
+    consolidate_all_document_quotes_async,
     enrich_all_quotes_with_bbox,
     consolidate_all_quotes_with_llm,
     consolidate_material_quotes,
@@ -48,6 +48,7 @@ from app.services.quote_consolidator import (
     enrich_quotes_with_bbox
 )
 from app.services.model_preloader import get_preload_state
+from app.services.llm_client import shared_http_client, run_in_new_event_loop
 
 # New imports for material-based pipeline
 from app.services.material_splitter import (
@@ -1041,7 +1042,6 @@ def process_ocr_with_tracking(
     file_type: str
 ):
     """执行 OCR 并更新批次进度 - 同步函数，内部运行异步代码"""
-    import asyncio
     print(f"[OCR-Batch] Starting OCR for document: {document_id} (batch: {batch_id})", flush=True)
 
     db = SessionLocal()
@@ -1064,15 +1064,10 @@ def process_ocr_with_tracking(
         doc.ocr_status = OCRStatus.PROCESSING.value
         db.commit()
 
-        # 在同步函数中运行异步 OCR
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            text, page_count, text_blocks = loop.run_until_complete(
-                perform_ocr(file_bytes, file_name, file_type)
-            )
-        finally:
-            loop.close()
+        # 在同步函数中运行异步 OCR（独立事件循环，结束时关闭该循环的 HTTP 客户端）
+        text, page_count, text_blocks = run_in_new_event_loop(
+            perform_ocr(file_bytes, file_name, file_type)
+        )
 
         print(f"[OCR-Batch] OCR completed for {document_id}: {page_count} pages", flush=True)
 
@@ -1582,11 +1577,12 @@ async def call_llm(prompt: str, model_override: str = None, max_retries: int = 3
     last_error = None
     for attempt in range(max_retries):
         try:
-            async with httpx.AsyncClient(timeout=180.0) as client:
+            async with shared_http_client() as client:
                 response = await client.post(
                     f"{api_base}/chat/completions",
                     headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-                    json=request_body
+                    json=request_body,
+                    timeout=180.0
                 )
 
                 if response.status_code == 429:
@@ -2886,7 +2882,7 @@ async def _run_l1_analysis_background(
                 print(f"[L1] Ollama not available, using fallback consolidation")
                 _l1_analysis_progress[project_id]["current_doc"]["consolidation_mode"] = "fallback"
 
-                all_results, consolidation_stats = consolidate_all_document_quotes(all_results)
+                all_results, consolidation_stats = await consolidate_all_document_quotes_async(all_results)
                 consolidation_stats["warning"] = "LLM not available, quotes not reviewed"
 
                 print(f"[L1] Fallback consolidation complete:")
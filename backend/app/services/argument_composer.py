@@ -551,9 +551,10 @@ class ArgumentComposer:
             score += 10
         return score
 
-    def generate_lawyer_output(self) -> str:
-        """生成律师风格的 Markdown 输出"""
-        composed = self.compose_all()
+    def generate_lawyer_output(self, composed: Optional[Dict[str, List[ComposedArgument]]] = None) -> str:
+        """生成律师风格的 Markdown 输出（composed 为已组合的结果时直接复用）"""
+        if composed is None:
+            composed = self.compose_all()
         lines = []
 
         lines.append("# EB-1A Petition - Evidence Summary")
@@ -620,9 +621,10 @@ class ArgumentComposer:
 
         return "\n".join(lines)
 
-    def get_statistics(self) -> Dict[str, Any]:
-        """获取统计数据"""
-        composed = self.compose_all()
+    def get_statistics(self, composed: Optional[Dict[str, List[ComposedArgument]]] = None) -> Dict[str, Any]:
+        """获取统计数据（composed 为已组合的结果时直接复用）"""
+        if composed is None:
+            composed = self.compose_all()
 
         stats = {
             "by_standard": {},
@@ -706,13 +708,14 @@ def compose_project_arguments(
         except Exception as e:
             print(f"[ArgumentComposer] Warning: Could not create EntityValidator: {e}")
 
-    # 组合
+    # 组合（只组合一次，律师输出与统计复用同一结果）
     composer = ArgumentComposer(snippets, applicant_name, metadata, entity_validator)
+    composed = composer.compose_all()
 
     return {
-        "composed": {k: [asdict(a) for a in v] for k, v in composer.compose_all().items()},
-        "lawyer_output": composer.generate_lawyer_output(),
-        "statistics": composer.get_statistics(),
+        "composed": {k: [asdict(a) for a in v] for k, v in composed.items()},
+        "lawyer_output": composer.generate_lawyer_output(composed),
+        "statistics": composer.get_statistics(composed),
         "enrichment_info": {
             "enriched_used": enriched_used,
             "snippet_count": len(snippets),
@@ -709,13 +709,21 @@ class ArgumentGenerator:
             if progress_callback:
                 progress_callback(0, 100, "Running relationship analysis...")
 
+            # 分析器状态: 复用之前已提取的实体，只对新增 snippets 调用 LLM
+            # （强制重新分析时丢弃旧状态并跳过 LLM 响应缓存）
+            state_path = self.relationship_dir / "analyzer_state.json"
+            if force_reanalyze and state_path.exists():
+                state_path.unlink()
+
             graph_data = await analyze_relationships(
                 snippets=snippets,
                 model="gpt-4o-mini",
                 applicant_name=applicant_name,  # Pass known applicant name
                 progress_callback=lambda c, t, m: progress_callback(
                     int(c * 0.6), 100, m
-                ) if progress_callback else None
+                ) if progress_callback else None,
+                state_path=state_path,
+                use_cache=not force_reanalyze
             )
 
             # Save results
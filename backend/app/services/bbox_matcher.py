@@ -8,7 +8,7 @@ BBox Matcher Service - Quote 到 BBox 的匹配服务
 匹配策略:
 1. 归一化处理: 统一空白符、标点、去除 HTML 标签
 2. 精确子串匹配: quote 是否是某个 block 的子串
-3. 模糊匹配: 使用 difflib 计算相似度
+3. 模糊匹配: 使用 difflib 计算相似度（有 rapidfuzz 时先批量粗筛候选块）
 4. 跨块匹配: 合并相邻块进行匹配
 """
 
@@ -21,6 +21,12 @@ from sqlalchemy.orm import Session
 
 from app.models.document import TextBlock
 
+try:
+    from rapidfuzz import fuzz, process as rf_process
+    RAPIDFUZZ_SUPPORT = True
+except ImportError:
+    RAPIDFUZZ_SUPPORT = False
+
 
 def normalize_text(text: str) -> str:
     """
@@ -85,6 +91,24 @@ def calculate_similarity(text1: str, text2: str) -> float:
     return SequenceMatcher(None, text1, text2).ratio()
 
 
+def _similarity_candidates(query: str, texts: List[str], threshold: float) -> List[bool]:
+    """
+    批量粗筛: 标记哪些文本与 query 的 difflib 相似度可能达到阈值
+
+    rapidfuzz 的 fuzz.ratio 基于最长公共子序列 (2·LCS / 总长)，
+    而 SequenceMatcher 的匹配字符数不超过 LCS，故前者是后者的上界；
+    上界低于阈值的文本可直接跳过，结果与逐个计算一致。
+    cdist 在 C 层对所有文本一次算完（workers=-1 使用全部核心）。
+    """
+    if not RAPIDFUZZ_SUPPORT or not texts:
+        return [True] * len(texts)
+
+    # 留出浮点误差余量，精确判断仍由 SequenceMatcher 完成
+    cutoff = threshold * 100 - 0.01
+    scores = rf_process.cdist([query], texts, scorer=fuzz.ratio, score_cutoff=cutoff, workers=-1)[0]
+    return [score >= cutoff for score in scores.tolist()]
+
+
 def find_substring_match(quote: str, block_text: str) -> Optional[Tuple[int, int]]:
     """
     查找 quote 在 block_text 中的位置
@@ -258,7 +282,11 @@ def try_cross_block_match(
             blocks_by_page[page] = []
         blocks_by_page[page].append(block)
 
-    # 对每页的块按 block_id 排序
+    # 每个块只归一化一次（相邻窗口会重复用到同一个块）
+    norm_by_block = {id(block): normalize_text(block.text_content or "") for block in blocks}
+
+    # 对每页的块按 block_id 排序，收集所有 2-3 块的相邻窗口
+    windows = []
     for page, page_blocks in blocks_by_page.items():
         page_blocks.sort(key=lambda b: b.block_id)
 
@@ -268,41 +296,52 @@ def try_cross_block_match(
                 window = page_blocks[i:i + window_size]
 
                 # 合并文本
-                combined_text = " ".join([
-                    normalize_text(b.text_content or "") for b in window
-                ])
+                combined_text = " ".join([norm_by_block[id(b)] for b in window])
 
                 if not combined_text:
                     continue
 
-                # 计算相似度
-                similarity = calculate_similarity(quote_norm, combined_text)
-
-                # 也检查子串匹配
-                if quote_norm in combined_text:
-                    similarity = max(similarity, 0.9)
-
-                if similarity >= similarity_threshold:
-                    # 计算合并后的 bbox（取所有块的外包围盒）
-                    min_x1 = min(b.bbox_x1 for b in window if b.bbox_x1 is not None)
-                    min_y1 = min(b.bbox_y1 for b in window if b.bbox_y1 is not None)
-                    max_x2 = max(b.bbox_x2 for b in window if b.bbox_x2 is not None)
-                    max_y2 = max(b.bbox_y2 for b in window if b.bbox_y2 is not None)
-
-                    results.append({
-                        "block_id": f"{window[0].block_id}~{window[-1].block_id}",
-                        "page_number": page,
-                        "text_content": " ".join([b.text_content or "" for b in window]),
-                        "bbox": {
-                            "x1": min_x1,
-                            "y1": min_y1,
-                            "x2": max_x2,
-                            "y2": max_y2
-                        },
-                        "match_type": "cross_block",
-                        "match_score": round(similarity, 3),
-                        "blocks_merged": [b.block_id for b in window]
-                    })
+                windows.append((page, window, combined_text))
+
+    candidates = _similarity_candidates(
+        quote_norm, [combined_text for _, _, combined_text in windows], similarity_threshold
+    )
+
+    for (page, window, combined_text), is_candidate in zip(windows, candidates):
+        if is_candidate:
+            # 计算相似度
+            similarity = calculate_similarity(quote_norm, combined_text)
+
+            # 也检查子串匹配
+            if quote_norm in combined_text:
+                similarity = max(similarity, 0.9)
+        elif quote_norm in combined_text:
+            # 上界已低于阈值，只有子串匹配的 0.9 可能达标
+            similarity = 0.9
+        else:
+            continue
+
+        if similarity >= similarity_threshold:
+            # 计算合并后的 bbox（取所有块的外包围盒）
+            min_x1 = min(b.bbox_x1 for b in window if b.bbox_x1 is not None)
+            min_y1 = min(b.bbox_y1 for b in window if b.bbox_y1 is not None)
+            max_x2 = max(b.bbox_x2 for b in window if b.bbox_x2 is not None)
+            max_y2 = max(b.bbox_y2 for b in window if b.bbox_y2 is not None)
+
+            results.append({
+                "block_id": f"{window[0].block_id}~{window[-1].block_id}",
+                "page_number": page,
+                "text_content": " ".join([b.text_content or "" for b in window]),
+                "bbox": {
+                    "x1": min_x1,
+                    "y1": min_y1,
+                    "x2": max_x2,
+                    "y2": max_y2
+                },
+                "match_type": "cross_block",
+                "match_score": round(similarity, 3),
+                "blocks_merged": [b.block_id for b in window]
+            })
 
     # 按分数排序
     results.sort(key=lambda x: x["match_score"], reverse=True)
@@ -363,7 +402,8 @@ def match_text_to_blocks(
     search_text: str,
     text_blocks: List[TextBlock],
     page_hint: Optional[int] = None,
-    similarity_threshold: float = 0.6
+    similarity_threshold: float = 0.6,
+    already_filtered: bool = False
 ) -> Dict[str, Any]:
     """
     将搜索文本匹配到 text_blocks（内存版本，不需要数据库查询）
@@ -373,6 +413,7 @@ def match_text_to_blocks(
         text_blocks: TextBlock 对象列表
         page_hint: 可选的页码提示
         similarity_threshold: 相似度阈值
+        already_filtered: text_blocks 已由调用方按页筛选/排序，跳过内部的页码排序
 
     Returns:
         {
@@ -398,14 +439,19 @@ def match_text_to_blocks(
     matches = []
 
     # 如果有页码提示，先排序块
-    blocks = list(text_blocks)
-    if page_hint:
-        blocks.sort(key=lambda b: (b.page_number != page_hint, b.page_number))
+    if already_filtered:
+        blocks = text_blocks
+    else:
+        blocks = list(text_blocks)
+        if page_hint:
+            blocks.sort(key=lambda b: (b.page_number != page_hint, b.page_number))
+
+    # 每个块只归一化一次，供策略 1 和 2 共用
+    block_norms = [normalize_text(block.text_content or "") for block in blocks]
 
     # 策略 1: 精确子串匹配
-    for block in blocks:
-        block_text = block.text_content or ""
-        if find_substring_match(search_text, block_text):
+    for block, block_norm in zip(blocks, block_norms):
+        if search_norm in block_norm:
             matches.append({
                 "block_id": block.block_id,
                 "page_number": block.page_number,
@@ -424,12 +470,13 @@ def match_text_to_blocks(
         return {"matched": True, "matches": matches}
 
     # 策略 2: 模糊匹配单个块
-    block_scores = []
-    for block in blocks:
-        block_text = block.text_content or ""
-        block_norm = normalize_text(block_text)
+    # 走到这里说明 search_norm 不是任何块的子串，partial_score 恒为 0，
+    # 可用相似度上界先筛掉不可能达到阈值的块
+    candidates = _similarity_candidates(search_norm, block_norms, similarity_threshold)
 
-        if not block_norm:
+    block_scores = []
+    for block, block_norm, is_candidate in zip(blocks, block_norms, candidates):
+        if not block_norm or not is_candidate:
             continue
 
         similarity = calculate_similarity(search_norm, block_norm)
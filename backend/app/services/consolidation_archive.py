@@ -12,6 +12,11 @@ Consolidation Archive Service - 整合过程存档服务
 3. LLM 响应 (每批)
 4. 最终引用 (整合后)
 5. 统计信息
+
+写入方式:
+- 默认每个存档点一个 JSON 文件
+- open_run() 之后所有存档点追加到同一个 {timestamp}_run.jsonl（单个文件句柄），
+  close_run() 时关闭；一次整合只产生 O(1) 次文件打开
 """
 
 import json
@@ -19,6 +24,53 @@ from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
+
+# 整合流程内部使用的簿记字段（如 _internal_doc_idx）以此为前缀，不写入存档
+INTERNAL_FIELD_PREFIX = "_internal_"
+
+
+def _strip_internal_fields(data: Any) -> Any:
+    """返回去掉内部簿记字段的副本（只复制含有这些字段的 dict 及其上层容器）"""
+    if isinstance(data, dict):
+        stripped = {
+            key: _strip_internal_fields(value)
+            for key, value in data.items()
+            if not (isinstance(key, str) and key.startswith(INTERNAL_FIELD_PREFIX))
+        }
+        if len(stripped) == len(data) and all(stripped[key] is data[key] for key in stripped):
+            return data
+        return stripped
+    if isinstance(data, (list, tuple)):
+        stripped = [_strip_internal_fields(item) for item in data]
+        if all(new is old for new, old in zip(stripped, data)):
+            return data
+        return stripped
+    return data
+
+
+def _dumps(data: Any, indent: bool = False) -> str:
+    """序列化为 JSON 文本（orjson 可用时使用，无法序列化的数据回退到标准库）"""
+    if ORJSON_SUPPORT:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(data, option=option).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None)
+
+
+def _loads(text: str) -> Any:
+    """解析 JSON 文本（orjson 可用时使用）"""
+    if ORJSON_SUPPORT:
+        return orjson.loads(text)
+    return json.loads(text)
+
 
 def get_consolidation_logs_dir(project_id: str) -> Path:
     """获取项目的整合日志目录"""
@@ -29,6 +81,45 @@ def get_consolidation_logs_dir(project_id: str) -> Path:
     return logs_dir
 
 
+def get_decision_cache_dir(project_id: str) -> Path:
+    """获取 LLM 批次决策缓存目录（位于整合日志目录下，重启后仍可复用）"""
+    cache_dir = get_consolidation_logs_dir(project_id) / "decision_cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def load_cached_decisions(project_id: str, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    读取已缓存的批次决策
+
+    Args:
+        project_id: 项目 ID
+        cache_key: 批次内容哈希
+
+    Returns:
+        决策列表，未命中或读取失败返回 None
+    """
+    filepath = get_decision_cache_dir(project_id) / f"{cache_key}.json"
+    if not filepath.exists():
+        return None
+
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return _loads(f.read()).get("decisions")
+    except Exception:
+        return None
+
+
+def save_cached_decisions(project_id: str, cache_key: str, decisions: List[Dict[str, Any]]):
+    """保存批次决策到缓存"""
+    filepath = get_decision_cache_dir(project_id) / f"{cache_key}.json"
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(_dumps({
+            "timestamp": datetime.now().isoformat(),
+            "decisions": decisions
+        }))
+
+
 def generate_timestamp() -> str:
     """生成时间戳字符串"""
     return datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -47,12 +138,38 @@ class ConsolidationArchive:
         self.project_id = project_id
         self.timestamp = generate_timestamp()
         self.logs_dir = get_consolidation_logs_dir(project_id)
+        self._run_log = None
+
+    def open_run(self) -> str:
+        """
+        开始一次整合运行：之后的存档点追加写入同一个 JSONL 文件
+
+        Returns:
+            JSONL 文件名
+        """
+        filename = f"{self.timestamp}_run.jsonl"
+        if self._run_log is None:
+            self._run_log = open(self.logs_dir / filename, 'a', encoding='utf-8')
+        return filename
+
+    def close_run(self):
+        """结束整合运行，关闭 JSONL 文件"""
+        if self._run_log is not None:
+            self._run_log.close()
+            self._run_log = None
 
     def _save_json(self, filename: str, data: Any):
-        """保存 JSON 数据"""
+        """保存 JSON 数据（运行中则追加为 JSONL 的一行；内部簿记字段不写入）"""
+        data = _strip_internal_fields(data)
+        if self._run_log is not None:
+            # kind 取文件名去掉时间戳前缀的部分，如 llm_batch_1
+            kind = filename[len(self.timestamp) + 1:].rsplit(".", 1)[0]
+            self._run_log.write(_dumps({"kind": kind, "data": data}) + "\n")
+            return
+
         filepath = self.logs_dir / filename
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write(_dumps(data, indent=True))
 
     def save_original_quotes(self, quotes: List[Dict[str, Any]]) -> str:
         """
@@ -249,7 +366,7 @@ def list_consolidation_logs(project_id: str) -> List[Dict[str, Any]]:
     logs_dir = get_consolidation_logs_dir(project_id)
     logs = []
 
-    for filepath in sorted(logs_dir.glob("*.json"), reverse=True):
+    for filepath in sorted([*logs_dir.glob("*.json"), *logs_dir.glob("*.jsonl")], reverse=True):
         try:
             stat = filepath.stat()
             # 从文件名解析时间戳和阶段
@@ -288,7 +405,9 @@ def load_consolidation_log(project_id: str, filename: str) -> Optional[Dict[str,
         return None
 
     with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        if filepath.suffix == ".jsonl":
+            return {"records": [_loads(line) for line in f if line.strip()]}
+        return _loads(f.read())
 
 
 def cleanup_old_logs(project_id: str, keep_days: int = 7) -> int:
@@ -306,7 +425,7 @@ def cleanup_old_logs(project_id: str, keep_days: int = 7) -> int:
     cutoff = datetime.now().timestamp() - (keep_days * 24 * 60 * 60)
     deleted = 0
 
-    for filepath in logs_dir.glob("*.json"):
+    for filepath in [*logs_dir.glob("*.json"), *logs_dir.glob("*.jsonl")]:
         try:
             if filepath.stat().st_mtime < cutoff:
                 filepath.unlink()
@@ -25,6 +25,7 @@ from .unified_extractor import (
     get_extraction_dir,
     get_entities_dir,
     load_combined_extraction,
+    save_combined_stats,
     PROJECTS_DIR
 )
 from ..core.config import settings
@@ -393,6 +394,7 @@ def apply_entity_merges(project_id: str) -> Dict:
     combined_file = extraction_dir / "combined_extraction.json"
     with open(combined_file, 'w', encoding='utf-8') as f:
         json.dump(combined, f, ensure_ascii=False, indent=2)
+    save_combined_stats(project_id, combined)
 
     # 8. 同步更新 snippets 文件
     snippets_dir = PROJECTS_DIR / project_id / "snippets"
@@ -8,7 +8,6 @@ Highlight Service - 高亮分析服务
 """
 
 import json
-import httpx
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
@@ -16,6 +15,7 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.models.document import Document, TextBlock, Highlight, HighlightStatus
 from app.services import bbox_matcher
+from app.services.llm_client import shared_http_client
 
 
 # LLM 配置 - 统一使用 settings 中的配置
@@ -137,11 +137,12 @@ Return at most {max_highlights} highlights, prioritizing the most important ones
     if llm_provider != "ollama":
         request_body["response_format"] = {"type": "json_object"}
 
-    async with httpx.AsyncClient(timeout=180.0) as client:  # 3 分钟超时
+    async with shared_http_client() as client:
         response = await client.post(
             f"{api_base}/chat/completions",
             headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json=request_body
+            json=request_body,
+            timeout=180.0  # 3 分钟超时
         )
 
         if response.status_code != 200:
@@ -23,7 +23,9 @@ L-1 Analyzer Service - L-1 签证专项分析服务 v3.0
 from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime
 from pathlib import Path
+from collections import defaultdict
 import json
+import os
 import re
 
 # 数据存储根目录
@@ -31,6 +33,20 @@ DATA_DIR = Path(__file__).parent.parent.parent / "data"
 PROJECTS_DIR = DATA_DIR / "projects"
 
 
+def _write_json_atomic(path: Path, data: Any):
+    """
+    原子写入 JSON：先写同目录临时文件并 fsync，再 os.replace 覆盖目标
+
+    进程在写入中途被杀时目标文件保持旧内容，断点不会因半截 JSON 而失效。
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
 # =============================================
 # L1 分析断点管理器
 # =============================================
@@ -60,9 +76,8 @@ class L1AnalysisCheckpoint:
         return False
 
     def _save(self):
-        """保存当前状态到文件"""
-        with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
-            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        """保存当前状态到文件（原子替换）"""
+        _write_json_atomic(self.checkpoint_file, self.state)
 
     def init_new(self, doc_list: List[Dict]):
         """初始化新的分析任务"""
@@ -114,8 +129,7 @@ class L1AnalysisCheckpoint:
     def _save_doc_result(self, doc_id: str, result: Dict):
         """保存单个文档的分析结果"""
         result_file = self.checkpoint_dir / f"{doc_id}_result.json"
-        with open(result_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        _write_json_atomic(result_file, result)
 
     def load_doc_result(self, doc_id: str) -> Optional[Dict]:
         """加载单个文档的分析结果"""
@@ -975,12 +989,9 @@ def save_material_analysis(
     version_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
 
     # 按 exhibit 组织结果
-    by_exhibit = {}
+    by_exhibit = defaultdict(list)
     for result in results:
-        exhibit_id = result.exhibit_id
-        if exhibit_id not in by_exhibit:
-            by_exhibit[exhibit_id] = []
-        by_exhibit[exhibit_id].append(result.to_dict())
+        by_exhibit[result.exhibit_id].append(result.to_dict())
 
     # 保存汇总文件
     analysis_data = {
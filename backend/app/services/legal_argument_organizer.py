@@ -367,13 +367,14 @@ def _fallback_organize(snippets: List[Dict], applicant_name: str) -> List[LegalA
 async def full_legal_pipeline(
     project_id: str,
     applicant_name: str = "Ms. Qu",
-    provider: str = "deepseek"
+    provider: str = "deepseek",
+    use_cache: bool = True
 ) -> Dict[str, Any]:
     """
     完整的法律论点组织流程
 
     Step 1: LLM + 法律条例 → 组织子论点
-    Step 2: LLM → 划分次级子论点
+    Step 2: LLM → 划分次级子论点（use_cache 为 False 时不读细分缓存）
 
     Returns:
         {
@@ -433,7 +434,8 @@ async def full_legal_pipeline(
         sub_args = await subdivide_argument(
             argument={'id': arg.id, 'title': arg.title, 'standard': arg.standard},
             snippets=arg_snippets,
-            provider=provider
+            provider=provider,
+            use_cache=use_cache
         )
 
         arg.sub_argument_ids = [sa.id for sa in sub_args]
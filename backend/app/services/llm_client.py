@@ -10,10 +10,19 @@ LLM Client - 统一的 LLM API 客户端
 
 import json
 import re
+import asyncio
+import threading
 import httpx
-from typing import Dict, List, Optional, Any
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Any, Tuple, Union
 from ..core.config import settings
 
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
 
 # 默认配置
 DEFAULT_TIMEOUT = 120.0  # 秒
@@ -24,37 +33,174 @@ DEFAULT_TEMPERATURE = 0.1
 DEEPSEEK_CHAT_MODEL = "deepseek-chat"  # DeepSeek-V3，便宜又好用
 DEEPSEEK_REASONER_MODEL = "deepseek-reasoner"  # DeepSeek-R1，推理能力强
 
+# HTTP 连接池（同一事件循环内的调用共享一个 AsyncClient，keep-alive 复用连接，省去每次握手）
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+HTTP_KEEPALIVE_EXPIRY = 60.0  # 秒
+HTTP_CONNECT_TIMEOUT = 10.0  # 秒
 
-async def call_openai(
-    prompt: str,
-    model: str = "gpt-4o-mini",
-    system_prompt: str = None,
-    json_schema: Dict = None,
-    temperature: float = DEFAULT_TEMPERATURE,
-    max_tokens: int = DEFAULT_MAX_TOKENS,
-    timeout: float = DEFAULT_TIMEOUT
-) -> Dict:
+# 超过该长度的响应在线程池中解析 JSON，避免大响应阻塞事件循环
+JSON_PARSE_OFFLOAD_CHARS = 32_000
+
+# OpenAI Batch API（离线批量请求，费用约为同步调用的一半，24 小时内完成）
+BATCH_POLL_INTERVAL = 30.0  # 秒
+BATCH_MAX_WAIT = 24 * 3600.0  # 秒
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# 被截断后修复出的 JSON 对象带此标记（只保留了已完整的元素，不应写入缓存或记为已处理）
+TRUNCATED_MARKER = "_truncated"
+# 响应被截断时以该 provider 的输出上限重试一次，仍截断才使用修复结果
+TRUNCATION_RETRY_MAX_TOKENS = {
+    "deepseek": 8192,
+    "openai": 16384,
+}
+
+# 每个事件循环一个客户端（连接池绑定创建它的循环；后台线程中的独立循环各用各的）
+_http_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+_http_clients_lock = threading.Lock()
+
+
+def _dumps_fast(data: Any) -> bytes:
+    """序列化请求体（orjson 可用时使用 C 编码器）"""
+    if ORJSON_SUPPORT:
+        return orjson.dumps(data)
+    return json.dumps(data).encode("utf-8")
+
+
+def _loads_fast(text: Union[str, bytes]) -> Any:
+    """解析 JSON（orjson 可用时使用 C 解析器），失败抛出 ValueError"""
+    if ORJSON_SUPPORT:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def get_http_client() -> httpx.AsyncClient:
     """
-    调用 OpenAI API
+    获取当前事件循环的共享 httpx.AsyncClient（懒加载，线程安全）
 
-    Args:
-        prompt: 用户提示词
-        model: 模型名称 (gpt-4o-mini, gpt-4o, gpt-4-turbo 等)
-        system_prompt: 系统提示词
-        json_schema: 如果提供，使用 strict JSON schema 模式
-        temperature: 采样温度
-        max_tokens: 最大输出 token 数
-        timeout: 超时时间（秒）
+    客户端按事件循环区分：API 主循环与后台线程自建的循环互不替换对方的客户端。
+    创建了独立循环的调用方应在循环结束前 await aclose_http_client()；
+    遗留在已关闭循环上的客户端在下次获取时移除。
+    """
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        for stale_loop in [l for l in _http_clients if l.is_closed()]:
+            del _http_clients[stale_loop]
+
+        client = _http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                )
+            )
+            _http_clients[loop] = client
+        return client
+
+
+@asynccontextmanager
+async def shared_http_client():
+    """
+    以 async with 形式借用共享客户端（退出时不关闭连接池）
+
+    便于把 `async with httpx.AsyncClient(...) as client:` 直接替换为共享连接池；
+    超时通过 client.post(..., timeout=...) 按请求指定。
+    """
+    yield get_http_client()
+
+
+async def aclose_http_client():
+    """关闭当前事件循环的共享 httpx.AsyncClient（应用关闭、后台线程的事件循环结束前调用）"""
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        client = _http_clients.pop(loop, None)
+
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def run_in_new_event_loop(coro):
+    """
+    在后台线程中用新建的事件循环运行协程
+
+    结束前关闭该循环上的共享 HTTP 客户端，再关闭循环，避免连接泄漏。
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            loop.run_until_complete(aclose_http_client())
+        finally:
+            loop.close()
+
+
+async def _stream_chat_completion(
+    client: httpx.AsyncClient,
+    url: str,
+    request_body: Dict,
+    headers: Dict,
+    timeout: float,
+    provider_label: str
+) -> str:
+    """
+    以 SSE 流式模式调用 /chat/completions，逐块累积 delta.content
+
+    网络传输与模型生成重叠，不必等完整响应体到达后再整体解析外层 JSON。
 
     Returns:
-        解析后的 JSON 响应，或 {"content": str} 如果不是 JSON
+        拼接后的完整 content 文本
     """
-    api_key = settings.openai_api_key
-    api_base = settings.openai_api_base.rstrip('/')
+    parts = []
+    async with client.stream(
+        "POST",
+        url,
+        content=_dumps_fast({**request_body, "stream": True}),
+        headers=headers,
+        timeout=timeout
+    ) as response:
+        if response.status_code != 200:
+            error_detail = (await response.aread()).decode("utf-8", errors="replace")
+            raise Exception(f"{provider_label} API error {response.status_code}: {error_detail}")
+
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = _loads_fast(data)
+            except ValueError:
+                continue
+            for choice in chunk.get("choices") or ():
+                piece = (choice.get("delta") or {}).get("content")
+                if piece:
+                    parts.append(piece)
+
+    return "".join(parts)
+
+
+async def extract_json_async(content: str) -> Dict:
+    """extract_json 的异步版本：大响应放到线程池解析，不阻塞事件循环"""
+    if content and len(content) >= JSON_PARSE_OFFLOAD_CHARS:
+        return await asyncio.to_thread(extract_json, content)
+    return extract_json(content)
 
-    if not api_key:
-        raise ValueError("OpenAI API key not configured. Set OPENAI_API_KEY in .env")
 
+def build_openai_request_body(
+    prompt: str,
+    model: str,
+    system_prompt: str = None,
+    json_schema: Dict = None,
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: int = DEFAULT_MAX_TOKENS
+) -> Dict:
+    """构建 OpenAI /chat/completions 请求体（同步调用与 Batch API 共用）"""
     # 构建消息
     messages = []
     if system_prompt:
@@ -83,23 +229,75 @@ async def call_openai(
         # 即使没有 schema，也要求返回 JSON
         request_body["response_format"] = {"type": "json_object"}
 
+    return request_body
+
+
+async def call_openai(
+    prompt: str,
+    model: str = "gpt-4o-mini",
+    system_prompt: str = None,
+    json_schema: Dict = None,
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    timeout: float = DEFAULT_TIMEOUT,
+    stream: bool = False,
+    prompt_cache_key: Optional[str] = None
+) -> Dict:
+    """
+    调用 OpenAI API
+
+    Args:
+        prompt: 用户提示词
+        model: 模型名称 (gpt-4o-mini, gpt-4o, gpt-4-turbo 等)
+        system_prompt: 系统提示词
+        json_schema: 如果提供，使用 strict JSON schema 模式
+        temperature: 采样温度
+        max_tokens: 最大输出 token 数
+        timeout: 超时时间（秒）
+        stream: 流式接收响应（SSE），大响应在线程池中解析
+        prompt_cache_key: 共享同一前缀（如固定 system prompt）的请求使用相同的键，
+            让 OpenAI 把它们路由到同一前缀缓存，跳过重复的 prefill
+
+    Returns:
+        解析后的 JSON 响应，或 {"content": str} 如果不是 JSON
+    """
+    api_key = settings.openai_api_key
+    api_base = settings.openai_api_base.rstrip('/')
+
+    if not api_key:
+        raise ValueError("OpenAI API key not configured. Set OPENAI_API_KEY in .env")
+
+    request_body = build_openai_request_body(
+        prompt, model, system_prompt, json_schema, temperature, max_tokens
+    )
+
+    if prompt_cache_key:
+        request_body["prompt_cache_key"] = prompt_cache_key
+
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            f"{api_base}/chat/completions",
-            json=request_body,
-            headers=headers
+    client = get_http_client()
+    if stream:
+        content = await _stream_chat_completion(
+            client, f"{api_base}/chat/completions", request_body, headers, timeout, "OpenAI"
         )
+        return await extract_json_async(content)
 
-        if response.status_code != 200:
-            error_detail = response.text
-            raise Exception(f"OpenAI API error {response.status_code}: {error_detail}")
+    response = await client.post(
+        f"{api_base}/chat/completions",
+        content=_dumps_fast(request_body),
+        headers=headers,
+        timeout=timeout
+    )
+
+    if response.status_code != 200:
+        error_detail = response.text
+        raise Exception(f"OpenAI API error {response.status_code}: {error_detail}")
 
-        result = response.json()
+    result = _loads_fast(response.content)
 
     # 提取内容
     message = result.get("choices", [{}])[0].get("message", {})
@@ -148,18 +346,19 @@ async def call_openai_text(
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            f"{api_base}/chat/completions",
-            json=request_body,
-            headers=headers
-        )
+    client = get_http_client()
+    response = await client.post(
+        f"{api_base}/chat/completions",
+        content=_dumps_fast(request_body),
+        headers=headers,
+        timeout=timeout
+    )
 
-        if response.status_code != 200:
-            error_detail = response.text
-            raise Exception(f"OpenAI API error {response.status_code}: {error_detail}")
+    if response.status_code != 200:
+        error_detail = response.text
+        raise Exception(f"OpenAI API error {response.status_code}: {error_detail}")
 
-        result = response.json()
+    result = _loads_fast(response.content)
 
     message = result.get("choices", [{}])[0].get("message", {})
     return message.get("content", "")
@@ -172,7 +371,8 @@ async def call_deepseek(
     json_schema: Dict = None,
     temperature: float = DEFAULT_TEMPERATURE,
     max_tokens: int = DEFAULT_MAX_TOKENS,
-    timeout: float = DEFAULT_TIMEOUT
+    timeout: float = DEFAULT_TIMEOUT,
+    stream: bool = False
 ) -> Dict:
     """
     调用 DeepSeek API (OpenAI 兼容格式)
@@ -185,6 +385,7 @@ async def call_deepseek(
         temperature: 采样温度
         max_tokens: 最大输出 token 数
         timeout: 超时时间（秒）
+        stream: 流式接收响应（SSE），大响应在线程池中解析
 
     Returns:
         解析后的 JSON 响应
@@ -218,18 +419,25 @@ async def call_deepseek(
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            f"{api_base}/chat/completions",
-            json=request_body,
-            headers=headers
+    client = get_http_client()
+    if stream:
+        content = await _stream_chat_completion(
+            client, f"{api_base}/chat/completions", request_body, headers, timeout, "DeepSeek"
         )
+        return await extract_json_async(content)
 
-        if response.status_code != 200:
-            error_detail = response.text
-            raise Exception(f"DeepSeek API error {response.status_code}: {error_detail}")
+    response = await client.post(
+        f"{api_base}/chat/completions",
+        content=_dumps_fast(request_body),
+        headers=headers,
+        timeout=timeout
+    )
+
+    if response.status_code != 200:
+        error_detail = response.text
+        raise Exception(f"DeepSeek API error {response.status_code}: {error_detail}")
 
-        result = response.json()
+    result = _loads_fast(response.content)
 
     # 提取内容
     message = result.get("choices", [{}])[0].get("message", {})
@@ -276,18 +484,19 @@ async def call_deepseek_text(
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            f"{api_base}/chat/completions",
-            json=request_body,
-            headers=headers
-        )
+    client = get_http_client()
+    response = await client.post(
+        f"{api_base}/chat/completions",
+        content=_dumps_fast(request_body),
+        headers=headers,
+        timeout=timeout
+    )
 
-        if response.status_code != 200:
-            error_detail = response.text
-            raise Exception(f"DeepSeek API error {response.status_code}: {error_detail}")
+    if response.status_code != 200:
+        error_detail = response.text
+        raise Exception(f"DeepSeek API error {response.status_code}: {error_detail}")
 
-        result = response.json()
+    result = _loads_fast(response.content)
 
     message = result.get("choices", [{}])[0].get("message", {})
     return message.get("content", "")
@@ -331,7 +540,9 @@ async def call_llm(
     temperature: float = DEFAULT_TEMPERATURE,
     max_tokens: int = DEFAULT_MAX_TOKENS,
     timeout: float = DEFAULT_TIMEOUT,
-    provider: str = None
+    provider: str = None,
+    stream: bool = False,
+    prompt_cache_key: Optional[str] = None
 ) -> Dict:
     """
     统一的 LLM 调用接口
@@ -347,12 +558,49 @@ async def call_llm(
         max_tokens: 最大输出 token 数
         timeout: 超时时间（秒）
         provider: 提供商 ("deepseek", "openai")，默认 deepseek
+        stream: 流式接收响应（SSE），大响应在线程池中解析
+        prompt_cache_key: 前缀缓存路由键（仅 OpenAI 使用；DeepSeek 对相同前缀自动缓存，
+            只需保证固定内容在 prompt 开头）
 
     Returns:
-        解析后的 JSON 响应
+        解析后的 JSON 响应；重试后仍被截断时为修复出的部分结果（is_truncated_response 为 True）
     """
     provider = provider or "deepseek"  # 默认使用 DeepSeek
+    request = dict(
+        prompt=prompt,
+        model=model,
+        system_prompt=system_prompt,
+        json_schema=json_schema,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        provider=provider,
+        stream=stream,
+        prompt_cache_key=prompt_cache_key
+    )
+    result = await _call_provider(**request)
+
+    # 输出超出 max_tokens 被截断：提高到 provider 上限重试一次
+    retry_max_tokens = TRUNCATION_RETRY_MAX_TOKENS.get(provider, max_tokens)
+    if is_truncated_response(result) and max_tokens < retry_max_tokens:
+        print(f"[LLM] Response truncated at max_tokens={max_tokens}, retrying with {retry_max_tokens}")
+        result = await _call_provider(**{**request, "max_tokens": retry_max_tokens})
+    return result
+
 
+async def _call_provider(
+    prompt: str,
+    model: str,
+    system_prompt: str,
+    json_schema: Dict,
+    temperature: float,
+    max_tokens: int,
+    timeout: float,
+    provider: str,
+    stream: bool,
+    prompt_cache_key: Optional[str]
+) -> Dict:
+    """按 provider 分发 JSON 调用"""
     if provider == "deepseek":
         return await call_deepseek(
             prompt=prompt,
@@ -361,7 +609,8 @@ async def call_llm(
             json_schema=json_schema,
             temperature=temperature,
             max_tokens=max_tokens,
-            timeout=timeout
+            timeout=timeout,
+            stream=stream
         )
     elif provider == "openai":
         return await call_openai(
@@ -371,7 +620,9 @@ async def call_llm(
             json_schema=json_schema,
             temperature=temperature,
             max_tokens=max_tokens,
-            timeout=timeout
+            timeout=timeout,
+            stream=stream,
+            prompt_cache_key=prompt_cache_key
         )
     else:
         raise ValueError(f"Unknown provider: {provider}")
@@ -416,6 +667,219 @@ async def call_llm_text(
         raise ValueError(f"Unknown provider: {provider}")
 
 
+
+def _batch_headers() -> Dict[str, str]:
+    """OpenAI Batch / Files API 请求头（未配置 API key 时抛出 ValueError）"""
+    if not settings.openai_api_key:
+        raise ValueError("OpenAI API key not configured. Set OPENAI_API_KEY in .env")
+    return {"Authorization": f"Bearer {settings.openai_api_key}"}
+
+
+async def submit_openai_batch(request_bodies: Dict[str, Dict]) -> Dict:
+    """
+    提交一批 /chat/completions 请求到 OpenAI Batch API（费用约为同步调用的一半）
+
+    上传 JSONL 输入文件并创建 batch 后立即返回，不等待完成；之后用
+    get_openai_batch 查询状态，结束后用 fetch_openai_batch_results 取回结果。
+
+    Args:
+        request_bodies: custom_id -> 请求体（build_openai_request_body 的结果）
+
+    Returns:
+        OpenAI 返回的 batch 对象（含 id、status）
+    """
+    api_base = settings.openai_api_base.rstrip('/')
+    headers = _batch_headers()
+    client = get_http_client()
+
+    # 1. 上传输入文件
+    input_jsonl = b"\n".join(
+        _dumps_fast({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body
+        })
+        for custom_id, body in request_bodies.items()
+    )
+    response = await client.post(
+        f"{api_base}/files",
+        headers=headers,
+        data={"purpose": "batch"},
+        files={"file": ("batch_input.jsonl", input_jsonl, "application/jsonl")},
+        timeout=DEFAULT_TIMEOUT
+    )
+    if response.status_code != 200:
+        raise Exception(f"OpenAI file upload error {response.status_code}: {response.text}")
+    input_file_id = _loads_fast(response.content)["id"]
+
+    # 2. 创建 batch
+    response = await client.post(
+        f"{api_base}/batches",
+        headers={**headers, "Content-Type": "application/json"},
+        content=_dumps_fast({
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        }),
+        timeout=DEFAULT_TIMEOUT
+    )
+    if response.status_code != 200:
+        raise Exception(f"OpenAI batch create error {response.status_code}: {response.text}")
+    batch = _loads_fast(response.content)
+    print(f"[LLM] OpenAI batch {batch['id']} submitted ({len(request_bodies)} requests)")
+    return batch
+
+
+async def get_openai_batch(batch_id: str) -> Dict:
+    """查询 OpenAI batch 当前状态（单次请求，不轮询）"""
+    api_base = settings.openai_api_base.rstrip('/')
+    response = await get_http_client().get(
+        f"{api_base}/batches/{batch_id}", headers=_batch_headers(), timeout=DEFAULT_TIMEOUT
+    )
+    if response.status_code != 200:
+        raise Exception(f"OpenAI batch status error {response.status_code}: {response.text}")
+    return _loads_fast(response.content)
+
+
+async def cancel_openai_batch(batch_id: str):
+    """取消 OpenAI batch"""
+    api_base = settings.openai_api_base.rstrip('/')
+    await get_http_client().post(
+        f"{api_base}/batches/{batch_id}/cancel", headers=_batch_headers(), timeout=DEFAULT_TIMEOUT
+    )
+
+
+async def fetch_openai_batch_results(batch: Dict) -> Dict[str, Dict]:
+    """
+    下载已结束 batch 的输出文件并按 custom_id 解析
+
+    失败请求在 error_file 中，这里不下载；失败或无法解析的请求不在结果中。
+    """
+    results = {}
+    output_file_id = batch.get("output_file_id")
+    if output_file_id:
+        api_base = settings.openai_api_base.rstrip('/')
+        response = await get_http_client().get(
+            f"{api_base}/files/{output_file_id}/content", headers=_batch_headers(), timeout=DEFAULT_TIMEOUT
+        )
+        if response.status_code != 200:
+            raise Exception(f"OpenAI batch output error {response.status_code}: {response.text}")
+        for line in response.content.splitlines():
+            if not line.strip():
+                continue
+            record = _loads_fast(line)
+            reply = record.get("response") or {}
+            if reply.get("status_code") != 200:
+                continue
+            message = (reply.get("body") or {}).get("choices", [{}])[0].get("message", {})
+            try:
+                results[record["custom_id"]] = await extract_json_async(message.get("content", ""))
+            except Exception as e:
+                print(f"[LLM] Batch result {record.get('custom_id')} unparsable: {e}")
+
+    counts = batch.get("request_counts") or {}
+    print(f"[LLM] OpenAI batch {batch.get('id')} {batch.get('status')}: {len(results)}/{counts.get('total', len(results))} succeeded")
+    return results
+
+
+async def run_openai_batch(
+    request_bodies: Dict[str, Dict],
+    poll_interval: float = BATCH_POLL_INTERVAL,
+    max_wait: float = BATCH_MAX_WAIT,
+    progress_callback=None
+) -> Dict[str, Dict]:
+    """
+    提交 batch 并在当前协程中轮询直到结束（供离线脚本使用；
+    HTTP 接口应使用 submit_openai_batch + get_openai_batch 分步处理，不要在请求中长时间等待）
+
+    Args:
+        request_bodies: custom_id -> 请求体（build_openai_request_body 的结果）
+        poll_interval: 轮询间隔（秒）
+        max_wait: 最长等待时间（秒），超时取消 batch 并抛出 TimeoutError
+        progress_callback: 进度回调 (completed, total, status)
+
+    Returns:
+        custom_id -> 解析后的 JSON 响应；失败或缺失的请求不在结果中
+    """
+    batch = await submit_openai_batch(request_bodies)
+    batch_id = batch["id"]
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait
+    while batch.get("status") not in BATCH_TERMINAL_STATUSES:
+        if loop.time() >= deadline:
+            await cancel_openai_batch(batch_id)
+            raise TimeoutError(f"OpenAI batch {batch_id} not finished after {max_wait:.0f}s")
+        await asyncio.sleep(poll_interval)
+        batch = await get_openai_batch(batch_id)
+        if progress_callback:
+            counts = batch.get("request_counts") or {}
+            progress_callback(counts.get("completed", 0), len(request_bodies), batch.get("status", ""))
+
+    return await fetch_openai_batch_results(batch)
+
+
+def _repair_truncated_json(content: str) -> Tuple[Optional[str], bool]:
+    """
+    修复被截断的 JSON（如输出超出 max_tokens）
+
+    从第一个 { 或 [ 开始扫描，截断到最后一个完整闭合的嵌套值之后，
+    再补齐未闭合的括号；已完整的元素得以保留，而不是整批丢弃。
+
+    Returns:
+        (JSON 文本, 是否补齐了括号)。值本身正常闭合（后面可能跟着说明文字）时
+        返回该值原文和 False；无法修复返回 (None, False)
+    """
+    starts = [i for i in (content.find('{'), content.find('[')) if i >= 0]
+    if not starts:
+        return None, False
+    start = min(starts)
+
+    closers = []
+    in_string = False
+    escaped = False
+    last_cut = None
+    cut_closers = None
+
+    for i in range(start, len(content)):
+        ch = content[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{' or ch == '[':
+            closers.append('}' if ch == '{' else ']')
+        elif ch == '}' or ch == ']':
+            if not closers or closers[-1] != ch:
+                return None, False
+            closers.pop()
+            if not closers:
+                return content[start:i + 1], False
+            last_cut = i + 1
+            cut_closers = list(closers)
+
+    if last_cut is None:
+        return None, False
+    return content[start:last_cut] + ''.join(reversed(cut_closers)), True
+
+
+class TruncatedList(list):
+    """截断后修复出的顶层数组（列表无法携带 TRUNCATED_MARKER 键，以类型标记）"""
+
+
+def is_truncated_response(result: Any) -> bool:
+    """响应是否为截断后修复出的部分结果（对象带 TRUNCATED_MARKER，数组为 TruncatedList）"""
+    if isinstance(result, TruncatedList):
+        return True
+    return isinstance(result, dict) and result.get(TRUNCATED_MARKER) is True
+
+
 def extract_json(content: str) -> Dict:
     """
     从 LLM 响应中提取 JSON
@@ -424,17 +888,33 @@ def extract_json(content: str) -> Dict:
     1. 纯 JSON
     2. ```json ... ``` 代码块
     3. 混合文本中的 JSON
+    4. 被截断的 JSON（保留已完整的元素；对象带 TRUNCATED_MARKER 标记，数组返回 TruncatedList）
     """
     if not content or not content.strip():
         return {"content": ""}
 
     content = content.strip()
 
+    # 以 { 或 [ 开头却不以括号结尾时先扫描一遍：确实需要补齐括号（输出超出 max_tokens
+    # 被截断）时整体解析注定失败，跳过对整段大文本的直接解析和括号匹配；
+    # 值已正常闭合、后面只是跟着说明文字时照常走下面的解析
+    repaired, truncated = None, False
+    if content[0] in "{[" and content[-1] not in "}]":
+        repaired, truncated = _repair_truncated_json(content)
+
     # 尝试直接解析
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        pass
+    if not truncated:
+        try:
+            return _loads_fast(content)
+        except ValueError:
+            pass
+
+    # 开头的值已正常闭合、后面跟着说明文字时直接解析该值
+    if repaired is not None and not truncated:
+        try:
+            return json.loads(repaired)
+        except json.JSONDecodeError:
+            pass
 
     # 尝试提取 markdown 代码块
     json_block_pattern = r'```(?:json)?\s*([\s\S]*?)```'
@@ -445,23 +925,40 @@ def extract_json(content: str) -> Dict:
         except json.JSONDecodeError:
             continue
 
-    # 尝试查找 JSON 对象 {...}
-    brace_pattern = r'\{[\s\S]*\}'
-    brace_matches = re.findall(brace_pattern, content)
-    for match in brace_matches:
+    if not truncated:
+        # 尝试查找 JSON 对象 {...}
+        brace_pattern = r'\{[\s\S]*\}'
+        brace_matches = re.findall(brace_pattern, content)
+        for match in brace_matches:
+            try:
+                return json.loads(match)
+            except json.JSONDecodeError:
+                continue
+
+        # 尝试查找 JSON 数组 [...]
+        bracket_pattern = r'\[[\s\S]*\]'
+        bracket_matches = re.findall(bracket_pattern, content)
+        for match in bracket_matches:
+            try:
+                return json.loads(match)
+            except json.JSONDecodeError:
+                continue
+
+    # 尝试修复截断的 JSON（补齐过括号的结果带上截断标记，任何容器类型都可由 is_truncated_response 识别）
+    if repaired is None:
+        repaired, truncated = _repair_truncated_json(content)
+    if repaired is not None:
         try:
-            return json.loads(match)
+            result = json.loads(repaired)
         except json.JSONDecodeError:
-            continue
-
-    # 尝试查找 JSON 数组 [...]
-    bracket_pattern = r'\[[\s\S]*\]'
-    bracket_matches = re.findall(bracket_pattern, content)
-    for match in bracket_matches:
-        try:
-            return json.loads(match)
-        except json.JSONDecodeError:
-            continue
+            pass
+        else:
+            if truncated:
+                if isinstance(result, dict):
+                    result[TRUNCATED_MARKER] = True
+                elif isinstance(result, list):
+                    result = TruncatedList(result)
+            return result
 
     # 无法解析，返回原始内容
     return {"content": content}
@@ -13,10 +13,56 @@ Quote Consolidator Service - 引用整合服务 v2.2
 """
 
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from hashlib import blake2b
+from itertools import chain, groupby
+from operator import attrgetter
 import json
+import os
 import re
 import asyncio
+import threading
+
+from app.core.config import settings
+
+try:
+    from rapidfuzz import fuzz
+    RAPIDFUZZ_SUPPORT = True
+except ImportError:
+    RAPIDFUZZ_SUPPORT = False
+
+try:
+    from aiolimiter import AsyncLimiter
+    AIOLIMITER_SUPPORT = True
+except ImportError:
+    AIOLIMITER_SUPPORT = False
+
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+try:
+    from numba import njit
+    NUMBA_SUPPORT = True
+except ImportError:
+    NUMBA_SUPPORT = False
+
+    def njit(*args, **kwargs):
+        """numba 不可用时退化为普通 Python 函数"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 
 
 # =============================================
@@ -27,10 +73,18 @@ import asyncio
 Y_ADJACENT_THRESHOLD = 200      # y 坐标差值 (放宽到 200，原 50)
 X_OVERLAP_THRESHOLD = 20        # x 坐标重叠最小值 (降低到 20，原 100)
 SAME_COLUMN_X_DIFF = 400        # 同一列的 x 坐标最大差值 (放宽到 400，原 200)
+NEIGHBOR_WINDOW = 4             # 排序后每条引用只与其后的几条比较
 
 # 句子延续特征
 CONTINUATION_END_CHARS = [',', '，', ';', '；', ':', '：', '-', '–', '—']
 CONTINUATION_START_LOWER = True
+_CONTINUATION_END_SET = frozenset(CONTINUATION_END_CHARS)
+_SENTENCE_END_SET = frozenset('.。!！?？')
+# 以这些介词/连词结尾的引用可能是未完成的句子
+CONTINUATION_WORDS_SET = frozenset({'and', 'or', 'the', 'a', 'an', 'of', 'in', 'to', 'for', 'with', 'by'})
+
+# 表格数值 (金额、百分比等)
+_NUMERIC_VALUE_RE = re.compile(r'^[\d,.$%\s\-()]+$')
 
 # 整合后的最大长度
 MAX_CONSOLIDATED_LENGTH = 2000
@@ -40,13 +94,23 @@ LLM_MODEL = "qwen3:30b-a3b"
 LLM_TEMPERATURE = 0.3
 LLM_MAX_TOKENS = 16000
 
-# 分批配置 (顺序处理，不并发)
-BATCH_INTERVAL = 0.5  # 批次间隔秒数
+# 分批配置: 各批次并发发送，信号量限制同时在途的 LLM 请求数
+LLM_MAX_CONCURRENCY = 4
+# LLM 请求速率上限（令牌桶，仅在真正超过速率时等待；aiolimiter 不可用时只受并发数限制）
+LLM_REQUESTS_PER_SECOND = 2.0
+# 引用数不超过此值时跳过整个 LLM 流程（环境变量 CONSOLIDATION_SKIP_LLM_MAX_QUOTES）
+SMALL_QUOTE_SKIP_LLM = settings.consolidation_skip_llm_max_quotes
+
+# 材料级整合: 同时处理的材料数（每个材料内部再受 LLM_MAX_CONCURRENCY 限制）
+MAX_MATERIAL_CONCURRENCY = 3
 
+# 同步整合: 文档数超过此值时使用多进程并行（避免小任务的进程启动开销）
+PARALLEL_CONSOLIDATION_MIN_DOCS = 4
 
-@dataclass
+
+@dataclass(slots=True)
 class QuoteWithPosition:
-    """带位置信息的引用"""
+    """带位置信息的引用（slots: 分组时会创建大量实例）"""
     quote: str
     standard_key: str
     page: int
@@ -55,6 +119,27 @@ class QuoteWithPosition:
     file_name: str
     bbox: Optional[Dict[str, int]] = None
     relevance: str = ""
+    # bbox 坐标 (x1, y1, x2, y2)，构造时从 bbox 字典提取一次
+    bbox_tuple: Optional[Tuple[float, float, float, float]] = None
+    # 以下字段在构造时计算一次，避免分组时对每一对引用重复 strip
+    stripped: str = field(default="", init=False, repr=False)
+    first_char: str = field(default="", init=False, repr=False)
+    last_char: str = field(default="", init=False, repr=False)
+    # 引用最后一个词的小写形式（单词引用为空），用于句子延续判断
+    last_word_lower: str = field(default="", init=False, repr=False)
+
+    def __post_init__(self):
+        if self.bbox_tuple is None and self.bbox:
+            self.bbox_tuple = (
+                self.bbox["x1"], self.bbox["y1"], self.bbox["x2"], self.bbox["y2"]
+            )
+        self.stripped = self.quote.strip()
+        if self.stripped:
+            self.first_char = self.stripped[0]
+            self.last_char = self.stripped[-1]
+        words = self.stripped.rsplit(None, 1)
+        if len(words) == 2:
+            self.last_word_lower = words[1].lower()
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -101,13 +186,24 @@ def text_contains(longer: str, shorter: str, threshold: float = 0.9) -> bool:
     if not shorter or not longer:
         return False
 
-    norm_longer = normalize_text_for_comparison(longer)
-    norm_shorter = normalize_text_for_comparison(shorter)
+    return _normalized_contains(
+        normalize_text_for_comparison(longer),
+        normalize_text_for_comparison(shorter),
+        threshold
+    )
+
 
+def _normalized_contains(norm_longer: str, norm_shorter: str, threshold: float) -> bool:
+    """text_contains 的核心逻辑，输入为已标准化的文本"""
     # 如果 shorter 完全是 longer 的子串
     if norm_shorter in norm_longer:
         return True
 
+    # rapidfuzz 可用时使用 C 实现的局部匹配
+    if RAPIDFUZZ_SUPPORT:
+        cutoff = threshold * 100
+        return fuzz.partial_ratio(norm_shorter, norm_longer, score_cutoff=cutoff) >= cutoff
+
     # 基于词的包含检测
     shorter_words = set(norm_shorter.split())
     longer_words = set(norm_longer.split())
@@ -132,18 +228,41 @@ def text_similarity(text1: str, text2: str) -> float:
     if not text1 or not text2:
         return 0.0
 
-    norm1 = normalize_text_for_comparison(text1)
-    norm2 = normalize_text_for_comparison(text2)
+    return _normalized_similarity(
+        normalize_text_for_comparison(text1),
+        normalize_text_for_comparison(text2)
+    )
+
 
+def _normalized_similarity(norm1: str, norm2: str, min_similarity: float = 0.0) -> float:
+    """
+    text_similarity 的核心逻辑，输入为已标准化的文本
+
+    Args:
+        min_similarity: 调用方关心的最低相似度；确定达不到时提前返回 0.0
+    """
     if norm1 == norm2:
         return 1.0
 
+    # rapidfuzz 可用时使用 C 实现的相似度：
+    # token_set_ratio 只用于快速筛掉候选（子集关系会得满分，如 "smith" 与
+    # "john smith foundation"，不能作为最终分数），最终分数用整体比较的 token_sort_ratio
+    if RAPIDFUZZ_SUPPORT:
+        cutoff = min_similarity * 100
+        if min_similarity > 0 and not fuzz.token_set_ratio(norm1, norm2, score_cutoff=cutoff):
+            return 0.0
+        return fuzz.token_sort_ratio(norm1, norm2, score_cutoff=cutoff) / 100.0
+
     words1 = set(norm1.split())
     words2 = set(norm2.split())
 
     if not words1 or not words2:
         return 0.0
 
+    # 词数差距过大时 Jaccard 上界 (min / max) 已低于阈值
+    if min(len(words1), len(words2)) < min_similarity * max(len(words1), len(words2)):
+        return 0.0
+
     # Jaccard 相似度
     intersection = len(words1 & words2)
     union = len(words1 | words2)
@@ -151,6 +270,30 @@ def text_similarity(text1: str, text2: str) -> float:
     return intersection / union if union > 0 else 0.0
 
 
+def _pair_decision(
+    norm_longer: str,
+    norm_shorter: str,
+    containment_threshold: float,
+    similarity_threshold: float
+) -> Tuple[str, float]:
+    """
+    两条已标准化引用的去重判定
+
+    包含关系有方向性，调用方需按 (较长, 较短) 的顺序传入。
+
+    Returns:
+        ("containment", 1.0) / ("similarity", 相似度) / ("", 0.0)
+    """
+    if _normalized_contains(norm_longer, norm_shorter, containment_threshold):
+        return "containment", 1.0
+
+    sim = _normalized_similarity(norm_longer, norm_shorter, similarity_threshold)
+    if sim >= similarity_threshold:
+        return "similarity", sim
+
+    return "", 0.0
+
+
 def preprocess_containment_and_duplicates(
     quotes: List[Dict[str, Any]],
     similarity_threshold: float = 0.85,
@@ -183,10 +326,17 @@ def preprocess_containment_and_duplicates(
             by_standard[std] = []
         by_standard[std].append((i, q))
 
+    # 每条引用只标准化一次，避免在两两比较中重复处理
+    normalized = [normalize_text_for_comparison(q.get("quote", "")) for q in quotes]
+
     # 标记要删除的索引
     to_remove: set = set()
     merge_info: List[Dict] = []  # 记录合并信息
 
+    # 本次调用内的判定缓存（重复出现的相同文本对只判定一次）；键引用 normalized 中的字符串，
+    # 调用结束即释放，不跨项目保留引用全文
+    pair_decisions: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
     for std, indexed_quotes in by_standard.items():
         n = len(indexed_quotes)
         if n <= 1:
@@ -208,28 +358,24 @@ def preprocess_containment_and_duplicates(
                     continue
 
                 text_j = q_j.get("quote", "")
-
-                # 检查包含关系：较长的 text_i 是否包含较短的 text_j
-                if text_contains(text_i, text_j, containment_threshold):
-                    to_remove.add(idx_j)
-                    merge_info.append({
-                        "kept": idx_i,
-                        "removed": idx_j,
-                        "reason": "containment",
-                        "kept_text": text_i[:50],
-                        "removed_text": text_j[:50]
-                    })
+                if not text_i or not text_j:
                     continue
 
-                # 检查高度相似
-                sim = text_similarity(text_i, text_j)
-                if sim >= similarity_threshold:
+                # 检查包含关系（较长的 text_i 是否包含较短的 text_j）与高度相似
+                pair = (normalized[idx_i], normalized[idx_j])
+                decision = pair_decisions.get(pair)
+                if decision is None:
+                    decision = pair_decisions[pair] = _pair_decision(
+                        *pair, containment_threshold, similarity_threshold
+                    )
+                kind, sim = decision
+                if kind:
                     # 保留较长的（text_i 已经更长）
                     to_remove.add(idx_j)
                     merge_info.append({
                         "kept": idx_i,
                         "removed": idx_j,
-                        "reason": f"similarity_{sim:.2f}",
+                        "reason": "containment" if kind == "containment" else f"similarity_{sim:.2f}",
                         "kept_text": text_i[:50],
                         "removed_text": text_j[:50]
                     })
@@ -266,6 +412,15 @@ def preprocess_containment_and_duplicates(
 # Step 2: 硬编码粗筛 (v2.2 新设计)
 # =============================================
 
+def _position_sort_key(q: Dict[str, Any]) -> Tuple[str, int, float]:
+    """原始引用字典的位置排序键（文档、页码、y 坐标），与分组扫描的排序一致"""
+    return (
+        q.get("source", {}).get("document_id", ""),
+        q.get("page", 1),
+        q["bbox"]["y1"] if q.get("bbox") else 0
+    )
+
+
 def generate_candidate_groups(
     quotes: List[Dict[str, Any]],
     max_group_size: int = 5
@@ -290,6 +445,19 @@ def generate_candidate_groups(
     if not quotes:
         return [], []
 
+    # 快速路径: 每个 (文档, 标准) 下最多一条引用时不可能成组，
+    # 跳过对象构造和邻近扫描，按相同的排序直接输出独立引用
+    pair_counts = Counter(
+        (q.get("source", {}).get("document_id", ""), q.get("standard_key", "other"))
+        for q in quotes
+    )
+    if max(pair_counts.values()) < 2:
+        ordered = sorted(quotes, key=_position_sort_key)
+        return [], [
+            {"item_id": f"s{k}", "quote": q, "type": "single"}
+            for k, q in enumerate(ordered, 1)
+        ]
+
     # 转换为 QuoteWithPosition 对象
     positioned_quotes = []
     for i, q in enumerate(quotes):
@@ -323,20 +491,32 @@ def generate_candidate_groups(
     parent = list(range(n))
 
     def find(x):
-        if parent[x] != x:
-            parent[x] = find(parent[x])
-        return parent[x]
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        # 路径压缩
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
 
     def union(x, y):
         px, py = find(x), find(y)
         if px != py:
             parent[px] = py
 
+    quote_objs = [pq["quote_obj"] for pq in positioned_quotes]
+
+    # 预先向量化计算窗口内所有引用对的 bbox 规则码
+    bbox_rules = None
+    if NUMPY_SUPPORT:
+        bboxes, has_bbox, pages = _build_bbox_arrays(quote_objs)
+        bbox_rules = _window_bbox_rules(bboxes, has_bbox, pages, NEIGHBOR_WINDOW)
+
     # 检查相邻引用是否可能需要整合
     for i in range(n):
-        for j in range(i + 1, min(i + 5, n)):  # 只检查相邻的几条
-            qi = positioned_quotes[i]["quote_obj"]
-            qj = positioned_quotes[j]["quote_obj"]
+        for j in range(i + 1, min(i + NEIGHBOR_WINDOW + 1, n)):  # 只检查相邻的几条
+            qi = quote_objs[i]
+            qj = quote_objs[j]
 
             # 不同文档不分组
             if qi.document_id != qj.document_id:
@@ -347,7 +527,8 @@ def generate_candidate_groups(
                 continue
 
             # 检查是否可能需要整合
-            reason, confidence = _check_grouping_reason(qi, qj)
+            bbox_rule = int(bbox_rules[i, j - i - 1]) if bbox_rules is not None else None
+            reason, confidence = _check_grouping_reason(qi, qj, bbox_rule)
             if reason:
                 union(i, j)
 
@@ -383,7 +564,8 @@ def generate_candidate_groups(
                         "quotes": quotes_in_group,
                         "reason": reason,
                         "confidence": confidence,
-                        "type": "group"
+                        "type": "group",
+                        "min_page": min(q.get("page", 1) for q in quotes_in_group)
                     })
                 else:
                     # 单条变成独立引用
@@ -405,13 +587,116 @@ def generate_candidate_groups(
     return candidate_groups, single_quotes
 
 
+# _bbox_rule 返回码 -> (reason, confidence)
+_BBOX_RULE_RESULTS = (
+    (None, ""),
+    ("same_text_block", "very_high"),
+    ("same_visual_block", "high"),
+    ("adjacent_page", "medium"),
+)
+
+
+@njit(cache=True)
+def _bbox_rule(x1a, y1a, x2a, y2a, x1b, y1b, x2b, y2b, same_page, adjacent_page):
+    """
+    基于 bbox 坐标判断两个引用的位置关系（纯数值运算，numba 可用时 JIT 编译）
+
+    Returns:
+        0=无匹配, 1=same_text_block, 2=same_visual_block, 3=adjacent_page
+    """
+    if same_page:
+        # 同一 BBox (来自同一 OCR 文本块)，允许少量像素误差
+        if (abs(x1a - x1b) <= 10 and abs(y1a - y1b) <= 10 and
+                abs(x2a - x2b) <= 10 and abs(y2a - y2b) <= 10):
+            return 1
+
+        # 同一视觉块
+        y_diff = abs(y1b - y2a)
+        if y_diff <= Y_ADJACENT_THRESHOLD:
+            x_overlap = min(x2a, x2b) - max(x1a, x1b)
+            if x_overlap >= X_OVERLAP_THRESHOLD:
+                return 2
+
+    # 跨页情况
+    if adjacent_page:
+        if y2a > 700 and y1b < 300 and abs(x1a - x1b) < SAME_COLUMN_X_DIFF:
+            return 3
+
+    return 0
+
+
+def _build_bbox_arrays(
+    quotes: List[QuoteWithPosition]
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    将引用的 bbox / 页码转换为 SoA 布局的 numpy 数组
+
+    Returns:
+        (bboxes, has_bbox, pages)
+        - bboxes: (n, 4) float64 数组，列为 x1, y1, x2, y2；无 bbox 的行为 -1
+          （OCR 坐标可能是小数，用整数数组会截断，阈值比较与标量路径 _bbox_rule 不一致）
+        - has_bbox: (n,) bool 数组
+        - pages: (n,) int32 数组
+    """
+    n = len(quotes)
+    bboxes = np.full((n, 4), -1, dtype=np.float64)
+    has_bbox = np.zeros(n, dtype=bool)
+    for i, q in enumerate(quotes):
+        if q.bbox_tuple:
+            bboxes[i] = q.bbox_tuple
+            has_bbox[i] = True
+    pages = np.fromiter((q.page for q in quotes), dtype=np.int32, count=n)
+    return bboxes, has_bbox, pages
+
+
+def _window_bbox_rules(
+    bboxes: "np.ndarray",
+    has_bbox: "np.ndarray",
+    pages: "np.ndarray",
+    window: int
+) -> "np.ndarray":
+    """
+    向量化计算每条引用与其后 window 条引用的 bbox 规则码（与 _bbox_rule 一致）
+
+    Returns:
+        形状 (n, window) 的数组，rules[i, k - 1] 为 (i, i + k) 的规则码
+    """
+    n = len(bboxes)
+    rules = np.zeros((n, window), dtype=np.int8)
+    for k in range(1, min(window, n - 1) + 1):
+        a, b = bboxes[:-k], bboxes[k:]
+        same_page = pages[:-k] == pages[k:]
+
+        same_text_block = same_page & (np.abs(a - b) <= 10).all(axis=1)
+
+        y_diff = np.abs(b[:, 1] - a[:, 3])
+        x_overlap = np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0])
+        same_visual_block = same_page & (y_diff <= Y_ADJACENT_THRESHOLD) & (x_overlap >= X_OVERLAP_THRESHOLD)
+
+        adjacent_page = (
+            (pages[:-k] == pages[k:] - 1) &
+            (a[:, 3] > 700) & (b[:, 1] < 300) &
+            (np.abs(a[:, 0] - b[:, 0]) < SAME_COLUMN_X_DIFF)
+        )
+
+        codes = np.select([same_text_block, same_visual_block, adjacent_page], [1, 2, 3], 0)
+        rules[:n - k, k - 1] = np.where(has_bbox[:-k] & has_bbox[k:], codes, 0)
+
+    return rules
+
+
 def _check_grouping_reason(
     q1: QuoteWithPosition,
-    q2: QuoteWithPosition
+    q2: QuoteWithPosition,
+    bbox_rule: Optional[int] = None
 ) -> Tuple[Optional[str], str]:
     """
     检查两个引用是否应该分到同一组
 
+    Args:
+        q1, q2: 待比较的引用
+        bbox_rule: 预先计算的 bbox 规则码（None 表示在此计算）
+
     Returns:
         (reason, confidence) 或 (None, "")
     """
@@ -420,48 +705,29 @@ def _check_grouping_reason(
     if page_diff > 1:
         return None, ""
 
-    # 0. 同一 BBox (来自同一 OCR 文本块) - 最高优先级
-    if q1.bbox and q2.bbox and q1.page == q2.page:
-        # Check if bboxes are identical or nearly identical (same OCR text block)
-        bbox_match_threshold = 10  # Allow small pixel differences
-        if (abs(q1.bbox["x1"] - q2.bbox["x1"]) <= bbox_match_threshold and
-            abs(q1.bbox["y1"] - q2.bbox["y1"]) <= bbox_match_threshold and
-            abs(q1.bbox["x2"] - q2.bbox["x2"]) <= bbox_match_threshold and
-            abs(q1.bbox["y2"] - q2.bbox["y2"]) <= bbox_match_threshold):
-            return "same_text_block", "very_high"
-
-    # 1. 同一视觉块 (基于位置)
-    if q1.bbox and q2.bbox:
-        if q1.page == q2.page:
-            y_diff = abs(q2.bbox["y1"] - q1.bbox["y2"])
-            if y_diff >= 0 and y_diff <= Y_ADJACENT_THRESHOLD:
-                x_overlap = min(q1.bbox["x2"], q2.bbox["x2"]) - max(q1.bbox["x1"], q2.bbox["x1"])
-                if x_overlap >= X_OVERLAP_THRESHOLD:
-                    return "same_visual_block", "high"
-
-        # 跨页情况
-        if q1.page == q2.page - 1:
-            if q1.bbox["y2"] > 700 and q2.bbox["y1"] < 300:
-                x_diff = abs(q1.bbox["x1"] - q2.bbox["x1"])
-                if x_diff < SAME_COLUMN_X_DIFF:
-                    return "adjacent_page", "medium"
+    # 0-1. 基于 bbox 的位置规则 (同一文本块 / 同一视觉块 / 跨页)
+    if bbox_rule is None and q1.bbox_tuple and q2.bbox_tuple:
+        x1a, y1a, x2a, y2a = q1.bbox_tuple
+        x1b, y1b, x2b, y2b = q2.bbox_tuple
+        bbox_rule = _bbox_rule(
+            x1a, y1a, x2a, y2a, x1b, y1b, x2b, y2b,
+            q1.page == q2.page, q1.page == q2.page - 1
+        )
+    if bbox_rule:
+        return _BBOX_RULE_RESULTS[bbox_rule]
 
     # 2. 句子延续
-    text1 = q1.quote.strip()
-    text2 = q2.quote.strip()
-
-    if text1 and text2:
+    if q1.stripped and q2.stripped:
         # q1 不以句号结尾
-        if text1[-1] not in '.。!！?？':
+        if q1.last_char not in _SENTENCE_END_SET:
             # q1 以延续标点结尾
-            if text1[-1] in CONTINUATION_END_CHARS:
+            if q1.last_char in _CONTINUATION_END_SET:
                 return "sentence_continuation", "high"
             # q2 以小写开头
-            if text2[0].islower():
+            if q2.first_char.islower():
                 return "sentence_continuation", "medium"
             # q1 以介词/连词结尾
-            continuation_words = ['and', 'or', 'the', 'a', 'an', 'of', 'in', 'to', 'for', 'with', 'by']
-            if any(text1.lower().endswith(' ' + w) for w in continuation_words):
+            if q1.last_word_lower in CONTINUATION_WORDS_SET:
                 return "sentence_continuation", "medium"
 
     # 3. 表格 header-value 对
@@ -473,8 +739,8 @@ def _check_grouping_reason(
 
 def _is_table_pair(q1: QuoteWithPosition, q2: QuoteWithPosition) -> bool:
     """检查是否是表格 header-value 对"""
-    text1 = q1.quote.strip()
-    text2 = q2.quote.strip()
+    text1 = q1.stripped
+    text2 = q2.stripped
 
     if len(text1) > 50:
         return False
@@ -485,7 +751,7 @@ def _is_table_pair(q1: QuoteWithPosition, q2: QuoteWithPosition) -> bool:
         (not any(c.isdigit() for c in text1) and len(text1) < 30)
     )
 
-    is_numeric = bool(re.match(r'^[\d,.$%\s\-()]+$', text2.replace(',', '')))
+    is_numeric = bool(_NUMERIC_VALUE_RE.match(text2))
     is_short_value = len(text2) < 50
 
     return is_field_name and (is_numeric or is_short_value)
@@ -567,42 +833,83 @@ result 字段规则:
 """
 
 
+# prompt 中每个项目的文本模板
+_GROUP_HEADER_TMPL = "\n### [{item_id}] 候选整合组 (置信度: {confidence})\n分组原因: {reason}"
+_GROUP_QUOTE_TMPL = "\n  Quote {num} (Page {page}):\n    文本: {text}\n    类别: {category}"
+_GROUP_RELEVANCE_TMPL = "\n    相关性: {relevance}"
+_SINGLE_TMPL = "\n### [{item_id}] 独立引用\n  Page: {page}\n  文本: {text}\n  类别: {category}"
+_SINGLE_RELEVANCE_TMPL = "\n  相关性: {relevance}"
+
+
+def _format_group_quote(num: int, q: Dict[str, Any]) -> str:
+    """格式化候选组中的单条引用"""
+    text = _GROUP_QUOTE_TMPL.format(
+        num=num,
+        page=q.get("page", "?"),
+        text=q.get("quote", "")[:500],
+        category=q.get("standard_key", "unknown")
+    )
+    relevance = q.get("relevance")
+    if relevance:
+        text += _GROUP_RELEVANCE_TMPL.format(relevance=relevance[:200])
+    return text
+
+
+def _format_item(item: Dict[str, Any]) -> str:
+    """格式化单个项目（候选组或独立引用）"""
+    item_id = item.get("group_id") or item.get("item_id")
+
+    if item.get("type", "group") == "group":
+        header = _GROUP_HEADER_TMPL.format(
+            item_id=item_id,
+            confidence=item.get("confidence", "unknown"),
+            reason=item.get("reason", "unknown")
+        )
+        return "\n".join([header] + [
+            _format_group_quote(i, q) for i, q in enumerate(item.get("quotes", []), 1)
+        ])
+
+    quote = item.get("quote", {})
+    text = _SINGLE_TMPL.format(
+        item_id=item_id,
+        page=quote.get("page", "?"),
+        text=quote.get("quote", "")[:500],
+        category=quote.get("standard_key", "unknown")
+    )
+    relevance = quote.get("relevance")
+    if relevance:
+        text += _SINGLE_RELEVANCE_TMPL.format(relevance=relevance[:200])
+    return text
+
+
 def format_items_for_prompt(items: List[Dict[str, Any]]) -> str:
     """格式化项目列表为 prompt 文本"""
-    text_parts = []
+    return "\n".join(_format_item(item) for item in items)
+
 
-    for item in items:
-        item_type = item.get("type", "group")
-        item_id = item.get("group_id") or item.get("item_id")
+def _loads_json(text: str) -> Any:
+    """解析 JSON，优先使用 orjson；失败时回退到标准库以保留原有错误信息"""
+    if ORJSON_SUPPORT:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
 
-        if item_type == "group":
-            quotes = item.get("quotes", [])
-            text_parts.append(f"\n### [{item_id}] 候选整合组 (置信度: {item.get('confidence', 'unknown')})")
-            text_parts.append(f"分组原因: {item.get('reason', 'unknown')}")
 
-            for i, q in enumerate(quotes):
-                text_parts.append(f"\n  Quote {i+1} (Page {q.get('page', '?')}):")
-                text_parts.append(f"    文本: {q.get('quote', '')[:500]}")
-                text_parts.append(f"    类别: {q.get('standard_key', 'unknown')}")
-                if q.get("relevance"):
-                    text_parts.append(f"    相关性: {q.get('relevance', '')[:200]}")
+_llm_rate_limiter = AsyncLimiter(LLM_REQUESTS_PER_SECOND, 1.0) if AIOLIMITER_SUPPORT else None
 
-        else:  # single
-            quote = item.get("quote", {})
-            text_parts.append(f"\n### [{item_id}] 独立引用")
-            text_parts.append(f"  Page: {quote.get('page', '?')}")
-            text_parts.append(f"  文本: {quote.get('quote', '')[:500]}")
-            text_parts.append(f"  类别: {quote.get('standard_key', 'unknown')}")
-            if quote.get("relevance"):
-                text_parts.append(f"  相关性: {quote.get('relevance', '')[:200]}")
 
-    return "\n".join(text_parts)
+def _batch_cache_key(prompt: str, model: str) -> str:
+    """批次决策缓存键: prompt 已包含模板和全部批次内容，加上模型名即可唯一确定"""
+    return blake2b(f"{model}\n{prompt}".encode("utf-8"), digest_size=16).hexdigest()
 
 
 async def process_consolidation_batch(
     batch: List[Dict[str, Any]],
     call_llm_func,
-    model: str = LLM_MODEL
+    model: str = LLM_MODEL,
+    cache_project_id: Optional[str] = None
 ) -> Tuple[List[Dict[str, Any]], str, Optional[str]]:
     """
     处理一批候选组/独立引用
@@ -611,6 +918,7 @@ async def process_consolidation_batch(
         batch: 项目列表 (候选组 + 独立引用)
         call_llm_func: LLM 调用函数 (async def call_llm(prompt, model) -> dict)
         model: 使用的模型
+        cache_project_id: 提供时启用该项目的批次决策缓存，命中则跳过 LLM 调用
 
     Returns:
         (decisions, prompt, error)
@@ -622,9 +930,22 @@ async def process_consolidation_batch(
     items_text = format_items_for_prompt(batch)
     prompt = CONSOLIDATION_PROMPT.format(items_text=items_text)
 
+    cache_key = None
+    if cache_project_id:
+        from app.services.consolidation_archive import load_cached_decisions
+
+        cache_key = _batch_cache_key(prompt, model)
+        cached = load_cached_decisions(cache_project_id, cache_key)
+        if cached is not None:
+            return cached, prompt, None
+
     try:
-        # 调用 LLM
-        response = await call_llm_func(prompt, model_override=model)
+        # 调用 LLM（令牌桶限速）
+        if _llm_rate_limiter is not None:
+            async with _llm_rate_limiter:
+                response = await call_llm_func(prompt, model_override=model)
+        else:
+            response = await call_llm_func(prompt, model_override=model)
 
         # 解析响应
         if isinstance(response, dict):
@@ -638,7 +959,7 @@ async def process_consolidation_batch(
                 decisions = [response]
         elif isinstance(response, str):
             # 尝试解析 JSON
-            decisions = json.loads(response)
+            decisions = _loads_json(response)
         else:
             decisions = list(response) if hasattr(response, '__iter__') else [response]
 
@@ -646,6 +967,14 @@ async def process_consolidation_batch(
         if not isinstance(decisions, list):
             decisions = [decisions]
 
+        if cache_key:
+            from app.services.consolidation_archive import save_cached_decisions
+
+            try:
+                save_cached_decisions(cache_project_id, cache_key, decisions)
+            except Exception as e:
+                print(f"[QuoteConsolidator] Warning: Could not cache batch decisions: {e}")
+
         return decisions, prompt, None
 
     except json.JSONDecodeError as e:
@@ -654,6 +983,88 @@ async def process_consolidation_batch(
         return [], prompt, f"LLM call error: {str(e)}"
 
 
+def _group_min_page(group: Dict[str, Any]) -> int:
+    """候选组的最小页码（生成候选组时已预先计算）"""
+    if "min_page" in group:
+        return group["min_page"]
+    return min(q.get("page", 1) for q in group["quotes"])
+
+
+def _rewrite_group(
+    group: Dict[str, Any],
+    decision: Dict[str, Any],
+    decision_type: str
+) -> List[Dict[str, Any]]:
+    """merge / adjust: 用 LLM 给出的文本替换整个候选组"""
+    result = decision.get("result", {})
+    first_quote = group["quotes"][0]
+    prefix = "merged" if decision_type == "merge" else "adjusted"
+    return [{
+        "quote": result.get(f"{prefix}_quote", first_quote.get("quote", "")),
+        "standard_key": first_quote.get("standard_key", "other"),
+        "page": _group_min_page(group),
+        "relevance": result.get(f"{prefix}_relevance", ""),
+        "source": first_quote.get("source", {}),
+        "consolidated_count": len(group["quotes"]),
+        "consolidation_reason": decision.get("reason", ""),
+        "llm_decision": decision_type
+    }]
+
+
+# keep / approve 时附加到原始引用上的字段（dict | 运算走 C 层快速路径）
+_KEEP_MARK = {"llm_decision": "keep"}
+_APPROVE_MARK = {"llm_decision": "approve"}
+
+
+def _handle_merge_group(group: Dict[str, Any], decision: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return _rewrite_group(group, decision, "merge")
+
+
+def _handle_adjust_group(group: Dict[str, Any], decision: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # 调整（通常是调整单个合并结果）
+    return _rewrite_group(group, decision, "adjust")
+
+
+def _handle_keep_group(group: Dict[str, Any], decision: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # keep - 保留原始引用
+    return [q | _KEEP_MARK for q in group["quotes"]]
+
+
+def _handle_reject_single(quote: Dict[str, Any], decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # 拒绝 - 不添加
+    return None
+
+
+def _handle_adjust_single(quote: Dict[str, Any], decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    result = decision.get("result", {})
+    return {
+        "quote": result.get("adjusted_quote", quote.get("quote", "")),
+        "standard_key": quote.get("standard_key", "other"),
+        "page": quote.get("page", 1),
+        "relevance": result.get("adjusted_relevance", quote.get("relevance", "")),
+        "source": quote.get("source", {}),
+        "llm_decision": "adjust"
+    }
+
+
+def _handle_approve_single(quote: Dict[str, Any], decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # approve - 保留原样
+    return quote | _APPROVE_MARK
+
+
+# 决策类型 -> 处理函数（未知类型分别按 keep / approve 处理）
+_GROUP_HANDLERS = {
+    "merge": _handle_merge_group,
+    "adjust": _handle_adjust_group,
+    "keep": _handle_keep_group,
+}
+_SINGLE_HANDLERS = {
+    "reject": _handle_reject_single,
+    "adjust": _handle_adjust_single,
+    "approve": _handle_approve_single,
+}
+
+
 def apply_decisions(
     candidate_groups: List[Dict[str, Any]],
     single_quotes: List[Dict[str, Any]],
@@ -681,73 +1092,17 @@ def apply_decisions(
 
     # 处理候选组
     for group in candidate_groups:
-        group_id = group.get("group_id")
-        decision = decision_map.get(group_id, {})
-        decision_type = decision.get("decision", "keep")
-
-        if decision_type == "merge":
-            # 合并
-            result = decision.get("result", {})
-            first_quote = group["quotes"][0]
-            final_quotes.append({
-                "quote": result.get("merged_quote", first_quote.get("quote", "")),
-                "standard_key": first_quote.get("standard_key", "other"),
-                "page": min(q.get("page", 1) for q in group["quotes"]),
-                "relevance": result.get("merged_relevance", ""),
-                "source": first_quote.get("source", {}),
-                "consolidated_count": len(group["quotes"]),
-                "consolidation_reason": decision.get("reason", ""),
-                "llm_decision": "merge"
-            })
-        elif decision_type == "adjust":
-            # 调整（通常是调整单个合并结果）
-            result = decision.get("result", {})
-            first_quote = group["quotes"][0]
-            final_quotes.append({
-                "quote": result.get("adjusted_quote", first_quote.get("quote", "")),
-                "standard_key": first_quote.get("standard_key", "other"),
-                "page": min(q.get("page", 1) for q in group["quotes"]),
-                "relevance": result.get("adjusted_relevance", ""),
-                "source": first_quote.get("source", {}),
-                "consolidated_count": len(group["quotes"]),
-                "consolidation_reason": decision.get("reason", ""),
-                "llm_decision": "adjust"
-            })
-        else:
-            # keep - 保留原始引用
-            for q in group["quotes"]:
-                final_quotes.append({
-                    **q,
-                    "llm_decision": "keep"
-                })
+        decision = decision_map.get(group.get("group_id"), {})
+        handler = _GROUP_HANDLERS.get(decision.get("decision", "keep"), _handle_keep_group)
+        final_quotes.extend(handler(group, decision))
 
     # 处理独立引用
     for single in single_quotes:
-        item_id = single.get("item_id")
-        quote = single.get("quote", {})
-        decision = decision_map.get(item_id, {})
-        decision_type = decision.get("decision", "approve")
-
-        if decision_type == "reject":
-            # 拒绝 - 不添加
-            continue
-        elif decision_type == "adjust":
-            # 调整
-            result = decision.get("result", {})
-            final_quotes.append({
-                "quote": result.get("adjusted_quote", quote.get("quote", "")),
-                "standard_key": quote.get("standard_key", "other"),
-                "page": quote.get("page", 1),
-                "relevance": result.get("adjusted_relevance", quote.get("relevance", "")),
-                "source": quote.get("source", {}),
-                "llm_decision": "adjust"
-            })
-        else:
-            # approve - 保留原样
-            final_quotes.append({
-                **quote,
-                "llm_decision": "approve"
-            })
+        decision = decision_map.get(single.get("item_id"), {})
+        handler = _SINGLE_HANDLERS.get(decision.get("decision", "approve"), _handle_approve_single)
+        result = handler(single.get("quote", {}), decision)
+        if result is not None:
+            final_quotes.append(result)
 
     return final_quotes
 
@@ -756,6 +1111,18 @@ def apply_decisions(
 # 完整整合流程 (v2.2)
 # =============================================
 
+async def _archive_writer(archive: Any, queue: asyncio.Queue):
+    """存档写入协程: 依次取出 (方法名, 参数)，在线程池中调用对应的 archive.save_*"""
+    while True:
+        method_name, args = await queue.get()
+        try:
+            await asyncio.to_thread(getattr(archive, method_name), *args)
+        except Exception as e:
+            print(f"[QuoteConsolidator] Warning: Could not {method_name}: {e}")
+        finally:
+            queue.task_done()
+
+
 async def consolidate_quotes_v2(
     quotes: List[Dict[str, Any]],
     call_llm_func,
@@ -774,121 +1141,153 @@ async def consolidate_quotes_v2(
     Returns:
         (整合后的引用列表, 统计信息)
     """
-    from app.services.token_estimator import split_into_batches, estimate_batch_stats
+    from app.services.token_estimator import (
+        split_into_batches_by_output_length, estimate_batch_stats, estimate_items_tokens
+    )
     from app.services.consolidation_archive import ConsolidationArchive
 
     original_count = len(quotes)
 
+    # 引用太少时预处理 + 分批 + LLM 全是开销，直接返回（也不写存档）
+    if original_count <= SMALL_QUOTE_SKIP_LLM:
+        return quotes, {
+            "original_count": original_count,
+            "final_count": original_count,
+            "method": "skip_small",
+            "llm_coverage": 0
+        }
+
     # 初始化存档器
     archive = None
     if project_id:
         try:
             archive = ConsolidationArchive(project_id)
-            archive.save_original_quotes(quotes)
+            archive.open_run()
         except Exception as e:
+            archive = None
             print(f"[QuoteConsolidator] Warning: Could not initialize archive: {e}")
 
-    # Step 1.5: 包含关系预处理 (v2.3 新增)
-    # 在同一 standard_key 内，移除被其他引用包含的重复引用
-    quotes, containment_stats = preprocess_containment_and_duplicates(quotes)
-    after_containment_count = len(quotes)
+    # 存档写入进入队列，由单独的写入协程在线程池中追加到本次运行的 JSONL，不阻塞 LLM 批次调度
+    archive_queue: Optional[asyncio.Queue] = None
+    archive_writer = None
+    if archive:
+        archive_queue = asyncio.Queue()
+        archive_writer = asyncio.create_task(_archive_writer(archive, archive_queue))
 
-    if archive and containment_stats.get("removed", 0) > 0:
-        try:
-            archive.save_containment_preprocessing(containment_stats)
-        except Exception as e:
-            print(f"[QuoteConsolidator] Warning: Could not save containment stats: {e}")
+    def save_to_archive(method_name: str, *args):
+        if archive_queue is not None:
+            archive_queue.put_nowait((method_name, args))
 
-    # Step 2: 硬编码粗筛
-    candidate_groups, single_quotes = generate_candidate_groups(quotes)
+    save_to_archive("save_original_quotes", quotes)
 
-    if archive:
-        try:
-            archive.save_candidate_groups(candidate_groups, single_quotes)
-        except Exception as e:
-            print(f"[QuoteConsolidator] Warning: Could not save candidate groups: {e}")
+    try:
+        # Step 1.5: 包含关系预处理 (v2.3 新增)
+        # 在同一 standard_key 内，移除被其他引用包含的重复引用
+        # 纯 CPU 步骤放到线程池执行，避免阻塞事件循环（其他材料的 LLM 请求可继续推进）
+        quotes, containment_stats = await asyncio.to_thread(preprocess_containment_and_duplicates, quotes)
+        after_containment_count = len(quotes)
 
-    # 合并候选组和独立引用为统一列表
-    all_items = candidate_groups + single_quotes
+        if containment_stats.get("removed", 0) > 0:
+            save_to_archive("save_containment_preprocessing", containment_stats)
 
-    if not all_items:
-        return quotes, {
-            "original_count": original_count,
-            "final_count": original_count,
-            "method": "no_processing",
-            "llm_coverage": 0
-        }
+        # Step 2: 硬编码粗筛
+        candidate_groups, single_quotes = await asyncio.to_thread(generate_candidate_groups, quotes)
 
-    # Step 3: 分批
-    batches = split_into_batches(all_items)
-    batch_stats = estimate_batch_stats(batches)
+        save_to_archive("save_candidate_groups", candidate_groups, single_quotes)
 
-    if archive:
-        try:
-            archive.save_batch_info(batches, batch_stats)
-        except Exception as e:
-            print(f"[QuoteConsolidator] Warning: Could not save batch info: {e}")
+        # 合并候选组和独立引用为统一列表
+        all_items = candidate_groups + single_quotes
 
-    print(f"[QuoteConsolidator] Split into {len(batches)} batches")
-    print(f"[QuoteConsolidator] Total items: {len(all_items)} ({len(candidate_groups)} groups + {len(single_quotes)} singles)")
+        if not all_items:
+            return quotes, {
+                "original_count": original_count,
+                "final_count": original_count,
+                "method": "no_processing",
+                "llm_coverage": 0
+            }
 
-    # Step 4: LLM 决策 (逐批处理)
-    all_decisions = []
-    llm_errors = []
+        # Step 3: 分批（按预测响应长度分桶）
+        # 每个项目只估算一次 token，分批与统计共用
+        token_counts = await asyncio.to_thread(estimate_items_tokens, all_items)
+        batches = split_into_batches_by_output_length(all_items, token_counts=token_counts)
+        batch_stats = estimate_batch_stats(batches, token_counts)
 
-    for batch_idx, batch in enumerate(batches):
-        print(f"[QuoteConsolidator] Processing batch {batch_idx + 1}/{len(batches)}...")
+        save_to_archive("save_batch_info", batches, batch_stats)
 
-        decisions, prompt, error = await process_consolidation_batch(
-            batch, call_llm_func, model
-        )
+        print(f"[QuoteConsolidator] Split into {len(batches)} batches")
+        print(f"[QuoteConsolidator] Total items: {len(all_items)} ({len(candidate_groups)} groups + {len(single_quotes)} singles)")
 
-        if archive:
-            try:
-                archive.save_llm_batch_response(
-                    batch_idx + 1, batch, prompt, None, decisions, error
+        # Step 4: LLM 决策 (并发处理各批次；有存档时启用批次决策缓存)
+        semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        cache_project_id = project_id if archive else None
+
+        async def run_batch(batch_idx: int, batch: List[Dict[str, Any]]):
+            async with semaphore:
+                print(f"[QuoteConsolidator] Processing batch {batch_idx + 1}/{len(batches)}...")
+                return await process_consolidation_batch(
+                    batch, call_llm_func, model, cache_project_id=cache_project_id
                 )
-            except Exception as e:
-                print(f"[QuoteConsolidator] Warning: Could not save batch response: {e}")
 
-        if error:
-            llm_errors.append({"batch": batch_idx + 1, "error": error})
-            print(f"[QuoteConsolidator] Batch {batch_idx + 1} error: {error}")
-        else:
-            all_decisions.extend(decisions)
+        # 所有批次立即提交（信号量控制在途数量），按批次顺序逐个等待：
+        # 前面的批次一完成就写存档、汇总决策，不必等全部结束
+        batch_tasks = [
+            asyncio.create_task(run_batch(i, batch)) for i, batch in enumerate(batches)
+        ]
 
-        # 批次间隔
-        if batch_idx < len(batches) - 1:
-            await asyncio.sleep(BATCH_INTERVAL)
+        all_decisions = []
+        llm_errors = []
 
-    # Step 5: 应用决策
-    final_quotes = apply_decisions(candidate_groups, single_quotes, all_decisions)
-    final_count = len(final_quotes)
+        try:
+            for batch_idx, (batch, task) in enumerate(zip(batches, batch_tasks)):
+                try:
+                    decisions, prompt, error = await task
+                except Exception as e:
+                    decisions, prompt, error = [], "", f"LLM call error: {e}"
+
+                save_to_archive(
+                    "save_llm_batch_response", batch_idx + 1, batch, prompt, None, decisions, error
+                )
 
-    # 统计
-    stats = {
-        "original_count": original_count,
-        "after_containment": after_containment_count,
-        "containment_removed": original_count - after_containment_count,
-        "candidate_groups": len(candidate_groups),
-        "single_quotes": len(single_quotes),
-        "total_batches": len(batches),
-        "decisions_received": len(all_decisions),
-        "llm_errors": len(llm_errors),
-        "final_count": final_count,
-        "reduction_rate": round((1 - final_count / original_count) * 100, 1) if original_count > 0 else 0,
-        "llm_coverage": round(len(all_decisions) / len(all_items) * 100, 1) if all_items else 0,
-        "method": "llm_led_v2.3"
-    }
+                if error:
+                    llm_errors.append({"batch": batch_idx + 1, "error": error})
+                    print(f"[QuoteConsolidator] Batch {batch_idx + 1} error: {error}")
+                else:
+                    all_decisions.extend(decisions)
+        finally:
+            # 被取消或中途出错时，不留下仍在运行的批次
+            for task in batch_tasks:
+                if not task.done():
+                    task.cancel()
+
+        # Step 5: 应用决策
+        final_quotes = await asyncio.to_thread(apply_decisions, candidate_groups, single_quotes, all_decisions)
+        final_count = len(final_quotes)
+
+        # 统计
+        stats = {
+            "original_count": original_count,
+            "after_containment": after_containment_count,
+            "containment_removed": original_count - after_containment_count,
+            "candidate_groups": len(candidate_groups),
+            "single_quotes": len(single_quotes),
+            "total_batches": len(batches),
+            "decisions_received": len(all_decisions),
+            "llm_errors": len(llm_errors),
+            "final_count": final_count,
+            "reduction_rate": round((1 - final_count / original_count) * 100, 1) if original_count > 0 else 0,
+            "llm_coverage": round(len(all_decisions) / len(all_items) * 100, 1) if all_items else 0,
+            "method": "llm_led_v2.3"
+        }
 
-    if archive:
-        try:
-            archive.save_final_quotes(final_quotes, stats)
-            archive.save_stats(stats)
-        except Exception as e:
-            print(f"[QuoteConsolidator] Warning: Could not save final results: {e}")
+        save_to_archive("save_final_quotes", final_quotes, stats)
+        save_to_archive("save_stats", stats)
 
-    return final_quotes, stats
+        return final_quotes, stats
+    finally:
+        if archive_writer:
+            save_to_archive("close_run")
+            await archive_queue.join()
+            archive_writer.cancel()
 
 
 # =============================================
@@ -904,13 +1303,16 @@ def consolidate_quotes_fallback(
     用于 Ollama 服务不可用时
 
     Args:
-        quotes: 原始引用列表
+        quotes: 原始引用列表（不会被修改）
 
     Returns:
         (整合后的引用列表, 统计信息)
     """
     original_count = len(quotes)
 
+    # 入口处浅拷贝一次，之后直接在副本上标记，不再逐条 {**q, ...} 重建
+    quotes = [q.copy() for q in quotes]
+
     # 生成候选组
     candidate_groups, single_quotes = generate_candidate_groups(quotes)
 
@@ -920,19 +1322,16 @@ def consolidate_quotes_fallback(
     # 候选组中的引用全部保留（不合并，但标记未审核）
     for group in candidate_groups:
         for q in group["quotes"]:
-            final_quotes.append({
-                **q,
-                "llm_decision": "not_reviewed",
-                "candidate_group_id": group.get("group_id"),
-                "group_reason": group.get("reason")
-            })
+            q["llm_decision"] = "not_reviewed"
+            q["candidate_group_id"] = group.get("group_id")
+            q["group_reason"] = group.get("reason")
+            final_quotes.append(q)
 
     # 独立引用全部保留
     for single in single_quotes:
-        final_quotes.append({
-            **single.get("quote", {}),
-            "llm_decision": "not_reviewed"
-        })
+        q = single.get("quote", {})
+        q["llm_decision"] = "not_reviewed"
+        final_quotes.append(q)
 
     stats = {
         "original_count": original_count,
@@ -973,13 +1372,10 @@ def consolidate_by_position(quotes: List[Dict[str, Any]]) -> List[Dict[str, Any]
     candidate_groups, single_quotes = generate_candidate_groups(quotes)
 
     # 简单处理：候选组保持原样，不合并
-    result = []
-    for group in candidate_groups:
-        result.extend(group["quotes"])
-    for single in single_quotes:
-        result.append(single.get("quote", {}))
-
-    return result
+    return list(chain(
+        chain.from_iterable(group["quotes"] for group in candidate_groups),
+        (single.get("quote", {}) for single in single_quotes)
+    ))
 
 
 # =============================================
@@ -990,39 +1386,60 @@ def get_document_page_context(
     document_id: str,
     db_session: Any
 ) -> Dict[str, Any]:
-    """获取文档的页面上下文信息"""
+    """
+    获取文档的页面上下文信息
+
+    同一 exhibit 下所有文档共享相同的页面映射，结果缓存在 db_session.info 中，
+    只在本次请求（session）内有效；同一文档的重复调用连 Document 查询也跳过
+    """
     from app.models.document import Document, TextBlock
 
+    cache = db_session.info.setdefault("page_ctx_cache", {})
+    doc_keys = db_session.info.setdefault("page_ctx_doc_keys", {})
+
+    cache_key = doc_keys.get(document_id)
+    if cache_key is not None:
+        return {"document_id": document_id, **cache[cache_key]}
+
     doc = db_session.query(Document).filter(Document.id == document_id).first()
     if not doc:
         return {}
 
-    same_exhibit_docs = db_session.query(Document).filter(
-        Document.project_id == doc.project_id,
-        Document.exhibit_number == doc.exhibit_number
-    ).order_by(Document.created_at).all() if doc.exhibit_number else [doc]
+    cache_key = (doc.project_id, doc.exhibit_number or doc.id)
+    exhibit_context = cache.get(cache_key)
+
+    if exhibit_context is None:
+        same_exhibit_docs = db_session.query(Document).filter(
+            Document.project_id == doc.project_id,
+            Document.exhibit_number == doc.exhibit_number
+        ).order_by(Document.created_at).all() if doc.exhibit_number else [doc]
 
-    page_map = {}
-    global_page = 1
+        # page_map: "{document_id}:{local_page}" -> global_page
+        # 文档级元数据每个文档只存一份
+        page_map: Dict[str, int] = {}
+        docs_meta: Dict[str, Dict[str, Any]] = {}
+        global_page = 1
 
-    for d in same_exhibit_docs:
-        for local_page in range(1, (d.page_count or 1) + 1):
-            page_map[f"{d.id}:{local_page}"] = {
-                "global_page": global_page,
-                "document_id": d.id,
-                "local_page": local_page,
+        for d in same_exhibit_docs:
+            docs_meta[d.id] = {
                 "exhibit_id": d.exhibit_number,
                 "file_name": d.file_name
             }
-            global_page += 1
+            for local_page in range(1, (d.page_count or 1) + 1):
+                page_map[f"{d.id}:{local_page}"] = global_page
+                global_page += 1
+
+        exhibit_context = {
+            "exhibit_id": doc.exhibit_number,
+            "total_pages": global_page - 1,
+            "page_map": page_map,
+            "docs_meta": docs_meta,
+            "related_documents": [d.id for d in same_exhibit_docs]
+        }
+        cache[cache_key] = exhibit_context
 
-    return {
-        "document_id": document_id,
-        "exhibit_id": doc.exhibit_number,
-        "total_pages": global_page - 1,
-        "page_map": page_map,
-        "related_documents": [d.id for d in same_exhibit_docs]
-    }
+    doc_keys[document_id] = cache_key
+    return {"document_id": document_id, **exhibit_context}
 
 
 def are_quotes_from_adjacent_pages(
@@ -1039,13 +1456,13 @@ def are_quotes_from_adjacent_pages(
     key1 = f"{source1.get('document_id', '')}:{q1.get('page', 1)}"
     key2 = f"{source2.get('document_id', '')}:{q2.get('page', 1)}"
 
-    info1 = page_map.get(key1)
-    info2 = page_map.get(key2)
+    global_page1 = page_map.get(key1)
+    global_page2 = page_map.get(key2)
 
-    if not info1 or not info2:
+    if global_page1 is None or global_page2 is None:
         return False
 
-    return abs(info1["global_page"] - info2["global_page"]) <= 1
+    return abs(global_page1 - global_page2) <= 1
 
 
 # =============================================
@@ -1055,24 +1472,38 @@ def are_quotes_from_adjacent_pages(
 def enrich_quotes_with_bbox(
     quotes: List[Dict[str, Any]],
     document_id: str,
-    db_session: Any
+    db_session: Any,
+    text_blocks: Optional[List[Any]] = None
 ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """
     为引用添加 bounding box 信息
 
+    原地更新传入的引用字典（bbox / page / match_score），不再逐条复制；
+    调用方均以返回值替换原列表。
+
+    Args:
+        text_blocks: 已预取的该文档文本块（按 page_number, block_id 排序）；
+            为 None 时自行查询
+
     Returns:
         (enriched_quotes, bbox_stats)
     """
     from app.models.document import TextBlock
     from app.services.bbox_matcher import match_text_to_blocks
 
-    text_blocks = db_session.query(TextBlock).filter(
-        TextBlock.document_id == document_id
-    ).order_by(TextBlock.page_number, TextBlock.block_id).all()
+    if text_blocks is None:
+        text_blocks = db_session.query(TextBlock).filter(
+            TextBlock.document_id == document_id
+        ).order_by(TextBlock.page_number, TextBlock.block_id).all()
 
     if not text_blocks:
         return quotes, {"matched": 0, "total": len(quotes), "match_rate": 0}
 
+    # 按页建索引: 先只在提示页内匹配，命中精确匹配即为全量匹配的首选结果
+    blocks_by_page: Dict[int, List[Any]] = defaultdict(list)
+    for tb in text_blocks:
+        blocks_by_page[tb.page_number].append(tb)
+
     enriched = []
     matched_count = 0
 
@@ -1080,26 +1511,39 @@ def enrich_quotes_with_bbox(
         quote_text = q.get("quote", "")
         page_hint = q.get("page")
 
-        match_result = match_text_to_blocks(
-            quote_text,
-            text_blocks,
-            page_hint=page_hint,
-            similarity_threshold=0.6
-        )
+        match_result = None
+        page_blocks = blocks_by_page.get(page_hint) if page_hint else None
+        if page_blocks:
+            match_result = match_text_to_blocks(
+                quote_text,
+                page_blocks,
+                page_hint=page_hint,
+                similarity_threshold=0.6,
+                already_filtered=True
+            )
+            matches = match_result.get("matches")
+            if not (matches and matches[0].get("match_type") == "exact"):
+                match_result = None
+
+        if match_result is None:
+            # 提示页没有精确匹配时回退到全文档（模糊/跨页结果可能更优）
+            match_result = match_text_to_blocks(
+                quote_text,
+                text_blocks,
+                page_hint=page_hint,
+                similarity_threshold=0.6
+            )
 
         if match_result.get("matched") and match_result.get("matches"):
             best_match = match_result["matches"][0]
-            q_enriched = {
-                **q,
-                "bbox": best_match.get("bbox"),
-                "page": best_match.get("page_number", page_hint),
-                "match_score": best_match.get("match_score", 0)
-            }
+            q["bbox"] = best_match.get("bbox")
+            q["page"] = best_match.get("page_number", page_hint)
+            q["match_score"] = best_match.get("match_score", 0)
             matched_count += 1
         else:
-            q_enriched = {**q, "bbox": None}
+            q["bbox"] = None
 
-        enriched.append(q_enriched)
+        enriched.append(q)
 
     stats = {
         "matched": matched_count,
@@ -1115,6 +1559,21 @@ def enrich_all_quotes_with_bbox(
     db_session: Any
 ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """为所有文档的引用添加 bbox 信息"""
+    from app.models.document import TextBlock
+
+    # 一次 IN 查询取回所有文档的文本块，再按文档分桶
+    doc_ids = list(dict.fromkeys(
+        dr["document_id"] for dr in all_results
+        if dr.get("document_id") and dr.get("quotes")
+    ))
+    blocks_by_doc: Dict[str, List[Any]] = {}
+    if doc_ids:
+        rows = db_session.query(TextBlock).filter(
+            TextBlock.document_id.in_(doc_ids)
+        ).order_by(TextBlock.document_id, TextBlock.page_number, TextBlock.block_id).all()
+        for doc_id, blocks in groupby(rows, key=attrgetter("document_id")):
+            blocks_by_doc[doc_id] = list(blocks)
+
     enriched_results = []
     total_matched = 0
     total_quotes = 0
@@ -1124,7 +1583,10 @@ def enrich_all_quotes_with_bbox(
         quotes = doc_result.get("quotes", [])
 
         if document_id and quotes:
-            enriched_quotes, stats = enrich_quotes_with_bbox(quotes, document_id, db_session)
+            enriched_quotes, stats = enrich_quotes_with_bbox(
+                quotes, document_id, db_session,
+                text_blocks=blocks_by_doc.get(document_id, [])
+            )
             enriched_results.append({
                 **doc_result,
                 "quotes": enriched_quotes,
@@ -1152,6 +1614,21 @@ def consolidate_quotes_sync(
     quotes: List[Dict[str, Any]]
 ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """同步版本的引用整合（只使用粗筛规则，不调用 LLM）"""
+    n = len(quotes)
+
+    # 快速路径: standard_key 或 document_id 两两不同时不可能形成候选组，
+    # 按与降级方案相同的位置顺序输出
+    keys = {q.get("standard_key", "other") for q in quotes}
+    doc_ids = {q.get("source", {}).get("document_id", "") for q in quotes}
+    if len(keys) == n or len(doc_ids) == n:
+        ordered = sorted(quotes, key=_position_sort_key)
+        return [{**q, "llm_decision": "not_reviewed"} for q in ordered], {
+            "original_count": n,
+            "final_count": n,
+            "reduction_rate": 0,
+            "method": "trivial"
+        }
+
     return consolidate_quotes_fallback(quotes)
 
 
@@ -1173,31 +1650,83 @@ def consolidate_document_quotes(
     }
 
 
-def consolidate_all_document_quotes(
-    all_results: List[Dict[str, Any]]
-) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-    """整合所有文档的引用（同步版本，不使用 LLM）"""
-    consolidated_results = []
-    total_original = 0
-    total_final = 0
+_consolidation_executor: Optional[ProcessPoolExecutor] = None
+_consolidation_executor_lock = threading.Lock()
 
-    for doc_result in all_results:
-        quotes = doc_result.get("quotes", [])
-        total_original += len(quotes)
 
-        consolidated_doc = consolidate_document_quotes(doc_result)
-        consolidated_results.append(consolidated_doc)
+def _get_consolidation_executor() -> ProcessPoolExecutor:
+    """模块级进程池：第一次使用时创建，之后复用（每次调用新建进程池要重新启动全部工作进程）"""
+    global _consolidation_executor
+    with _consolidation_executor_lock:
+        if _consolidation_executor is None:
+            _consolidation_executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _consolidation_executor
 
-        total_final += len(consolidated_doc.get("quotes", []))
 
-    overall_stats = {
+def _reset_consolidation_executor(executor: ProcessPoolExecutor):
+    """工作进程异常退出后进程池不可再用，丢弃它，下次使用时重建"""
+    global _consolidation_executor
+    with _consolidation_executor_lock:
+        if _consolidation_executor is executor:
+            _consolidation_executor = None
+    executor.shutdown(wait=False)
+
+
+def _document_consolidation_stats(
+    all_results: List[Dict[str, Any]],
+    consolidated_results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    total_original = sum(len(dr.get("quotes", [])) for dr in all_results)
+    total_final = sum(len(cr.get("quotes", [])) for cr in consolidated_results)
+
+    return {
         "total_original": total_original,
         "total_final": total_final,
         "total_reduction": total_original - total_final,
         "reduction_rate": round((1 - total_final / total_original) * 100, 1) if total_original > 0 else 0
     }
 
-    return consolidated_results, overall_stats
+
+def consolidate_all_document_quotes(
+    all_results: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """整合所有文档的引用（同步版本，不使用 LLM；异步代码中请使用 consolidate_all_document_quotes_async）"""
+    # 各文档的整合互不依赖，且为纯 CPU 计算，文档较多时分发到多个进程
+    if len(all_results) > PARALLEL_CONSOLIDATION_MIN_DOCS:
+        consolidated_results = list(
+            _get_consolidation_executor().map(consolidate_document_quotes, all_results, chunksize=4)
+        )
+    else:
+        consolidated_results = [consolidate_document_quotes(dr) for dr in all_results]
+
+    return consolidated_results, _document_consolidation_stats(all_results, consolidated_results)
+
+
+async def consolidate_all_document_quotes_async(
+    all_results: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    consolidate_all_document_quotes 的异步版本：文档整合在模块级进程池中进行，不阻塞事件循环
+
+    文档较少时在线程中直接整合；进程池损坏时重建并退回线程中整合。
+    """
+    if len(all_results) <= PARALLEL_CONSOLIDATION_MIN_DOCS:
+        return await asyncio.to_thread(consolidate_all_document_quotes, all_results)
+
+    loop = asyncio.get_running_loop()
+    executor = _get_consolidation_executor()
+    try:
+        consolidated_results = await asyncio.gather(*[
+            loop.run_in_executor(executor, consolidate_document_quotes, dr) for dr in all_results
+        ])
+    except BrokenProcessPool as e:
+        print(f"[QuoteConsolidator] Process pool broken ({e}), consolidating in a thread")
+        _reset_consolidation_executor(executor)
+        consolidated_results = await asyncio.to_thread(
+            lambda: [consolidate_document_quotes(dr) for dr in all_results]
+        )
+
+    return list(consolidated_results), _document_consolidation_stats(all_results, consolidated_results)
 
 
 # =============================================
@@ -1226,26 +1755,31 @@ async def consolidate_all_quotes_with_llm(
     """
     # 收集所有引用（保留文档来源信息）
     all_quotes = []
-    doc_id_map = {}  # quote index -> doc_result index
 
     for doc_idx, doc_result in enumerate(all_results):
-        quotes = doc_result.get("quotes", [])
-        for q in quotes:
+        # 每个文档的来源字段只取一次
+        doc_id = doc_result.get("document_id", "")
+        exhibit_id = doc_result.get("exhibit_id", "")
+        file_name = doc_result.get("file_name", "")
+
+        for q in doc_result.get("quotes", []):
             # 确保 source 信息完整
             if "source" not in q:
                 q["source"] = {
-                    "document_id": doc_result.get("document_id", ""),
-                    "exhibit_id": doc_result.get("exhibit_id", ""),
-                    "file_name": doc_result.get("file_name", "")
+                    "document_id": doc_id,
+                    "exhibit_id": exhibit_id,
+                    "file_name": file_name
                 }
             else:
                 # 补充缺失的字段
-                if not q["source"].get("document_id"):
-                    q["source"]["document_id"] = doc_result.get("document_id", "")
-                if not q["source"].get("exhibit_id"):
-                    q["source"]["exhibit_id"] = doc_result.get("exhibit_id", "")
-
-            doc_id_map[len(all_quotes)] = doc_idx
+                source = q["source"]
+                if not source.get("document_id"):
+                    source["document_id"] = doc_id
+                if not source.get("exhibit_id"):
+                    source["exhibit_id"] = exhibit_id
+
+            # 记录来源文档索引，整合后直接按索引回填
+            q["_internal_doc_idx"] = doc_idx
             all_quotes.append(q)
 
     if not all_quotes:
@@ -1265,24 +1799,24 @@ async def consolidate_all_quotes_with_llm(
         consolidated_quotes, stats = consolidate_quotes_fallback(all_quotes)
 
     # 按文档重新分组
+    # 未被改写的引用带有 _internal_doc_idx；merge/adjust 生成的新引用没有，
+    # 按 document_id 查找（document_id -> 首个匹配的文档索引）
     doc_quotes: Dict[int, List[Dict]] = {i: [] for i in range(len(all_results))}
+    doc_index: Dict[Any, int] = {}
+    for doc_idx, doc_result in enumerate(all_results):
+        doc_index.setdefault(doc_result.get("document_id"), doc_idx)
 
     for q in consolidated_quotes:
-        source = q.get("source", {})
-        doc_id = source.get("document_id", "")
-
-        # 找到对应的文档
-        found = False
-        for doc_idx, doc_result in enumerate(all_results):
-            if doc_result.get("document_id") == doc_id:
-                doc_quotes[doc_idx].append(q)
-                found = True
-                break
-
-        if not found:
+        doc_idx = q.pop("_internal_doc_idx", None)
+        if doc_idx is None:
+            doc_id = q.get("source", {}).get("document_id", "")
             # 如果找不到对应文档，放到第一个文档
-            if all_results:
-                doc_quotes[0].append(q)
+            doc_idx = doc_index.get(doc_id, 0)
+        doc_quotes[doc_idx].append(q)
+
+    # 清理输入引用上的内部字段（keep/approve 返回的是副本）
+    for q in all_quotes:
+        q.pop("_internal_doc_idx", None)
 
     # 重建结果
     consolidated_results = []
@@ -1359,7 +1893,7 @@ async def consolidate_all_material_quotes(
     """
     整合所有材料的引用（材料级处理）
 
-    这是新架构的主入口，按材料逐个处理。
+    这是新架构的主入口，按材料并发处理（最多 MAX_MATERIAL_CONCURRENCY 个）。
 
     Args:
         material_results: 材料分析结果列表，每个包含 material_id 和 quotes
@@ -1370,35 +1904,41 @@ async def consolidate_all_material_quotes(
     Returns:
         (整合后的结果列表, 总体统计)
     """
+    semaphore = asyncio.Semaphore(MAX_MATERIAL_CONCURRENCY)
+
+    async def consolidate_one(mat_result: Dict[str, Any]):
+        async with semaphore:
+            return await consolidate_material_quotes(
+                material_id=mat_result.get("material_id", "unknown"),
+                quotes=mat_result.get("quotes", []),
+                call_llm_func=call_llm_func,
+                project_id=project_id,
+                model=model
+            )
+
+    # 各材料相互独立，并发整合；gather 保持输入顺序
+    per_material = await asyncio.gather(
+        *[consolidate_one(mat_result) for mat_result in material_results]
+    )
+
     consolidated_results = []
     total_original = 0
     total_final = 0
     material_stats = []
 
-    for mat_result in material_results:
-        material_id = mat_result.get("material_id", "unknown")
-        quotes = mat_result.get("quotes", [])
-        total_original += len(quotes)
-
-        # 按材料整合
-        consolidated_quotes, stats = await consolidate_material_quotes(
-            material_id=material_id,
-            quotes=quotes,
-            call_llm_func=call_llm_func,
-            project_id=project_id,
-            model=model
-        )
+    for mat_result, (consolidated_quotes, stats) in zip(material_results, per_material):
+        original_count = len(mat_result.get("quotes", []))
+        total_original += original_count
+        total_final += len(consolidated_quotes)
 
         consolidated_results.append({
             **mat_result,
             "quotes": consolidated_quotes,
             "consolidation_stats": stats
         })
-
-        total_final += len(consolidated_quotes)
         material_stats.append({
-            "material_id": material_id,
-            "original": len(quotes),
+            "material_id": mat_result.get("material_id", "unknown"),
+            "original": original_count,
             "final": len(consolidated_quotes)
         })
 
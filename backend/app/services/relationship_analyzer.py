@@ -12,15 +12,200 @@
 - 例如：识别到"奥运金牌"，必须判断是申请人的还是其他人的
 """
 
+import os
+import re
 import json
+import random
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, field, asdict
+import httpx
+import uuid
+from hashlib import blake2b
+from functools import lru_cache
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Tuple, Set
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from collections import defaultdict
 
-from .llm_client import call_llm
+from rapidfuzz import fuzz
+
+from .llm_client import call_llm, is_truncated_response
+from ..core.config import settings
+from .storage import DATA_DIR
+
+try:
+    from aiolimiter import AsyncLimiter
+    AIOLIMITER_SUPPORT = True
+except ImportError:
+    AIOLIMITER_SUPPORT = False
+
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
+
+# LLM 调用的默认并发上限（信号量只在真正发出请求时持有；缓存命中与退避等待不占名额）
+LLM_MAX_CONCURRENCY = max(1, settings.ollama_num_parallel)
+# LLM 请求速率上限（令牌桶，仅在真正超过速率时等待；aiolimiter 不可用时只受并发数限制）
+LLM_REQUESTS_PER_SECOND = 10.0
+# 瞬时错误（网络异常、429、5xx）重试：指数退避 + 随机抖动
+LLM_MAX_ATTEMPTS = 4
+LLM_RETRY_BASE_DELAY = 1.0   # 秒
+LLM_RETRY_MAX_DELAY = 30.0   # 秒
+# 响应无法解析为 JSON 时，追加到 system prompt 后重新请求一次
+STRICT_JSON_REMINDER = "Respond with strict JSON only. No prose, no markdown."
+# 流式接收 LLM 响应（大响应的 JSON 在线程池中解析，不阻塞其他并发批次）
+LLM_STREAM_RESPONSES = True
+
+_API_STATUS_PATTERN = re.compile(r"API error (\d{3})")
+
+# 实体提取批次：一个 prompt 内放更多 snippets，摊薄固定的指令/示例 token
+EXTRACTION_BATCH_SIZE = 20          # 每批最多 snippet 数
+EXTRACTION_BATCH_CHAR_LIMIT = 6000  # 每批 snippet 文本总字符上限
+EXTRACTION_SNIPPET_CHARS = 500      # 单个 snippet 截断长度
+
+# 归属判断批次
+ATTRIBUTION_BATCH_SIZE = 25
+
+# 分析器状态文件格式版本（2: 列式紧凑布局，snippet_id 共享字符串表）
+STATE_FORMAT_VERSION = 2
+
+# LLM 响应持久化缓存（按请求内容哈希，重复分析相同批次时直接复用）
+LLM_CACHE_ENABLED = True
+LLM_CACHE_DIR = DATA_DIR / "llm_cache" / "relationship"
+
+
+def _llm_cache_key(request: Dict[str, Any]) -> str:
+    """缓存键: 完整请求参数（prompt、模型、提供商、schema 等）的哈希"""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _load_cached_response(cache_key: str) -> Optional[Any]:
+    """读取缓存的 LLM 响应，未命中或读取失败返回 None"""
+    filepath = LLM_CACHE_DIR / f"{cache_key}.json"
+    if not filepath.exists():
+        return None
+
+    try:
+        if ORJSON_SUPPORT:
+            return orjson.loads(filepath.read_bytes()).get("response")
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f).get("response")
+    except Exception:
+        return None
+
+
+def _save_cached_response(cache_key: str, response: Any):
+    """
+    保存 LLM 响应到缓存（写入失败不影响分析）
+
+    先写唯一命名的临时文件再 os.replace：中途崩溃不会留下半截缓存，
+    并发写同一个 key 时也不会互相覆盖到一半。
+    """
+    entry = {
+        "timestamp": datetime.now().isoformat(),
+        "response": response
+    }
+    filepath = LLM_CACHE_DIR / f"{cache_key}.json"
+    tmp_path = LLM_CACHE_DIR / f"{cache_key}.{uuid.uuid4().hex}.tmp"
+    try:
+        LLM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        if ORJSON_SUPPORT:
+            tmp_path.write_bytes(orjson.dumps(entry))
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, filepath)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"[RelationshipAnalyzer] Failed to save LLM cache: {e}")
+
+
+_llm_rate_limiter = AsyncLimiter(LLM_REQUESTS_PER_SECOND, 1.0) if AIOLIMITER_SUPPORT else None
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """网络异常/超时，以及 429、5xx 状态码视为可重试"""
+    if isinstance(error, httpx.HTTPError):
+        return True
+    match = _API_STATUS_PATTERN.search(str(error))
+    if match:
+        status = int(match.group(1))
+        return status == 429 or status >= 500
+    return False
+
+
+def _is_unparsed_response(result: Any) -> bool:
+    """extract_json 无法解析时返回 {"content": 原文}"""
+    return isinstance(result, dict) and set(result) == {"content"}
+
+
+async def _call_llm_limited(limiter=None, semaphore=None, **request) -> Any:
+    """
+    按令牌桶限速调用 call_llm（limiter 为空时使用模块默认限速器）
+
+    semaphore 限制同时在途的请求数（多个调用方共享同一个信号量时总并发受控）。
+
+    瞬时错误按指数退避重试，最多 LLM_MAX_ATTEMPTS 次；响应不是 JSON 时
+    在 system prompt 中强调严格 JSON 重新请求一次。stream 不计入 request，
+    因此不影响缓存键。
+    """
+    limiter = limiter or _llm_rate_limiter
+    strict_retried = False
+    attempt = 0
+
+    while True:
+        attempt += 1
+        try:
+            async with semaphore or nullcontext(), limiter or nullcontext():
+                result = await call_llm(**request, stream=LLM_STREAM_RESPONSES)
+        except Exception as e:
+            if attempt >= LLM_MAX_ATTEMPTS or not _is_transient_error(e):
+                raise
+            delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+            print(f"[RelationshipAnalyzer] LLM call failed ({e}), retry {attempt + 1}/{LLM_MAX_ATTEMPTS} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        if _is_unparsed_response(result) and result["content"] and not strict_retried:
+            strict_retried = True
+            system_prompt = request.get("system_prompt")
+            request = {
+                **request,
+                "system_prompt": f"{system_prompt}\n{STRICT_JSON_REMINDER}" if system_prompt else STRICT_JSON_REMINDER
+            }
+            print("[RelationshipAnalyzer] Non-JSON response, retrying with strict JSON reminder")
+            continue
+
+        return result
+
+
+async def _call_llm_cached(limiter=None, semaphore=None, use_cache: bool = True, **request) -> Any:
+    """
+    带持久化缓存的 call_llm
+
+    参数与 call_llm 相同（limiter 可选，覆盖默认限速器；semaphore 可选，限制并发）。
+    缓存命中不占用速率额度；无法解析为 JSON 的响应（{"content": ...}）与
+    截断后修复出的部分结果不缓存。use_cache=False 时不读缓存、重新请求，
+    新结果仍写入缓存。
+    """
+    if not LLM_CACHE_ENABLED:
+        return await _call_llm_limited(limiter, semaphore, **request)
+
+    cache_key = _llm_cache_key(request)
+    if use_cache:
+        cached = _load_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+    result = await _call_llm_limited(limiter, semaphore, **request)
+    if not _is_unparsed_response(result) and not is_truncated_response(result):
+        _save_cached_response(cache_key, result)
+    return result
 
 
 # 实体类型
@@ -60,7 +245,117 @@ RELATION_TYPES = [
 ]
 
 
-@dataclass
+# 结构化输出 schema（支持 json_schema 的提供商做约束解码；其余提供商退化为 json_object）
+_SNIPPET_IDS_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+ENTITY_EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "entities": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "type": {"type": "string", "enum": ENTITY_TYPES},
+                    "snippet_ids": _SNIPPET_IDS_SCHEMA
+                },
+                "required": ["name", "type", "snippet_ids"],
+                "additionalProperties": False
+            }
+        },
+        "relations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "from": {"type": "string"},
+                    "to": {"type": "string"},
+                    "type": {"type": "string", "enum": RELATION_TYPES},
+                    "snippet_ids": _SNIPPET_IDS_SCHEMA
+                },
+                "required": ["from", "to", "type", "snippet_ids"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["entities", "relations"],
+    "additionalProperties": False
+}
+
+MAIN_SUBJECT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "main_subject": {"type": "string"},
+        "confidence": {"type": "number"},
+        "reasoning": {"type": "string"}
+    },
+    "required": ["main_subject", "confidence", "reasoning"],
+    "additionalProperties": False
+}
+
+ATTRIBUTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "attributions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "snippet_id": {"type": "string"},
+                    "subject": {"type": "string"},
+                    "is_applicant": {"type": "boolean"},
+                    "confidence": {"type": "number"}
+                },
+                "required": ["snippet_id", "subject", "is_applicant", "confidence"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["attributions"],
+    "additionalProperties": False
+}
+
+
+# 提示词静态部分预先定义为模块常量，每批只拼接 snippets 等动态内容
+ENTITY_EXTRACTION_SYSTEM_PROMPT = "You are an expert at analyzing visa petition evidence. Extract entities and relationships precisely."
+MAIN_SUBJECT_SYSTEM_PROMPT = "Identify the main applicant in a visa petition."
+ATTRIBUTION_SYSTEM_PROMPT = "Determine who each piece of evidence describes."
+
+ENTITY_EXTRACTION_PROMPT_HEAD = "Analyze these evidence snippets from an EB-1A visa petition and extract entities and relationships.\n"
+
+ENTITY_EXTRACTION_PROMPT_TAIL = """
+
+Extract:
+1. Entities: People (especially the applicant and recommendation letter writers), organizations, awards, publications, positions
+2. Relationships: ALL meaningful relationships including:
+   - Who received what award
+   - Who works at which organization
+   - Who authored what publication
+   - Who writes recommendation letters for whom
+   - Who recommends someone to which organization
+   - Who supervised/mentored/trained whom
+
+Return compact JSON (no extra whitespace), e.g.:
+{"entities":[{"name":"Dr. John Smith","type":"person","snippet_ids":["snp_xxx"]},{"name":"Best Paper Award","type":"award","snippet_ids":["snp_xxx"]}],"relations":[{"from":"Dr. John Smith","to":"Best Paper Award","type":"received","snippet_ids":["snp_xxx"]},{"from":"Prof. Jane Doe","to":"Dr. John Smith","type":"writes_recommendation_for","snippet_ids":["snp_xxx"]}]}
+
+Entity types: person, organization, award, publication, position, project, event, metric
+Relation types: received, works_at, leads, authored, founded, member_of, published_in, cited_by, collaborated, judged, owns, writes_recommendation_for, recommends_to, recommends_for_position, supervised_by, mentored_by, trained_by, coached_by, evaluated_by
+
+IMPORTANT for recommendation letters:
+- If someone writes a recommendation letter, create TWO relations:
+  1. "writes_recommendation_for" from writer to applicant
+  2. "recommends_to" from writer to the target organization (if mentioned)
+- Also capture supervisor/mentor relationships mentioned in letters
+
+Important:
+- Use exact names from text (but normalize applicant name variations)
+- Include snippet_ids where each entity/relation appears
+- Focus on the applicant and their achievements
+- Pay special attention to recommendation letter relationships"""
+
+
+@dataclass(slots=True)
 class Entity:
     """实体"""
     id: str
@@ -69,8 +364,18 @@ class Entity:
     mentions: int = 1  # 被提及次数
     snippet_ids: List[str] = field(default_factory=list)  # 出现在哪些 snippet
 
+    def to_dict(self) -> Dict:
+        """显式构造字典（比 dataclasses.asdict 的反射 + 深拷贝快）"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "type": self.type,
+            "mentions": self.mentions,
+            "snippet_ids": list(self.snippet_ids),
+        }
 
-@dataclass
+
+@dataclass(slots=True)
 class Relation:
     """关系"""
     from_entity: str  # 实体名称
@@ -78,8 +383,16 @@ class Relation:
     relation_type: str
     snippet_ids: List[str] = field(default_factory=list)
 
+    def to_dict(self) -> Dict:
+        return {
+            "from_entity": self.from_entity,
+            "to_entity": self.to_entity,
+            "relation_type": self.relation_type,
+            "snippet_ids": list(self.snippet_ids),
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class SnippetAttribution:
     """Snippet 归属信息"""
     snippet_id: str
@@ -88,6 +401,107 @@ class SnippetAttribution:
     is_applicant: bool     # 是否归属于申请人
     confidence: float
 
+    def to_dict(self) -> Dict:
+        return {
+            "snippet_id": self.snippet_id,
+            "subject": self.subject,
+            "achievement_type": self.achievement_type,
+            "is_applicant": self.is_applicant,
+            "confidence": self.confidence,
+        }
+
+
+# 实体名称规范化: 小写并去掉 "." 和 ","（单次 translate 代替链式 replace）
+_NAME_STRIP_TABLE = str.maketrans("", "", ".,")
+
+
+@lru_cache(maxsize=8192)
+def _normalize_name(name: str) -> str:
+    """规范化实体名称用于去重（结果缓存，同名实体在各批次中反复出现）"""
+    return name.lower().translate(_NAME_STRIP_TABLE)
+
+
+def _extend_unique(target: List[Any], items: List[Any], seen: Set[Any]):
+    """把 items 中 target 尚未包含的元素按顺序追加（seen 为 target 的成员集合，同步更新）"""
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            target.append(item)
+
+
+class _EntityNameIndex:
+    """
+    实体规范化名称的别名匹配索引
+
+    find() 按 精确 → 三元组候选 → 模糊打分 的顺序查找已有 key：
+    - 精确：key 与 query 相同
+    - 候选：与 query 至少共享一个三元组的 key（遍历 query 各三元组的倒排表）
+    - 模糊：token_set_ratio >= FUZZY_MATCH_THRESHOLD 的候选中取最早加入的一个。
+      词级比较不受词序影响（"smith john" ≈ "john a smith"）；一方的词集合是另一方的
+      真子集时 token_set_ratio 恒为 100，此时多出的词必须都是首字母缩写，
+      避免 "smith corp" 并入 "smith"
+
+    返回最早加入的匹配 key，之后加入的 key 不会改变已解析的结果。
+    """
+
+    GRAM = 3
+    FUZZY_MATCH_THRESHOLD = 88
+
+    def __init__(self):
+        self._order: Dict[str, int] = {}              # key -> 插入序号
+        self._postings: Dict[str, Set[str]] = defaultdict(set)  # 三元组 -> keys
+        self._short_keys: List[str] = []             # 短于 GRAM 的 key（无三元组）
+
+    @classmethod
+    def _grams(cls, text: str) -> Set[str]:
+        return {text[i:i + cls.GRAM] for i in range(len(text) - cls.GRAM + 1)}
+
+    def add(self, key: str):
+        if key in self._order:
+            return
+        self._order[key] = len(self._order)
+
+        grams = self._grams(key)
+        if not grams:
+            self._short_keys.append(key)
+            return
+        for g in grams:
+            self._postings[g].add(key)
+
+    def _candidates(self, query: str) -> Set[str]:
+        """与 query 至少共享一个三元组的 key（query 过短时为全部 key）"""
+        query_grams = self._grams(query)
+        if not query_grams:
+            return set(self._order)
+
+        candidates = set(self._short_keys)
+        for g in query_grams:
+            candidates.update(self._postings.get(g, ()))
+        return candidates
+
+    @classmethod
+    def _is_alias(cls, query: str, key: str) -> bool:
+        if not fuzz.token_set_ratio(query, key, score_cutoff=cls.FUZZY_MATCH_THRESHOLD):
+            return False
+
+        query_tokens = set(query.split())
+        key_tokens = set(key.split())
+        if query_tokens < key_tokens or key_tokens < query_tokens:
+            return all(len(token) == 1 for token in query_tokens ^ key_tokens)
+        return True
+
+    def find(self, query: str) -> Optional[str]:
+        if query in self._order:
+            return query
+
+        best = None
+        for key in self._candidates(query):
+            if best is not None and self._order[key] > self._order[best]:
+                continue
+            if self._is_alias(query, key):
+                best = key
+        return best
+
 
 class RelationshipAnalyzer:
     """
@@ -99,16 +513,369 @@ class RelationshipAnalyzer:
     3. 判断每个 snippet 的成就归属
     """
 
-    def __init__(self, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        requests_per_second: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        use_cache: bool = True
+    ):
+        """
+        Args:
+            model: 使用的模型
+            requests_per_second: LLM 请求速率上限（本地 Ollama 可设高，云端 API 宜设低）；
+                                 不指定时使用模块默认值 LLM_REQUESTS_PER_SECOND
+            concurrency: 同时在途的 LLM 请求上限（提取、主体识别、归属判断共享）；
+                         不指定时使用 LLM_MAX_CONCURRENCY
+            use_cache: 是否读取 LLM 响应缓存（False 时全部重新请求，结果仍写入缓存）
+        """
         self.model = model
+        self.use_cache = use_cache
+        self._rate_limiter = (
+            AsyncLimiter(requests_per_second, 1.0)
+            if requests_per_second and AIOLIMITER_SUPPORT else None
+        )
+        self._llm_semaphore = asyncio.Semaphore(max(1, concurrency or LLM_MAX_CONCURRENCY))
         self.entities: Dict[str, Entity] = {}
         self.relations: List[Relation] = []
+        # 已提取过实体的 snippet（增量分析时跳过）及其对应的已知申请人
+        self.processed_snippets: Set[str] = set()
+        self.known_applicant: Optional[str] = None
+        # 后台 checkpoint 写入（合并写请求）
+        self._checkpoint_task: Optional[asyncio.Task] = None
+        self._checkpoint_dirty = False
+        # 增量 checkpoint：完整快照之后只向 .delta.jsonl 追加新增/修改的部分。
+        # _checkpoint_generation 为当前基准快照的标识，None 表示下次需写完整快照
+        self._checkpoint_generation: Optional[str] = None
+        self._saved_entity_count = 0
+        self._saved_relation_count = 0
+        self._dirty_entity_keys: Set[str] = set()
+        self._dirty_relation_indices: Set[int] = set()
+        self._unsaved_processed: List[str] = []
+
+    # ---------- 状态持久化（增量分析） ----------
+
+    @staticmethod
+    def _snippet_key(snippet: Dict) -> str:
+        """snippet 内容指纹: (exhibit_id, page, 文本哈希)"""
+        text_hash = blake2b(snippet.get('text', '').encode("utf-8"), digest_size=8).hexdigest()
+        return f"{snippet.get('exhibit_id', '')}|{snippet.get('page', '')}|{text_hash}"
+
+    def _state_snapshot(self) -> Dict:
+        """
+        当前状态的可序列化快照（在事件循环线程中生成，避免与合并并发修改）
+
+        紧凑的列式布局：实体/关系按字段存为平行数组，字段名只出现一次；
+        snippet_id 字符串收进 snippet_table，各列表只存其下标（整数）。
+        """
+        snippet_table: List[str] = []
+        snippet_index: Dict[str, int] = {}
+
+        def _refs(snippet_ids: List[str]) -> List[int]:
+            refs = []
+            for sid in snippet_ids:
+                ref = snippet_index.get(sid)
+                if ref is None:
+                    ref = snippet_index[sid] = len(snippet_table)
+                    snippet_table.append(sid)
+                refs.append(ref)
+            return refs
+
+        entities = self.entities.values()
+        relations = self.relations
+        return {
+            "format": STATE_FORMAT_VERSION,
+            "generation": self._mark_checkpointed(uuid.uuid4().hex),
+            "known_applicant": self.known_applicant,
+            "entities": {
+                "keys": list(self.entities),
+                "ids": [e.id for e in entities],
+                "names": [e.name for e in entities],
+                "types": [e.type for e in entities],
+                "mentions": [e.mentions for e in entities],
+                "snippet_refs": [_refs(e.snippet_ids) for e in entities],
+            },
+            "relations": {
+                "from": [r.from_entity for r in relations],
+                "to": [r.to_entity for r in relations],
+                "types": [r.relation_type for r in relations],
+                "snippet_refs": [_refs(r.snippet_ids) for r in relations],
+            },
+            "snippet_table": snippet_table,
+            "processed_snippets": sorted(self.processed_snippets),
+            "saved_at": datetime.now().isoformat()
+        }
+
+    def _mark_checkpointed(self, generation: str) -> str:
+        """记录当前状态已全部写出（之后的修改进入下一条增量）"""
+        self._checkpoint_generation = generation
+        self._saved_entity_count = len(self.entities)
+        self._saved_relation_count = len(self.relations)
+        self._dirty_entity_keys.clear()
+        self._dirty_relation_indices.clear()
+        self._unsaved_processed = []
+        return generation
+
+    def _delta_snapshot(self) -> Dict:
+        """上次写入后的增量：新实体/关系、被合并修改过的已保存实体/关系、新处理的 snippet"""
+        saved_entities = self._saved_entity_count
+        saved_relations = self._saved_relation_count
+        new_entities = list(self.entities.items())[saved_entities:]
+        new_keys = {key for key, _ in new_entities}
+        delta = {
+            "generation": self._checkpoint_generation,
+            "entities": [[key, e.to_dict()] for key, e in new_entities],
+            "entity_updates": [
+                [key, self.entities[key].mentions, list(self.entities[key].snippet_ids)]
+                for key in self._dirty_entity_keys
+                if key in self.entities and key not in new_keys
+            ],
+            "relations": [r.to_dict() for r in self.relations[saved_relations:]],
+            "relation_updates": [
+                [idx, list(self.relations[idx].snippet_ids)]
+                for idx in sorted(self._dirty_relation_indices)
+                if idx < saved_relations
+            ],
+            "processed_snippets": self._unsaved_processed
+        }
+        self._mark_checkpointed(self._checkpoint_generation)
+        return delta
+
+    @staticmethod
+    def _delta_path(path: Path) -> Path:
+        return path.with_name(path.name + ".delta.jsonl")
+
+    @staticmethod
+    def _append_delta_file(path: Path, delta: Dict):
+        """向增量日志追加一行"""
+        if ORJSON_SUPPORT:
+            line = orjson.dumps(delta) + b"\n"
+        else:
+            line = (json.dumps(delta, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(RelationshipAnalyzer._delta_path(path), 'ab') as f:
+            f.write(line)
+
+    def _replay_deltas(self, path: Path, generation: Optional[str]) -> int:
+        """
+        按顺序重放增量日志中属于该基准快照的记录
+
+        其他 generation 的记录（旧快照遗留）与末尾写了一半的行被忽略。
+
+        Returns:
+            重放的记录数
+        """
+        delta_path = self._delta_path(path)
+        if generation is None or not delta_path.exists():
+            return 0
+
+        replayed = 0
+        with open(delta_path, 'rb') as f:
+            for line in f:
+                try:
+                    delta = orjson.loads(line) if ORJSON_SUPPORT else json.loads(line)
+                except ValueError:
+                    break
+                if delta.get("generation") != generation:
+                    continue
+
+                for key, data in delta["entities"]:
+                    self.entities[key] = Entity(**data)
+                for key, mentions, snippet_ids in delta["entity_updates"]:
+                    entity = self.entities.get(key)
+                    if entity is not None:
+                        entity.mentions = mentions
+                        entity.snippet_ids = snippet_ids
+                for idx, snippet_ids in delta["relation_updates"]:
+                    if idx < len(self.relations):
+                        self.relations[idx].snippet_ids = snippet_ids
+                self.relations.extend(Relation(**data) for data in delta["relations"])
+                self.processed_snippets.update(delta["processed_snippets"])
+                replayed += 1
+        return replayed
+
+    @staticmethod
+    def _restore_state(state: Dict) -> Tuple[Dict[str, Entity], List[Relation]]:
+        """从快照还原实体/关系（兼容旧版按行保存的格式）"""
+        if state.get("format") != STATE_FORMAT_VERSION:
+            entities = {key: Entity(**data) for key, data in state.get("entities", [])}
+            relations = [Relation(**data) for data in state.get("relations", [])]
+            return entities, relations
+
+        table = state["snippet_table"]
+        ent = state["entities"]
+        entities = {
+            key: Entity(
+                id=eid, name=name, type=etype, mentions=mentions,
+                snippet_ids=[table[ref] for ref in refs]
+            )
+            for key, eid, name, etype, mentions, refs in zip(
+                ent["keys"], ent["ids"], ent["names"], ent["types"],
+                ent["mentions"], ent["snippet_refs"]
+            )
+        }
+        rel = state["relations"]
+        relations = [
+            Relation(
+                from_entity=from_entity, to_entity=to_entity, relation_type=rtype,
+                snippet_ids=[table[ref] for ref in refs]
+            )
+            for from_entity, to_entity, rtype, refs in zip(
+                rel["from"], rel["to"], rel["types"], rel["snippet_refs"]
+            )
+        ]
+        return entities, relations
+
+    @staticmethod
+    def _write_state_file(path: Path, state: Dict):
+        """先写临时文件再 os.replace，中途崩溃不会留下半截状态文件"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        if ORJSON_SUPPORT:
+            tmp_path.write_bytes(orjson.dumps(state))
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def _write_base_files(cls, path: Path, state: Dict):
+        """写完整快照并清空增量日志（旧日志的 generation 不匹配，即使残留也不会被重放）"""
+        cls._write_state_file(path, state)
+        cls._delta_path(path).unlink(missing_ok=True)
+
+    def save_state(self, path: Path):
+        """保存实体/关系和已处理 snippet，供后续增量分析复用（完整快照，同时压缩增量日志）"""
+        self._write_base_files(path, self._state_snapshot())
+
+    def _schedule_checkpoint(self, path: Path):
+        """
+        请求一次非阻塞的 checkpoint 写入
+
+        写文件在线程中进行；写入期间到来的多次请求合并为一次（只写最新状态）。
+        """
+        self._checkpoint_dirty = True
+        if self._checkpoint_task is None or self._checkpoint_task.done():
+            self._checkpoint_task = asyncio.create_task(self._flush_checkpoints(path))
+
+    async def _flush_checkpoints(self, path: Path):
+        while self._checkpoint_dirty:
+            self._checkpoint_dirty = False
+            # 本次运行的第一次 checkpoint 写完整快照，之后只追加增量
+            if self._checkpoint_generation is None:
+                write, payload = self._write_base_files, self._state_snapshot()
+            else:
+                write, payload = self._append_delta_file, self._delta_snapshot()
+            try:
+                await asyncio.to_thread(write, path, payload)
+            except Exception as e:
+                print(f"[RelationshipAnalyzer] Checkpoint write failed: {e}")
+                # 增量链已断开，下次重新写完整快照
+                self._checkpoint_generation = None
+
+    def load_state(
+        self,
+        path: Path,
+        known_applicant: Optional[str] = None,
+        snippets: Optional[List[Dict]] = None
+    ) -> bool:
+        """
+        加载之前保存的状态
+
+        申请人与保存时不同（提取 prompt 与名称归一化依赖申请人）或文件损坏时不加载。
+        提供 snippets 时按当前 snippet 集合裁剪（见 _prune_to_snippets）。
+
+        Returns:
+            是否成功加载
+        """
+        if not path.exists():
+            return False
+
+        try:
+            if ORJSON_SUPPORT:
+                state = orjson.loads(path.read_bytes())
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+        except Exception as e:
+            print(f"[RelationshipAnalyzer] Failed to load state: {e}")
+            return False
+
+        if state.get("known_applicant") != known_applicant:
+            print("[RelationshipAnalyzer] Saved state is for a different applicant, starting fresh")
+            return False
+
+        try:
+            entities, relations = self._restore_state(state)
+        except (KeyError, TypeError, IndexError) as e:
+            print(f"[RelationshipAnalyzer] Failed to load state: {e}")
+            return False
+
+        self.known_applicant = known_applicant
+        self.entities = entities
+        self.relations = relations
+        self.processed_snippets = set(state.get("processed_snippets", []))
+        try:
+            replayed = self._replay_deltas(path, state.get("generation"))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"[RelationshipAnalyzer] Failed to replay checkpoint deltas: {e}")
+            self.entities, self.relations = self._restore_state(state)
+            self.processed_snippets = set(state.get("processed_snippets", []))
+            replayed = 0
+        if replayed:
+            print(f"[RelationshipAnalyzer] Replayed {replayed} checkpoint deltas")
+        if snippets is not None:
+            self._prune_to_snippets(snippets)
+        # 下次 checkpoint 重写完整快照（把已重放的增量与裁剪压缩进去）
+        self._checkpoint_generation = None
+        print(f"[RelationshipAnalyzer] Loaded state: {len(self.entities)} entities, "
+              f"{len(self.processed_snippets)} processed snippets")
+        return True
+
+    def _prune_to_snippets(self, snippets: List[Dict]):
+        """
+        按当前 snippet 集合裁剪已加载的状态
+
+        已删除或文本已修改的 snippet 从 processed_snippets 与各实体/关系的 snippet_ids 中移除；
+        不再关联任何 snippet 的实体和关系一并删除（提及次数按移除的 snippet 数扣减）。
+        """
+        current_keys = {self._snippet_key(s) for s in snippets}
+        current_ids = {s.get('snippet_id', '') for s in snippets}
+
+        stale_processed = len(self.processed_snippets - current_keys)
+        self.processed_snippets &= current_keys
+
+        dropped_entities = 0
+        for key in list(self.entities):
+            entity = self.entities[key]
+            kept = [sid for sid in entity.snippet_ids if sid in current_ids]
+            if len(kept) == len(entity.snippet_ids):
+                continue
+            if not kept:
+                del self.entities[key]
+                dropped_entities += 1
+                continue
+            entity.mentions = max(len(kept), entity.mentions - (len(entity.snippet_ids) - len(kept)))
+            entity.snippet_ids = kept
+
+        relations = []
+        for relation in self.relations:
+            kept = [sid for sid in relation.snippet_ids if sid in current_ids]
+            if kept:
+                relation.snippet_ids = kept
+                relations.append(relation)
+        dropped_relations = len(self.relations) - len(relations)
+        self.relations = relations
+
+        if stale_processed or dropped_entities or dropped_relations:
+            print(f"[RelationshipAnalyzer] Pruned state to current snippets: {stale_processed} stale snippets, "
+                  f"{dropped_entities} entities, {dropped_relations} relations removed")
 
     async def analyze_snippets(
         self,
         snippets: List[Dict],
         known_applicant_name: Optional[str] = None,
-        progress_callback=None
+        progress_callback=None,
+        checkpoint_path: Optional[Path] = None
     ) -> Dict:
         """
         分析 snippets，提取实体、关系，识别主体
@@ -117,6 +884,8 @@ class RelationshipAnalyzer:
             snippets: [{snippet_id, text, standard_key, exhibit_id, ...}, ...]
             known_applicant_name: 已知的申请人姓名（如果提供则跳过识别步骤）
             progress_callback: (current, total, message) -> None
+            checkpoint_path: 提供时每合并完一批就写入分析器状态，
+                             中断后重新运行（load_state）只需提取剩余批次
 
         Returns:
             {
@@ -145,27 +914,61 @@ class RelationshipAnalyzer:
         if progress_callback:
             progress_callback(0, 100, "Extracting entities...")
 
-        # 将 snippets 分批处理（每批约 10 个）
-        batch_size = 10
-        all_extractions = []
+        # 增量分析: 跳过已提取过实体的 snippet（加载了之前的状态时）
+        self.known_applicant = known_applicant_name
+        # 指纹每个 snippet 只计算一次（分批后按对象 id 取回）
+        snippet_keys = {id(s): self._snippet_key(s) for s in snippets}
+        new_snippets = [
+            s for s in snippets
+            if snippet_keys[id(s)] not in self.processed_snippets
+        ]
+        if len(new_snippets) < total:
+            print(f"[RelationshipAnalyzer] Reusing extraction for {total - len(new_snippets)} "
+                  f"previously processed snippets")
 
-        for i in range(0, total, batch_size):
-            batch = snippets[i:i+batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (total + batch_size - 1) // batch_size
+        # 截断后的 prompt 文本只切片一次，分批（按长度）与构建 prompt 共用
+        prompt_texts = [s.get('text', '')[:EXTRACTION_SNIPPET_CHARS] for s in new_snippets]
 
+        # 按字符预算分批（每批最多 EXTRACTION_BATCH_SIZE 个）
+        bins = _group_snippets_by_length(
+            [len(t) for t in prompt_texts], EXTRACTION_BATCH_CHAR_LIMIT, EXTRACTION_BATCH_SIZE
+        )
+        batches = [[new_snippets[i] for i in members] for members in bins]
+        total_batches = len(batches)
+        completed = 0
+
+        async def _guarded_extract(batch: List[Dict], texts: List[str]) -> Dict:
+            nonlocal completed
+            extraction = await self._extract_entities_batch(batch, known_applicant_name, texts)
+            completed += 1
             if progress_callback:
-                progress = int((i / total) * 40)
-                progress_callback(progress, 100, f"Extracting batch {batch_num}/{total_batches}...")
-
-            extraction = await self._extract_entities_batch(batch, known_applicant_name)
-            all_extractions.append(extraction)
-
-            # 小延迟避免 rate limit
-            await asyncio.sleep(0.5)
-
-        # 合并所有提取结果
-        self._merge_extractions(all_extractions)
+                progress = int((completed / total_batches) * 40)
+                progress_callback(progress, 100, f"Extracted batch {completed}/{total_batches}...")
+            return extraction
+
+        # 并发提取（LLM 调用由 self._llm_semaphore 限流），按批次顺序逐个合并：
+        # 前面批次一完成就合并，与后续批次的 LLM 调用重叠，合并顺序保持确定
+        merge = self._extraction_merger()
+        tasks = [
+            asyncio.create_task(_guarded_extract(batch, [prompt_texts[i] for i in members]))
+            for batch, members in zip(batches, bins)
+        ]
+        try:
+            for batch, task in zip(batches, tasks):
+                extraction = await task
+                merge(extraction)
+                # 提取失败或响应被截断（只有部分结果）的批次不记为已处理，下次运行时重试
+                if "error" not in extraction and not is_truncated_response(extraction):
+                    batch_keys = [snippet_keys[id(s)] for s in batch]
+                    self.processed_snippets.update(batch_keys)
+                    self._unsaved_processed.extend(batch_keys)
+                if checkpoint_path is not None:
+                    self._schedule_checkpoint(checkpoint_path)
+        finally:
+            for task in tasks:
+                task.cancel()
+        if self._checkpoint_task is not None:
+            await self._checkpoint_task
 
         # Step 2: 识别主体（申请人）- 如果已提供则跳过
         if progress_callback:
@@ -193,15 +996,16 @@ class RelationshipAnalyzer:
             progress_callback(100, 100, "Analysis complete")
 
         result = {
-            "entities": [asdict(e) for e in self.entities.values()],
-            "relations": [asdict(r) for r in self.relations],
+            "entities": [e.to_dict() for e in self.entities.values()],
+            "relations": [r.to_dict() for r in self.relations],
             "main_subject": main_subject,
-            "attributions": [asdict(a) for a in attributions],
+            "attributions": [a.to_dict() for a in attributions],
             "stats": {
                 "total_snippets": total,
                 "entity_count": len(self.entities),
                 "relation_count": len(self.relations),
                 "main_subject": main_subject,
+                "extracted_snippets": len(new_snippets),
                 "analyzed_at": datetime.now().isoformat()
             }
         }
@@ -211,13 +1015,23 @@ class RelationshipAnalyzer:
 
         return result
 
-    async def _extract_entities_batch(self, batch: List[Dict], known_applicant: Optional[str] = None) -> Dict:
-        """从一批 snippets 中提取实体和关系"""
+    async def _extract_entities_batch(
+        self,
+        batch: List[Dict],
+        known_applicant: Optional[str] = None,
+        texts: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        从一批 snippets 中提取实体和关系
+
+        texts: 与 batch 对应的已截断文本（调用方已预先切片时传入）
+        """
+        if texts is None:
+            texts = [s.get('text', '')[:EXTRACTION_SNIPPET_CHARS] for s in batch]
 
         # 构建输入文本
         quotes_text = []
-        for i, s in enumerate(batch):
-            text = s.get('text', '')[:500]  # 限制长度
+        for i, (s, text) in enumerate(zip(batch, texts)):
             snippet_id = s.get('snippet_id', f'snp_{i}')
             quotes_text.append(f"[{snippet_id}] {text}")
 
@@ -230,100 +1044,125 @@ When you see names like "{known_applicant}", "Coach {known_applicant.split()[0]}
 Please normalize all references to the applicant as "{known_applicant}" in the output.
 """
 
-        prompt = f"""Analyze these evidence snippets from an EB-1A visa petition and extract entities and relationships.
-{applicant_hint}
-Snippets:
-{chr(10).join(quotes_text)}
-
-Extract:
-1. Entities: People (especially the applicant and recommendation letter writers), organizations, awards, publications, positions
-2. Relationships: ALL meaningful relationships including:
-   - Who received what award
-   - Who works at which organization
-   - Who authored what publication
-   - Who writes recommendation letters for whom
-   - Who recommends someone to which organization
-   - Who supervised/mentored/trained whom
-
-Return JSON:
-{{
-  "entities": [
-    {{"name": "Dr. John Smith", "type": "person", "snippet_ids": ["snp_xxx"]}},
-    {{"name": "Best Paper Award", "type": "award", "snippet_ids": ["snp_xxx"]}},
-    {{"name": "Harvard University", "type": "organization", "snippet_ids": ["snp_xxx"]}}
-  ],
-  "relations": [
-    {{"from": "Dr. John Smith", "to": "Best Paper Award", "type": "received", "snippet_ids": ["snp_xxx"]}},
-    {{"from": "Prof. Jane Doe", "to": "Dr. John Smith", "type": "writes_recommendation_for", "snippet_ids": ["snp_xxx"]}},
-    {{"from": "Prof. Jane Doe", "to": "Harvard University", "type": "recommends_to", "snippet_ids": ["snp_xxx"]}}
-  ]
-}}
-
-Entity types: person, organization, award, publication, position, project, event, metric
-Relation types: received, works_at, leads, authored, founded, member_of, published_in, cited_by, collaborated, judged, owns, writes_recommendation_for, recommends_to, recommends_for_position, supervised_by, mentored_by, trained_by, coached_by, evaluated_by
-
-IMPORTANT for recommendation letters:
-- If someone writes a recommendation letter, create TWO relations:
-  1. "writes_recommendation_for" from writer to applicant
-  2. "recommends_to" from writer to the target organization (if mentioned)
-- Also capture supervisor/mentor relationships mentioned in letters
-
-Important:
-- Use exact names from text (but normalize applicant name variations)
-- Include snippet_ids where each entity/relation appears
-- Focus on the applicant and their achievements
-- Pay special attention to recommendation letter relationships"""
+        prompt = "".join((
+            ENTITY_EXTRACTION_PROMPT_HEAD,
+            applicant_hint,
+            "\nSnippets:\n",
+            "\n".join(quotes_text),
+            ENTITY_EXTRACTION_PROMPT_TAIL
+        ))
 
         try:
-            result = await call_llm(
+            result = await _call_llm_cached(
                 prompt=prompt,
                 model=self.model,
-                system_prompt="You are an expert at analyzing visa petition evidence. Extract entities and relationships precisely.",
+                system_prompt=ENTITY_EXTRACTION_SYSTEM_PROMPT,
+                json_schema=ENTITY_EXTRACTION_SCHEMA,
+                limiter=self._rate_limiter,
+                semaphore=self._llm_semaphore,
+                use_cache=self.use_cache,
                 temperature=0.1
             )
             return result
         except Exception as e:
             print(f"[RelationshipAnalyzer] Batch extraction failed: {e}")
-            return {"entities": [], "relations": []}
+            return {"entities": [], "relations": [], "error": str(e)}
 
-    def _merge_extractions(self, extractions: List[Dict]):
-        """合并多批提取结果，去重"""
+    def _extraction_merger(self):
+        """
+        创建增量合并函数
+
+        返回 merge(extraction)：把一批提取结果合并进 self.entities / self.relations 并去重。
+        去重索引在多次调用间复用，因此可以在各批次 LLM 结果到达时逐批合并。
+        """
+
+        # 别名匹配索引（与 self.entities 的插入顺序保持一致）
+        name_index = _EntityNameIndex()
+        for key in self.entities:
+            name_index.add(key)
+
+        # 关系去重索引: (from 小写, to 小写, 类型) -> 已有关系在 self.relations 中的下标
+        relation_index: Dict[Tuple[str, str, str], int] = {}
+        for idx, existing_r in enumerate(self.relations):
+            relation_index.setdefault(
+                (existing_r.from_entity.lower(), existing_r.to_entity.lower(), existing_r.relation_type),
+                idx
+            )
+
+        # 规范化名称 -> 已解析的实体 key。合并期间 self.entities 只追加（实体删除只发生在
+        # 加载状态时的裁剪和全部批次合并后的申请人合并），而 find 返回最早加入的匹配 key，
+        # 之后加入的 key 不会改变已解析的结果，同名实体（批内或跨批重复出现）只需查一次索引
+        resolved_keys: Dict[str, Optional[str]] = {}
+
+        # 各 snippet_ids 列表的成员集合（按列表对象索引，代替 list 线性查找）
+        seen_ids: Dict[int, Set[str]] = {}
+
+        # 已用的实体 ID（加载的状态经过裁剪或合并后实体数少于已分配的 ID 数，按数量生成会重复）
+        used_entity_ids = {e.id for e in self.entities.values()}
+
+        def _new_entity_id() -> str:
+            index = len(self.entities)
+            while f"e_{index}" in used_entity_ids:
+                index += 1
+            used_entity_ids.add(f"e_{index}")
+            return f"e_{index}"
+
+        def _merge_snippet_ids(target: List[str], items: List[str]):
+            seen = seen_ids.get(id(target))
+            if seen is None:
+                seen = seen_ids[id(target)] = set(target)
+            _extend_unique(target, items, seen)
+
+        def merge(extraction: Dict):
+            # 本批响应内: 原始名称 -> 已解析的实体 key（同一响应常重复提到同一实体，
+            # 命中时跳过去空白、规范化和索引查找）
+            batch_keys: Dict[str, str] = {}
 
-        for extraction in extractions:
             # 合并实体
             for e in extraction.get("entities", []):
-                name = e.get("name", "").strip()
+                raw_name = e.get("name", "")
+                snippet_ids = e.get("snippet_ids", [])
+
+                existing_key = batch_keys.get(raw_name)
+                if existing_key is not None:
+                    self.entities[existing_key].mentions += 1
+                    _merge_snippet_ids(self.entities[existing_key].snippet_ids, snippet_ids)
+                    self._dirty_entity_keys.add(existing_key)
+                    continue
+
+                name = raw_name.strip()
                 if not name:
                     continue
 
                 etype = e.get("type", "unknown")
-                snippet_ids = e.get("snippet_ids", [])
 
                 # 规范化名称用于去重
-                norm_name = name.lower().replace(".", "").replace(",", "")
+                norm_name = _normalize_name(name)
 
                 # 查找是否已存在
-                existing_key = None
-                for key, entity in self.entities.items():
-                    if key == norm_name or norm_name in key or key in norm_name:
-                        existing_key = key
-                        break
+                if norm_name in resolved_keys:
+                    existing_key = resolved_keys[norm_name]
+                else:
+                    existing_key = name_index.find(norm_name)
 
                 if existing_key:
                     # 合并到已有实体
                     self.entities[existing_key].mentions += 1
-                    for sid in snippet_ids:
-                        if sid not in self.entities[existing_key].snippet_ids:
-                            self.entities[existing_key].snippet_ids.append(sid)
+                    _merge_snippet_ids(self.entities[existing_key].snippet_ids, snippet_ids)
+                    self._dirty_entity_keys.add(existing_key)
                 else:
                     # 创建新实体
                     self.entities[norm_name] = Entity(
-                        id=f"e_{len(self.entities)}",
+                        id=_new_entity_id(),
                         name=name,
                         type=etype,
                         mentions=1,
                         snippet_ids=snippet_ids
                     )
+                    name_index.add(norm_name)
+                    existing_key = norm_name
+                resolved_keys[norm_name] = existing_key
+                batch_keys[raw_name] = existing_key
 
             # 合并关系
             for r in extraction.get("relations", []):
@@ -334,27 +1173,35 @@ Important:
 
                 if not from_name or not to_name:
                     continue
+                # 实体指向自身的关系没有意义（LLM 偶尔会把申请人的不同称呼连起来）
+                if _normalize_name(from_name) == _normalize_name(to_name):
+                    continue
 
                 # 检查是否已存在相同关系
-                exists = False
-                for existing_r in self.relations:
-                    if (existing_r.from_entity.lower() == from_name.lower() and
-                        existing_r.to_entity.lower() == to_name.lower() and
-                        existing_r.relation_type == rel_type):
-                        # 合并 snippet_ids
-                        for sid in snippet_ids:
-                            if sid not in existing_r.snippet_ids:
-                                existing_r.snippet_ids.append(sid)
-                        exists = True
-                        break
-
-                if not exists:
-                    self.relations.append(Relation(
+                relation_key = (from_name.lower(), to_name.lower(), rel_type)
+                existing_idx = relation_index.get(relation_key)
+
+                if existing_idx is not None:
+                    # 合并 snippet_ids
+                    _merge_snippet_ids(self.relations[existing_idx].snippet_ids, snippet_ids)
+                    self._dirty_relation_indices.add(existing_idx)
+                else:
+                    relation = Relation(
                         from_entity=from_name,
                         to_entity=to_name,
                         relation_type=rel_type,
                         snippet_ids=snippet_ids
-                    ))
+                    )
+                    relation_index[relation_key] = len(self.relations)
+                    self.relations.append(relation)
+
+        return merge
+
+    def _merge_extractions(self, extractions: List[Dict]):
+        """合并多批提取结果，去重"""
+        merge = self._extraction_merger()
+        for extraction in extractions:
+            merge(extraction)
 
     def _consolidate_applicant_entities(self, main_subject: str):
         """
@@ -386,17 +1233,22 @@ Important:
             possible_variations.add(f"{first_name.lower()} {last_name.lower()}")
             possible_variations.add(f"{last_name.lower()}, {first_name.lower()}")
 
+        # 变体匹配索引: 正则一次扫描判断"某变体是名称的子串"，
+        # 预先枚举变体的全部子串判断"名称是某变体的子串"
+        variation_pattern = re.compile("|".join(re.escape(v) for v in possible_variations))
+        variation_substrings = {""}
+        for v in possible_variations:
+            variation_substrings.update(v[i:j] for i in range(len(v)) for j in range(i + 1, len(v) + 1))
+
         # 找出所有匹配的实体
         matching_keys = []
         for key, entity in self.entities.items():
             if entity.type != "person":
                 continue
-            name_lower = entity.name.lower().replace(".", "").replace(",", "").strip()
+            name_lower = _normalize_name(entity.name).strip()
             # 检查是否匹配任何变体
-            for variation in possible_variations:
-                if variation in name_lower or name_lower in variation:
-                    matching_keys.append(key)
-                    break
+            if name_lower in variation_substrings or variation_pattern.search(name_lower):
+                matching_keys.append(key)
 
         if len(matching_keys) <= 1:
             print(f"[RelationshipAnalyzer] No name variations to consolidate for {main_subject}")
@@ -415,7 +1267,7 @@ Important:
             print(f"  - Merging: {entity.name} ({entity.mentions} mentions)")
 
         # 更新或创建主实体
-        main_key = main_subject.lower().replace(".", "").replace(",", "")
+        main_key = _normalize_name(main_subject)
         if main_key in self.entities:
             self.entities[main_key].snippet_ids = list(consolidated_snippets)
             self.entities[main_key].mentions = total_mentions
@@ -428,21 +1280,47 @@ Important:
                 snippet_ids=list(consolidated_snippets)
             )
 
-        # 删除其他变体
+        # 删除其他变体（实体的插入顺序被打乱，增量 checkpoint 无法按下标追加，下次写完整快照）
         for key in matching_keys:
             if key != main_key and key in self.entities:
                 del self.entities[key]
+        self._checkpoint_generation = None
 
         # 更新关系中的实体名称
         for relation in self.relations:
-            for variation in possible_variations:
-                if variation in relation.from_entity.lower():
-                    relation.from_entity = main_subject
-                if variation in relation.to_entity.lower():
-                    relation.to_entity = main_subject
+            if variation_pattern.search(relation.from_entity.lower()):
+                relation.from_entity = main_subject
+            if variation_pattern.search(relation.to_entity.lower()):
+                relation.to_entity = main_subject
+
+        # 改名后不同变体的关系可能变成同一条，按键合并
+        self._dedup_relations()
 
         print(f"[RelationshipAnalyzer] Consolidated to single entity: {main_subject} ({total_mentions} total mentions)")
 
+    def _dedup_relations(self):
+        """按 (from 小写, to 小写, 类型) 合并重复关系（保留首次出现的顺序，合并 snippet_ids）"""
+        relations_by_key: Dict[Tuple[str, str, str], Relation] = {}
+        seen_ids: Dict[Tuple[str, str, str], Set[str]] = {}
+
+        for relation in self.relations:
+            key = (relation.from_entity.lower(), relation.to_entity.lower(), relation.relation_type)
+            existing = relations_by_key.get(key)
+            if existing is None:
+                relations_by_key[key] = relation
+                continue
+
+            seen = seen_ids.get(key)
+            if seen is None:
+                seen = seen_ids[key] = set(existing.snippet_ids)
+            _extend_unique(existing.snippet_ids, relation.snippet_ids, seen)
+
+        if len(relations_by_key) < len(self.relations):
+            print(f"[RelationshipAnalyzer] Merged {len(self.relations) - len(relations_by_key)} duplicate relations")
+            self.relations = list(relations_by_key.values())
+            # 关系下标已变化，下次 checkpoint 写完整快照
+            self._checkpoint_generation = None
+
     async def _identify_main_subject(self, snippets: List[Dict]) -> Optional[str]:
         """
         识别主体（申请人）
@@ -496,10 +1374,14 @@ The applicant is typically:
 - NOT the letter writer or reference"""
 
         try:
-            result = await call_llm(
+            result = await _call_llm_cached(
                 prompt=prompt,
                 model=self.model,
-                system_prompt="Identify the main applicant in a visa petition.",
+                system_prompt=MAIN_SUBJECT_SYSTEM_PROMPT,
+                json_schema=MAIN_SUBJECT_SCHEMA,
+                limiter=self._rate_limiter,
+                semaphore=self._llm_semaphore,
+                use_cache=self.use_cache,
                 temperature=0.1
             )
 
@@ -535,16 +1417,16 @@ The applicant is typically:
                 for s in snippets
             ]
 
-        # 批量处理归属判断
-        attributions = []
-        batch_size = 15
+        # 批量处理归属判断（并发执行，结果保持输入顺序）
+        batch_size = ATTRIBUTION_BATCH_SIZE
+        batch_results = await asyncio.gather(*[
+            self._attribute_batch(snippets[i:i+batch_size], main_subject)
+            for i in range(0, len(snippets), batch_size)
+        ])
 
-        for i in range(0, len(snippets), batch_size):
-            batch = snippets[i:i+batch_size]
-            batch_attributions = await self._attribute_batch(batch, main_subject)
+        attributions = []
+        for batch_attributions in batch_results:
             attributions.extend(batch_attributions)
-            await asyncio.sleep(0.3)
-
         return attributions
 
     async def _attribute_batch(
@@ -566,10 +1448,8 @@ The applicant is typically:
 Snippets:
 {chr(10).join(quotes_text)}
 
-Return JSON array:
-[
-  {{"snippet_id": "snp_xxx", "subject": "Name of person this describes", "is_applicant": true, "confidence": 0.9}}
-]
+Return compact JSON:
+{{"attributions":[{{"snippet_id":"snp_xxx","subject":"Name of person this describes","is_applicant":true,"confidence":0.9}}]}}
 
 Rules:
 - is_applicant = true if the achievement belongs to {main_subject}
@@ -578,10 +1458,14 @@ Rules:
 - confidence = how certain you are (0.0-1.0)"""
 
         try:
-            result = await call_llm(
+            result = await _call_llm_cached(
                 prompt=prompt,
                 model=self.model,
-                system_prompt="Determine who each piece of evidence describes.",
+                system_prompt=ATTRIBUTION_SYSTEM_PROMPT,
+                json_schema=ATTRIBUTION_SCHEMA,
+                limiter=self._rate_limiter,
+                semaphore=self._llm_semaphore,
+                use_cache=self.use_cache,
                 temperature=0.1
             )
 
@@ -621,11 +1505,52 @@ Rules:
             ]
 
 
+def _group_snippets_by_length(
+    lengths: List[int],
+    char_limit: int,
+    count_limit: int
+) -> List[List[int]]:
+    """
+    按 prompt 字符预算分批（best-fit-decreasing 装箱）
+
+    lengths 为各 snippet 截断后的文本长度，返回每批的 snippet 下标。
+    每批总长度不超过 char_limit，数量不超过 count_limit；
+    单个超长 snippet 独占一批。按长度降序、每个放进放得下且剩余空间最小的批次，
+    较大的剩余空间留给后面的 snippet，批次更满、数量更少；
+    批内和批间仍按原始顺序排列（批次按其第一个 snippet 的位置排序）。
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+
+    bins: List[List[int]] = []
+    bin_chars: List[int] = []
+
+    for i in order:
+        length = lengths[i]
+        best, best_used = -1, -1
+        for b, used in enumerate(bin_chars):
+            if used > best_used and used + length <= char_limit and len(bins[b]) < count_limit:
+                best, best_used = b, used
+        if best >= 0:
+            bins[best].append(i)
+            bin_chars[best] += length
+        else:
+            bins.append([i])
+            bin_chars.append(length)
+
+    for members in bins:
+        members.sort()
+    bins.sort(key=lambda members: members[0])
+
+    return bins
+
+
 async def analyze_relationships(
     snippets: List[Dict],
     model: str = "gpt-4o-mini",
     applicant_name: Optional[str] = None,
-    progress_callback=None
+    progress_callback=None,
+    state_path: Optional[Path] = None,
+    use_cache: bool = True
 ) -> Dict:
     """
     关系分析入口函数
@@ -635,12 +1560,24 @@ async def analyze_relationships(
         model: 使用的模型
         applicant_name: 已知的申请人姓名（用于精确归属判断）
         progress_callback: 进度回调
+        state_path: 分析器状态文件；提供时先加载之前的实体/关系（裁剪掉已不存在的 snippet），
+                    只对新增 snippet 做实体提取，完成后写回
+        use_cache: 是否读取 LLM 响应缓存（强制重新分析时为 False，结果仍写入缓存）
 
     Returns:
         分析结果
     """
-    analyzer = RelationshipAnalyzer(model=model)
-    return await analyzer.analyze_snippets(snippets, applicant_name, progress_callback)
+    analyzer = RelationshipAnalyzer(model=model, use_cache=use_cache)
+    if state_path is not None:
+        analyzer.load_state(state_path, applicant_name, snippets)
+
+    result = await analyzer.analyze_snippets(
+        snippets, applicant_name, progress_callback, checkpoint_path=state_path
+    )
+
+    if state_path is not None:
+        analyzer.save_state(state_path)
+    return result
 
 
 # ==================== EB-1A Specific Relationship Analysis ====================
@@ -765,8 +1702,12 @@ Return your analysis as a JSON object with EXACTLY this structure:
 
 IMPORTANT: The root object MUST have a "relationships" array."""
 
+# 按 {snippets_text} 预先拆分：头部每次分析只格式化一次，尾部为固定文本
+_EB1A_USER_PROMPT_HEAD, _EB1A_USER_PROMPT_TAIL = EB1A_RELATIONSHIP_USER_PROMPT.split("{snippets_text}")
+_EB1A_USER_PROMPT_TAIL = _EB1A_USER_PROMPT_TAIL.format()
 
-@dataclass
+
+@dataclass(slots=True)
 class ApplicantRelationship:
     """申请人与实体的关系"""
     entity_name: str
@@ -790,6 +1731,19 @@ class ApplicantRelationship:
         elif self.relationship_type == "featured_in":
             self.qualifies_for_media = True
 
+    def to_dict(self) -> Dict:
+        return {
+            "entity_name": self.entity_name,
+            "entity_type": self.entity_type,
+            "relationship_type": self.relationship_type,
+            "evidence_snippets": list(self.evidence_snippets),
+            "confidence": self.confidence,
+            "reasoning": self.reasoning,
+            "qualifies_for_leadership": self.qualifies_for_leadership,
+            "qualifies_for_membership": self.qualifies_for_membership,
+            "qualifies_for_media": self.qualifies_for_media,
+        }
+
 
 async def analyze_applicant_relationships(
     snippets: List[Dict],
@@ -846,21 +1800,23 @@ async def analyze_applicant_relationships(
         f"- {e.get('name', '')} ({e.get('type', '')})"
         for e in org_entities
     ])
+    prompt_head = _EB1A_USER_PROMPT_HEAD.format(
+        applicant_name=applicant_name,
+        entities_list=entities_list
+    )
 
     # 分批处理 snippets
     total_snippets = len(snippets)
     num_batches = (total_snippets + batch_size - 1) // batch_size
     print(f"[EB1A-RelationshipAnalyzer] Processing {num_batches} batches (batch_size={batch_size})")
 
-    all_raw_relationships = []
+    semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
-    for batch_idx in range(num_batches):
+    async def _analyze_batch(batch_idx: int) -> List[Dict]:
         start_idx = batch_idx * batch_size
         end_idx = min(start_idx + batch_size, total_snippets)
         batch_snippets = snippets[start_idx:end_idx]
 
-        print(f"[EB1A-RelationshipAnalyzer] Batch {batch_idx + 1}/{num_batches}: snippets {start_idx}-{end_idx}")
-
         # 准备 snippets 文本 (包含上下文)
         snippets_text = []
         for i, s in enumerate(batch_snippets):
@@ -875,18 +1831,16 @@ async def analyze_applicant_relationships(
                 snippets_text.append(f"[{snippet_id}] {text[:250]}")
 
         # 构建 prompt
-        user_prompt = EB1A_RELATIONSHIP_USER_PROMPT.format(
-            applicant_name=applicant_name,
-            entities_list=entities_list,
-            snippets_text="\n\n".join(snippets_text)
-        )
+        user_prompt = "".join((prompt_head, "\n\n".join(snippets_text), _EB1A_USER_PROMPT_TAIL))
 
+        print(f"[EB1A-RelationshipAnalyzer] Batch {batch_idx + 1}/{num_batches}: snippets {start_idx}-{end_idx}")
         try:
-            result = await call_llm(
+            result = await _call_llm_cached(
                 prompt=user_prompt,
                 provider=provider,
                 system_prompt=EB1A_RELATIONSHIP_SYSTEM_PROMPT,
                 json_schema=EB1A_RELATIONSHIP_SCHEMA,
+                semaphore=semaphore,
                 temperature=0.1,
                 max_tokens=3000
             )
@@ -894,16 +1848,17 @@ async def analyze_applicant_relationships(
             # 解析结果
             batch_relationships = _parse_relationship_result(result)
             print(f"[EB1A-RelationshipAnalyzer] Batch {batch_idx + 1}: found {len(batch_relationships)} relationships")
-            all_raw_relationships.extend(batch_relationships)
+            return batch_relationships
 
         except Exception as e:
             print(f"[EB1A-RelationshipAnalyzer] Batch {batch_idx + 1} error: {e}")
-            continue
+            return []
 
-        # 批次间延迟，避免 rate limit
-        if batch_idx < num_batches - 1:
-            import asyncio
-            await asyncio.sleep(0.5)
+    # 并发分析各批次（信号量限流），按批次顺序汇总以保持合并结果稳定
+    batch_results = await asyncio.gather(*[_analyze_batch(i) for i in range(num_batches)])
+    all_raw_relationships = []
+    for batch_relationships in batch_results:
+        all_raw_relationships.extend(batch_relationships)
 
     # 合并和去重所有批次的结果
     print(f"[EB1A-RelationshipAnalyzer] Merging {len(all_raw_relationships)} relationships from all batches...")
@@ -946,7 +1901,7 @@ async def analyze_applicant_relationships(
     print(f"[EB1A-RelationshipAnalyzer] Non-leadership entities: {len(non_leadership_entities)}")
 
     return {
-        "relationships": [asdict(r) for r in relationships],
+        "relationships": [r.to_dict() for r in relationships],
         "leadership_entities": leadership_entities,
         "non_leadership_entities": non_leadership_entities,
         "stats": {
@@ -991,6 +1946,34 @@ def _parse_relationship_result(result: Dict) -> List[Dict]:
     return raw_relationships
 
 
+# 公司后缀统一规则（按顺序依次替换）
+_ORG_SUFFIX_REPLACEMENTS = (
+    ("co., ltd.", "co ltd"),
+    ("co.,ltd.", "co ltd"),
+    ("co. ltd.", "co ltd"),
+    ("co.ltd.", "co ltd"),
+    ("co., ltd", "co ltd"),
+    ("pte. ltd.", "pte ltd"),
+    ("pte.ltd.", "pte ltd"),
+    ("pte ltd.", "pte ltd"),
+    ("inc.", "inc"),
+    ("corp.", "corp"),
+    ("llc.", "llc"),
+)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_org_name(name: str) -> str:
+    """规范化实体名称用于去重（结果缓存，同一组织在各批次中反复出现）"""
+    name = name.lower().strip()
+    # 统一公司后缀格式
+    for old, new in _ORG_SUFFIX_REPLACEMENTS:
+        if old in name:
+            name = name.replace(old, new)
+    # 移除多余空格
+    return " ".join(name.split())
+
+
 def _merge_relationships(all_relationships: List[Dict]) -> List[Dict]:
     """
     合并来自多个批次的关系结果
@@ -1002,6 +1985,7 @@ def _merge_relationships(all_relationships: List[Dict]) -> List[Dict]:
     - 如果关系类型冲突，优先选择 leadership 关系（更重要）
     """
     entity_map = {}
+    evidence_seen: Dict[str, Set[str]] = {}  # norm_name -> evidence_snippets 成员集合
 
     # 关系类型优先级（越高越优先）
     relationship_priority = {
@@ -1018,34 +2002,16 @@ def _merge_relationships(all_relationships: List[Dict]) -> List[Dict]:
         "unknown": 0
     }
 
-    def normalize_entity_name(name: str) -> str:
-        """规范化实体名称用于去重"""
-        name = name.lower().strip()
-        # 统一公司后缀格式
-        name = name.replace("co., ltd.", "co ltd")
-        name = name.replace("co.,ltd.", "co ltd")
-        name = name.replace("co. ltd.", "co ltd")
-        name = name.replace("co.ltd.", "co ltd")
-        name = name.replace("co., ltd", "co ltd")
-        name = name.replace("pte. ltd.", "pte ltd")
-        name = name.replace("pte.ltd.", "pte ltd")
-        name = name.replace("pte ltd.", "pte ltd")
-        name = name.replace("inc.", "inc")
-        name = name.replace("corp.", "corp")
-        name = name.replace("llc.", "llc")
-        # 移除多余空格
-        name = " ".join(name.split())
-        return name
-
     for r in all_relationships:
         entity_name = r.get("entity_name", "").strip()
         if not entity_name:
             continue
 
         # 规范化名称用于去重
-        norm_name = normalize_entity_name(entity_name)
+        norm_name = _normalize_org_name(entity_name)
 
-        if norm_name not in entity_map:
+        existing = entity_map.get(norm_name)
+        if existing is None:
             entity_map[norm_name] = {
                 "entity_name": entity_name,
                 "entity_type": r.get("entity_type", "organization"),
@@ -1055,12 +2021,11 @@ def _merge_relationships(all_relationships: List[Dict]) -> List[Dict]:
                 "reasoning": r.get("reasoning", "")
             }
         else:
-            existing = entity_map[norm_name]
-
             # 合并 evidence_snippets
-            for snp in r.get("evidence_snippets", []):
-                if snp not in existing["evidence_snippets"]:
-                    existing["evidence_snippets"].append(snp)
+            seen = evidence_seen.get(norm_name)
+            if seen is None:
+                seen = evidence_seen[norm_name] = set(existing["evidence_snippets"])
+            _extend_unique(existing["evidence_snippets"], r.get("evidence_snippets", []), seen)
 
             # 比较关系类型优先级
             existing_priority = relationship_priority.get(existing["relationship_type"], 0)
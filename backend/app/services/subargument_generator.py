@@ -10,16 +10,121 @@ SubArgument Generator - 次级子论点生成器
 4. relationship 字段由 LLM 生成（如 "证明管理能力"）
 """
 
+import os
 import json
 import asyncio
+from contextlib import nullcontext
+from hashlib import blake2b
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 import uuid
+import secrets
+
+from .llm_client import call_llm, is_truncated_response, DEEPSEEK_CHAT_MODEL
+from .token_estimator import split_into_batches
+from .storage import DATA_DIR
+
+try:
+    from aiolimiter import AsyncLimiter
+    AIOLIMITER_SUPPORT = True
+except ImportError:
+    AIOLIMITER_SUPPORT = False
+
+
+# 各 Argument 的细分请求并发发送，信号量限制同时在途的 LLM 请求数
+SUBDIVIDE_MAX_CONCURRENCY = 5
+# 细分请求速率上限（令牌桶，仅在真正超过速率时等待；aiolimiter 不可用时只受并发数限制）
+SUBDIVIDE_REQUESTS_PER_SECOND = 10.0
+
+# 多个 Argument 合并到一次 LLM 调用（摊薄 system prompt 与往返开销）
+SUBDIVIDE_BATCH_ARGUMENTS = 4    # 每批最多 Argument 数
+SUBDIVIDE_BATCH_TOKENS = 6000    # 每批 snippet 内容 token 上限（token_estimator 估算）
+SUBDIVIDE_SNIPPET_CHARS = 300    # 单个 snippet 截断长度
+
+# 流式接收细分响应（传输与生成重叠，大批量响应的 JSON 在线程池中解析，不阻塞其他并发批次）
+SUBDIVIDE_STREAM_RESPONSES = True
+
+# 所有细分请求共享 SUBDIVIDE_SYSTEM_PROMPT 前缀，使用同一前缀缓存键
+SUBDIVIDE_PROMPT_CACHE_KEY = "subargument-subdivide"
+
+# 各 provider 使用的模型（显式传给 call_llm，并计入缓存键，切换模型时缓存自动失效）
+SUBDIVIDE_MODELS = {
+    "deepseek": DEEPSEEK_CHAT_MODEL,
+    "openai": "gpt-4o-mini",
+}
+
+# 细分结果持久化缓存（按模型、prompt 版本、Argument 标题、standard 与 snippet 内容哈希，重复细分时跳过 LLM）
+SUBDIVIDE_CACHE_ENABLED = True
+SUBDIVIDE_CACHE_DIR = DATA_DIR / "llm_cache" / "subarguments"
+# 修改细分 prompt（SUBDIVIDE_* 模板）或分组解析逻辑时递增，使旧缓存失效
+SUBDIVIDE_PROMPT_VERSION = 1
+
+# 精华子论点中引用 snippet 的证据层
+EVIDENCE_LAYERS = ('claim', 'proof', 'significance', 'context')
+
+_subdivide_rate_limiter = AsyncLimiter(SUBDIVIDE_REQUESTS_PER_SECOND, 1.0) if AIOLIMITER_SUPPORT else None
+
+
+# 8 位 hex ID 池: 一次读取一批随机字节，避免每个 ID 单独调用 uuid4
+_ID_POOL_SIZE = 256
+_id_pool: List[str] = []
+
+
+def _next_id(prefix: str) -> str:
+    """生成 "<prefix>-xxxxxxxx" 形式的 ID，池空时批量补充"""
+    if not _id_pool:
+        pool = secrets.token_hex(4 * _ID_POOL_SIZE)
+        _id_pool.extend(pool[i:i + 8] for i in range(0, len(pool), 8))
+    return f"{prefix}-{_id_pool.pop()}"
+
+
+def _subdivide_cache_key(argument: Dict, snippets: List[Dict], provider: str) -> str:
+    """缓存键: prompt 版本 + provider + 模型 + 标题 + standard + 按 snippet_id 排序的 (snippet_id, 截断文本)"""
+    h = blake2b(digest_size=16)
+    h.update(json.dumps([
+        SUBDIVIDE_PROMPT_VERSION, provider, SUBDIVIDE_MODELS.get(provider),
+        argument.get("title", ""), argument.get("standard", "")
+    ], ensure_ascii=False).encode("utf-8"))
+    for sid, text in sorted(
+        (s.get('snippet_id', s.get('id', '')), s.get('text', '')[:SUBDIVIDE_SNIPPET_CHARS])
+        for s in snippets
+    ):
+        h.update(b"\x00")
+        h.update(sid.encode("utf-8"))
+        h.update(b"\x01")
+        h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load_cached_groups(cache_key: str) -> Optional[List[Dict]]:
+    """读取缓存的分组（snippet_ids 为真实 ID），未命中或读取失败返回 None"""
+    if not SUBDIVIDE_CACHE_ENABLED:
+        return None
+    filepath = SUBDIVIDE_CACHE_DIR / f"{cache_key}.json"
+    if not filepath.exists():
+        return None
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f).get("groups")
+    except Exception:
+        return None
 
-from .llm_client import call_llm
 
+def _save_cached_groups(cache_key: str, groups: List[Dict]):
+    """保存分组到缓存（临时文件 + os.replace；写入失败不影响生成）"""
+    if not SUBDIVIDE_CACHE_ENABLED or not groups:
+        return
+    tmp_path = SUBDIVIDE_CACHE_DIR / f"{cache_key}.{uuid.uuid4().hex}.tmp"
+    try:
+        SUBDIVIDE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "groups": groups}, f, ensure_ascii=False)
+        os.replace(tmp_path, SUBDIVIDE_CACHE_DIR / f"{cache_key}.json")
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"[SubArgGenerator] Failed to save subdivision cache: {e}")
 
 # ==================== Prompt Templates ====================
 
@@ -67,6 +172,55 @@ RULES:
 4. Relationship should be 2-5 words explaining how this supports the main argument
 5. If snippets are too few (<=3), create 2 sub-groups"""
 
+SUBDIVIDE_BATCH_USER_PROMPT = """Below are {argument_count} independent arguments, each with its own evidence snippets.
+
+{arguments_formatted}
+
+For EACH argument, organize its snippets into 2-4 logical sub-groups. Each sub-group should represent a distinct angle or aspect of the evidence.
+
+Return JSON keyed by argument key (A1, A2, ...):
+{{
+  "arguments": {{
+    "A1": {{
+      "sub_arguments": [
+        {{
+          "title": "Scope of Responsibilities",
+          "purpose": "Demonstrates the applicant's core management duties in the organization",
+          "relationship": "Proves leadership role",
+          "snippet_ids": ["A1_S1", "A1_S3"]
+        }},
+        {{
+          "title": "Performance Achievements",
+          "purpose": "Shows specific accomplishments during tenure",
+          "relationship": "Quantifies contributions",
+          "snippet_ids": ["A1_S2", "A1_S4"]
+        }}
+      ]
+    }}
+  }}
+}}
+
+RULES:
+1. Return an entry for EVERY argument key
+2. Create 2-4 sub-groups per argument (not more, not less)
+3. Each snippet must be assigned to exactly ONE sub-group of its OWN argument
+4. Use English for all title, purpose, and relationship fields
+5. Relationship should be 2-5 words explaining how this supports the main argument
+6. If an argument has few snippets (<=3), create 2 sub-groups"""
+
+SUBDIVIDE_BATCH_ARGUMENT_BLOCK = """### [{key}] Main Argument: {argument_title}
+Standard: {standard}
+Total Snippets: {snippet_count}
+{snippets_formatted}"""
+
+# 模板在 snippets / arguments 占位处预先拆开: 含 JSON 示例的固定尾部只在加载时解析一次，
+# 每次只格式化短小的头部，大段 snippet 文本直接拼接，不经过 str.format
+_SUBDIVIDE_PROMPT_HEAD, _SUBDIVIDE_PROMPT_TAIL = SUBDIVIDE_USER_PROMPT.split("{snippets_formatted}")
+_SUBDIVIDE_PROMPT_TAIL = _SUBDIVIDE_PROMPT_TAIL.format()
+_SUBDIVIDE_BATCH_PROMPT_HEAD, _SUBDIVIDE_BATCH_PROMPT_TAIL = SUBDIVIDE_BATCH_USER_PROMPT.split("{arguments_formatted}")
+_SUBDIVIDE_BATCH_PROMPT_TAIL = _SUBDIVIDE_BATCH_PROMPT_TAIL.format()
+_SUBDIVIDE_BLOCK_HEAD, _SUBDIVIDE_BLOCK_TAIL = SUBDIVIDE_BATCH_ARGUMENT_BLOCK.split("{snippets_formatted}")
+
 
 @dataclass
 class GeneratedSubArgument:
@@ -81,11 +235,41 @@ class GeneratedSubArgument:
     status: str = "draft"
     created_at: str = ""
 
+    def to_dict(self) -> Dict[str, Any]:
+        """显式构造字典（比 dataclasses.asdict 的反射 + 深拷贝快）"""
+        return {
+            "id": self.id,
+            "argument_id": self.argument_id,
+            "title": self.title,
+            "purpose": self.purpose,
+            "relationship": self.relationship,
+            "snippet_ids": list(self.snippet_ids),
+            "is_ai_generated": self.is_ai_generated,
+            "status": self.status,
+            "created_at": self.created_at,
+        }
+
+
+async def _call_subdivide_llm(prompt: str, provider: str, max_tokens: int) -> Dict:
+    """发送细分请求（令牌桶限速；单个与批量细分共用）"""
+    async with _subdivide_rate_limiter or nullcontext():
+        return await call_llm(
+            prompt=prompt,
+            model=SUBDIVIDE_MODELS.get(provider),
+            provider=provider,
+            system_prompt=SUBDIVIDE_SYSTEM_PROMPT,
+            temperature=0.1,
+            max_tokens=max_tokens,
+            stream=SUBDIVIDE_STREAM_RESPONSES,
+            prompt_cache_key=SUBDIVIDE_PROMPT_CACHE_KEY
+        )
+
 
 async def subdivide_argument(
     argument: Dict,
     snippets: List[Dict],
-    provider: str = "deepseek"
+    provider: str = "deepseek",
+    use_cache: bool = True
 ) -> List[GeneratedSubArgument]:
     """
     对单个精华子论点进行细分
@@ -94,6 +278,7 @@ async def subdivide_argument(
         argument: 精华子论点（来自 argument_composer）
         snippets: 该 argument 关联的所有 snippets
         provider: LLM provider
+        use_cache: 为 False 时不读缓存，重新请求 LLM（结果仍写入缓存）
 
     Returns:
         List of GeneratedSubArgument
@@ -101,7 +286,7 @@ async def subdivide_argument(
     if not snippets:
         return []
 
-    argument_id = argument.get("id", f"arg-{uuid.uuid4().hex[:8]}")
+    argument_id = argument["id"] if "id" in argument else _next_id("arg")
     argument_title = argument.get("title", "Argument")
     standard = argument.get("standard", "")
 
@@ -109,94 +294,36 @@ async def subdivide_argument(
     if len(snippets) <= 2:
         return [_create_single_subarg(argument_id, snippets, standard)]
 
-    # 创建简化 ID 映射
-    id_mapping = {}  # simple_id -> real_snippet_id
-    snippets_lines = []
-
-    for i, s in enumerate(snippets, 1):
-        real_id = s.get('snippet_id', s.get('id', ''))
-        simple_id = f"S{i}"
-        id_mapping[simple_id] = real_id
-
-        text = s.get('text', '')[:300]
-        exhibit_id = s.get('exhibit_id', '')
-        layer = s.get('evidence_layer', 'claim')
-        snippets_lines.append(f"[{simple_id}] ({exhibit_id}, {layer}) {text}")
+    cache_key = _subdivide_cache_key(argument, snippets, provider)
+    groups = _load_cached_groups(cache_key) if use_cache else None
+    if groups is not None:
+        return _build_sub_arguments(argument_id, groups, snippets)
 
-    snippets_formatted = "\n".join(snippets_lines)
+    snippets_lines, id_mapping = _format_snippets(snippets)
 
     # Build prompt
-    user_prompt = SUBDIVIDE_USER_PROMPT.format(
-        argument_title=argument_title,
-        standard=standard,
-        snippet_count=len(snippets),
-        snippets_formatted=snippets_formatted
-    )
+    user_prompt = "".join((
+        _SUBDIVIDE_PROMPT_HEAD.format(
+            argument_title=argument_title,
+            standard=standard,
+            snippet_count=len(snippets)
+        ),
+        "\n".join(snippets_lines),
+        _SUBDIVIDE_PROMPT_TAIL
+    ))
 
     try:
-        result = await call_llm(
-            prompt=user_prompt,
-            provider=provider,
-            system_prompt=SUBDIVIDE_SYSTEM_PROMPT,
-            temperature=0.1,
-            max_tokens=2000
-        )
+        result = await _call_subdivide_llm(user_prompt, provider, max_tokens=2000)
 
         raw_sub_args = result.get('sub_arguments', [])
         if not raw_sub_args:
             print(f"[SubArgGenerator] LLM returned no sub-arguments for {argument_title}, using fallback")
             return [_create_single_subarg(argument_id, snippets, standard)]
 
-        # Convert to GeneratedSubArgument
-        sub_arguments = []
-        for raw_sa in raw_sub_args:
-            # Map simple IDs to real IDs
-            simple_ids = raw_sa.get('snippet_ids', [])
-            real_ids = []
-            for sid in simple_ids:
-                normalized = sid.upper() if isinstance(sid, str) else str(sid)
-                if not normalized.startswith('S'):
-                    normalized = f"S{normalized}"
-                if normalized in id_mapping:
-                    real_ids.append(id_mapping[normalized])
-
-            if not real_ids:
-                continue
-
-            sub_arg = GeneratedSubArgument(
-                id=f"subarg-{uuid.uuid4().hex[:8]}",
-                argument_id=argument_id,
-                title=raw_sa.get('title', '证据组'),
-                purpose=raw_sa.get('purpose', ''),
-                relationship=raw_sa.get('relationship', '支持论点'),
-                snippet_ids=real_ids,
-                is_ai_generated=True,
-                status="draft",
-                created_at=datetime.now().isoformat()
-            )
-            sub_arguments.append(sub_arg)
-
-        # Check for unassigned snippets
-        assigned_ids = set()
-        for sa in sub_arguments:
-            assigned_ids.update(sa.snippet_ids)
-
-        unassigned = [s for s in snippets if s.get('snippet_id', s.get('id', '')) not in assigned_ids]
-        if unassigned:
-            # Add unassigned to a catch-all sub-argument
-            catch_all = GeneratedSubArgument(
-                id=f"subarg-{uuid.uuid4().hex[:8]}",
-                argument_id=argument_id,
-                title="其他证据",
-                purpose="补充支持材料",
-                relationship="补充证明",
-                snippet_ids=[s.get('snippet_id', s.get('id', '')) for s in unassigned],
-                is_ai_generated=True,
-                status="draft",
-                created_at=datetime.now().isoformat()
-            )
-            sub_arguments.append(catch_all)
-
+        groups = _resolve_groups(raw_sub_args, id_mapping)
+        if not is_truncated_response(result):
+            _save_cached_groups(cache_key, groups)
+        sub_arguments = _build_sub_arguments(argument_id, groups, snippets)
         print(f"[SubArgGenerator] Subdivided '{argument_title}': {len(sub_arguments)} sub-arguments from {len(snippets)} snippets")
         return sub_arguments
 
@@ -205,6 +332,205 @@ async def subdivide_argument(
         return [_create_single_subarg(argument_id, snippets, standard)]
 
 
+def _format_snippets(snippets: List[Dict], key: str = "") -> Tuple[List[str], Dict[str, str]]:
+    """
+    Format snippets as prompt lines with simple IDs
+
+    key 非空时 ID 带 Argument 前缀（如 A1_S1），批量 prompt 中各 Argument 的 ID 互不冲突；
+    映射同时接受不带前缀的 S1，容忍 LLM 省略前缀。
+
+    Returns:
+        (prompt lines, simple_id -> real_snippet_id)
+    """
+    prefix = f"{key}_" if key else ""
+    real_ids = [s.get('snippet_id', s.get('id', '')) for s in snippets]
+
+    id_mapping = {f"S{i}": real_id for i, real_id in enumerate(real_ids, 1)}
+    if prefix:
+        id_mapping.update({f"{prefix}S{i}": real_id for i, real_id in enumerate(real_ids, 1)})
+
+    snippets_lines = [
+        f"[{prefix}S{i}] ({s.get('exhibit_id', '')}, {s.get('evidence_layer', 'claim')}) "
+        f"{s.get('text', '')[:SUBDIVIDE_SNIPPET_CHARS]}"
+        for i, s in enumerate(snippets, 1)
+    ]
+
+    return snippets_lines, id_mapping
+
+
+def _resolve_groups(raw_sub_args: List[Dict], id_mapping: Dict[str, str]) -> List[Dict]:
+    """Map the simple snippet IDs in LLM sub-argument groups to real IDs (groups left empty are dropped)"""
+    groups = []
+    for raw_sa in raw_sub_args:
+        # Map simple IDs to real IDs
+        simple_ids = raw_sa.get('snippet_ids', [])
+        real_ids = []
+        for sid in simple_ids:
+            normalized = sid.upper() if isinstance(sid, str) else str(sid)
+            if not normalized.startswith(('S', 'A')):
+                normalized = f"S{normalized}"
+            if normalized in id_mapping:
+                real_ids.append(id_mapping[normalized])
+
+        if not real_ids:
+            continue
+
+        groups.append({
+            "title": raw_sa.get('title', '证据组'),
+            "purpose": raw_sa.get('purpose', ''),
+            "relationship": raw_sa.get('relationship', '支持论点'),
+            "snippet_ids": real_ids
+        })
+    return groups
+
+
+def _build_sub_arguments(
+    argument_id: str,
+    groups: List[Dict],
+    snippets: List[Dict]
+) -> List[GeneratedSubArgument]:
+    """Convert resolved groups to GeneratedSubArgument (unassigned snippets go to a catch-all)"""
+    sub_arguments = []
+    for group in groups:
+        sub_arg = GeneratedSubArgument(
+            id=_next_id("subarg"),
+            argument_id=argument_id,
+            title=group['title'],
+            purpose=group['purpose'],
+            relationship=group['relationship'],
+            snippet_ids=list(group['snippet_ids']),
+            is_ai_generated=True,
+            status="draft",
+            created_at=datetime.now().isoformat()
+        )
+        sub_arguments.append(sub_arg)
+
+    # Check for unassigned snippets (each snippet's id resolved once)
+    assigned_ids = {sid for group in groups for sid in group['snippet_ids']}
+    unassigned_ids = [
+        sid for sid in (s.get('snippet_id', s.get('id', '')) for s in snippets)
+        if sid not in assigned_ids
+    ]
+    if unassigned_ids:
+        # Add unassigned to a catch-all sub-argument
+        catch_all = GeneratedSubArgument(
+            id=_next_id("subarg"),
+            argument_id=argument_id,
+            title="其他证据",
+            purpose="补充支持材料",
+            relationship="补充证明",
+            snippet_ids=unassigned_ids,
+            is_ai_generated=True,
+            status="draft",
+            created_at=datetime.now().isoformat()
+        )
+        sub_arguments.append(catch_all)
+
+    return sub_arguments
+
+
+async def subdivide_arguments_batch(
+    items: List[Tuple[Dict, List[Dict]]],
+    provider: str = "deepseek",
+    use_cache: bool = True
+) -> List[List[GeneratedSubArgument]]:
+    """
+    在一次 LLM 调用中细分多个精华子论点
+
+    每个 Argument 在 prompt 中有独立的 ID 命名空间（A1_S1, A2_S1, ...），
+    LLM 返回按 Argument key 索引的字典。snippets 过少的 Argument 不进 prompt；
+    响应缺少某个 Argument 或整批调用失败时，对应 Argument 退回单独调用 subdivide_argument。
+
+    Args:
+        items: [(argument, snippets), ...]，argument 格式同 subdivide_argument
+        provider: LLM provider
+        use_cache: 为 False 时不读缓存（同 subdivide_argument）
+
+    Returns:
+        与 items 一一对应的 GeneratedSubArgument 列表
+    """
+    results: List[Optional[List[GeneratedSubArgument]]] = [None] * len(items)
+    pending = []  # (item index, key, argument_id, snippets, id_mapping, cache_key)
+    blocks = []
+
+    for idx, (argument, snippets) in enumerate(items):
+        argument_id = argument["id"] if "id" in argument else _next_id("arg")
+        standard = argument.get("standard", "")
+        if not snippets:
+            results[idx] = []
+        elif len(snippets) <= 2:
+            results[idx] = [_create_single_subarg(argument_id, snippets, standard)]
+        else:
+            cache_key = _subdivide_cache_key(argument, snippets, provider)
+            groups = _load_cached_groups(cache_key) if use_cache else None
+            if groups is not None:
+                results[idx] = _build_sub_arguments(argument_id, groups, snippets)
+                continue
+
+            key = f"A{len(pending) + 1}"
+            snippets_lines, id_mapping = _format_snippets(snippets, key)
+            blocks.append("".join((
+                _SUBDIVIDE_BLOCK_HEAD.format(
+                    key=key,
+                    argument_title=argument.get("title", "Argument"),
+                    standard=standard,
+                    snippet_count=len(snippets)
+                ),
+                "\n".join(snippets_lines),
+                _SUBDIVIDE_BLOCK_TAIL
+            )))
+            pending.append((idx, key, argument_id, snippets, id_mapping, cache_key))
+
+    if len(pending) == 1:
+        # 单个 Argument 直接使用单独的 prompt
+        idx = pending[0][0]
+        results[idx] = await subdivide_argument(items[idx][0], items[idx][1], provider, use_cache)
+        pending = []
+
+    if pending:
+        user_prompt = "".join((
+            _SUBDIVIDE_BATCH_PROMPT_HEAD.format(argument_count=len(pending)),
+            "\n\n".join(blocks),
+            _SUBDIVIDE_BATCH_PROMPT_TAIL
+        ))
+
+        try:
+            result = await _call_subdivide_llm(
+                user_prompt, provider, max_tokens=min(8000, 2000 * len(pending))
+            )
+            by_key = result.get('arguments', {})
+            if not isinstance(by_key, dict):
+                by_key = {}
+            truncated = is_truncated_response(result)
+        except Exception as e:
+            print(f"[SubArgGenerator] Batch subdivision failed ({len(pending)} arguments), falling back: {e}")
+            by_key = {}
+            truncated = False
+
+        fallback = []
+        for idx, key, argument_id, snippets, id_mapping, cache_key in pending:
+            entry = by_key.get(key)
+            raw_sub_args = entry.get('sub_arguments', []) if isinstance(entry, dict) else []
+            if raw_sub_args:
+                groups = _resolve_groups(raw_sub_args, id_mapping)
+                if not truncated:
+                    _save_cached_groups(cache_key, groups)
+                results[idx] = _build_sub_arguments(argument_id, groups, snippets)
+                print(f"[SubArgGenerator] Subdivided '{items[idx][0].get('title', 'Argument')}': "
+                      f"{len(results[idx])} sub-arguments from {len(snippets)} snippets (batched)")
+            else:
+                fallback.append(idx)
+
+        if fallback:
+            fallback_results = await asyncio.gather(*[
+                subdivide_argument(items[idx][0], items[idx][1], provider, use_cache) for idx in fallback
+            ])
+            for idx, sub_args in zip(fallback, fallback_results):
+                results[idx] = sub_args
+
+    return results
+
+
 def _create_single_subarg(argument_id: str, snippets: List[Dict], standard: str) -> GeneratedSubArgument:
     """Create a single sub-argument containing all snippets (fallback)"""
     snippet_ids = [s.get('snippet_id', s.get('id', '')) for s in snippets]
@@ -220,7 +546,7 @@ def _create_single_subarg(argument_id: str, snippets: List[Dict], standard: str)
     relationship = relationship_map.get(standard, "支持论点")
 
     return GeneratedSubArgument(
-        id=f"subarg-{uuid.uuid4().hex[:8]}",
+        id=_next_id("subarg"),
         argument_id=argument_id,
         title="主要证据",
         purpose="支持主论点的核心证据",
@@ -236,7 +562,8 @@ async def generate_sub_arguments_for_composed(
     composed_arguments: Dict[str, List[Dict]],
     all_snippets: List[Dict],
     provider: str = "deepseek",
-    progress_callback=None
+    progress_callback=None,
+    use_cache: bool = True
 ) -> Tuple[List[Dict], List[Dict]]:
     """
     为所有精华子论点生成 SubArguments
@@ -246,60 +573,103 @@ async def generate_sub_arguments_for_composed(
         all_snippets: 所有 snippets
         provider: LLM provider
         progress_callback: Optional progress callback
+        use_cache: 为 False 时不读细分缓存（重新生成时使用）
 
     Returns:
         (arguments_with_subarg_ids, all_sub_arguments)
     """
     # Build snippet lookup
-    snippet_map = {}
-    for s in all_snippets:
-        sid = s.get('snippet_id', s.get('id', ''))
-        if sid:
-            snippet_map[sid] = s
-
-    all_sub_arguments = []
-    updated_arguments = []
-
-    # Count total arguments for progress
-    total_args = sum(len(args) for args in composed_arguments.values())
-    processed = 0
+    snippet_map = {
+        sid: s for s in all_snippets
+        if (sid := s.get('snippet_id', s.get('id', '')))
+    }
 
+    # Collect snippets for every argument up front (argument order is preserved)
+    jobs = []
     for standard, args in composed_arguments.items():
         for arg in args:
-            processed += 1
-            if progress_callback:
-                progress_callback(processed, total_args, f"Subdividing: {arg.get('title', '')[:30]}...")
-
-            # Collect snippets for this argument
-            arg_snippet_ids = set()
-            for layer in ['claim', 'proof', 'significance', 'context']:
-                for item in arg.get(layer, []):
-                    sid = item.get('snippet_id', '')
-                    if sid:
-                        arg_snippet_ids.add(sid)
+            # 单次遍历各证据层，按首次出现顺序去重（prompt 中的 S 编号在多次运行间保持稳定）
+            arg_snippet_ids = dict.fromkeys(
+                sid
+                for layer in EVIDENCE_LAYERS
+                for item in arg.get(layer, ())
+                if (sid := item.get('snippet_id', ''))
+            )
 
             arg_snippets = [snippet_map[sid] for sid in arg_snippet_ids if sid in snippet_map]
 
             # Generate argument ID if not present
-            arg_id = arg.get('id') or f"arg-{uuid.uuid4().hex[:8]}"
+            arg_id = arg.get('id') or _next_id("arg")
             arg['id'] = arg_id
 
-            # Subdivide
-            sub_args = await subdivide_argument(
-                argument={'id': arg_id, 'title': arg.get('title', ''), 'standard': standard},
-                snippets=arg_snippets,
-                provider=provider
-            )
+            jobs.append((standard, arg, arg_snippets))
+
+    total_args = len(jobs)
+    results: List[Any] = [None] * total_args
+
+    # snippets 不超过 2 个的 Argument 不需要 LLM，直接生成，不占用批次名额
+    llm_job_indices = []
+    for i, (standard, arg, arg_snippets) in enumerate(jobs):
+        if len(arg_snippets) > 2:
+            llm_job_indices.append(i)
+        else:
+            results[i] = [_create_single_subarg(arg['id'], arg_snippets, standard)] if arg_snippets else []
+
+    processed = total_args - len(llm_job_indices)
+    semaphore = asyncio.Semaphore(SUBDIVIDE_MAX_CONCURRENCY)
+
+    # 按估算 token 把多个 Argument 装进同一次 LLM 调用
+    batch_items = [
+        {
+            "job_index": i,
+            "quotes": [{"quote": s.get('text', '')[:SUBDIVIDE_SNIPPET_CHARS]} for s in jobs[i][2]]
+        }
+        for i in llm_job_indices
+    ]
+    batches = [
+        [item["job_index"] for item in batch]
+        for batch in split_into_batches(
+            batch_items, max_tokens=SUBDIVIDE_BATCH_TOKENS, max_groups=SUBDIVIDE_BATCH_ARGUMENTS
+        )
+    ]
+
+    async def _guarded_subdivide(job_indices: List[int]) -> List[List[GeneratedSubArgument]]:
+        nonlocal processed
+        items = [
+            ({'id': jobs[i][1]['id'], 'title': jobs[i][1].get('title', ''), 'standard': jobs[i][0]}, jobs[i][2])
+            for i in job_indices
+        ]
+        async with semaphore:
+            batch_results = await subdivide_arguments_batch(items, provider=provider, use_cache=use_cache)
+        processed += len(job_indices)
+        if progress_callback:
+            progress_callback(processed, total_args, f"Subdivided: {jobs[job_indices[-1]][1].get('title', '')[:30]}...")
+        return batch_results
+
+    # Subdivide all batches concurrently (semaphore-limited instead of fixed sleeps)
+    batch_results = await asyncio.gather(
+        *[_guarded_subdivide(job_indices) for job_indices in batches],
+        return_exceptions=True
+    )
+
+    for job_indices, outcome in zip(batches, batch_results):
+        for pos, i in enumerate(job_indices):
+            results[i] = outcome if isinstance(outcome, BaseException) else outcome[pos]
+
+    all_sub_arguments = []
+    updated_arguments = []
 
-            # Update argument with sub_argument_ids
-            arg['sub_argument_ids'] = [sa.id for sa in sub_args]
-            updated_arguments.append(arg)
+    for (standard, arg, arg_snippets), sub_args in zip(jobs, results):
+        if isinstance(sub_args, BaseException):
+            print(f"[SubArgGenerator] Error subdividing {arg.get('title', '')}: {sub_args}")
+            sub_args = [_create_single_subarg(arg['id'], arg_snippets, standard)] if arg_snippets else []
 
-            # Collect sub-arguments
-            all_sub_arguments.extend([asdict(sa) for sa in sub_args])
+        # Update argument with sub_argument_ids
+        arg['sub_argument_ids'] = [sa.id for sa in sub_args]
+        updated_arguments.append(arg)
 
-            # Rate limiting
-            await asyncio.sleep(0.2)
+        # Collect sub-arguments
+        all_sub_arguments.extend([sa.to_dict() for sa in sub_args])
 
     print(f"[SubArgGenerator] Generated {len(all_sub_arguments)} sub-arguments for {len(updated_arguments)} arguments")
     return updated_arguments, all_sub_arguments
@@ -7,13 +7,42 @@ Token Estimator Service - Token 预估与分批逻辑
 - 将候选组分批以适应 LLM 上下文限制
 
 设计决策:
-- 中文约 1.5 字符/token，英文约 4 字符/token (粗略估计，但足够安全)
+- 优先使用 tiktoken 精确计数（按文本 LRU 缓存，重复引用不重复编码）；
+  不可用时退回中文约 1.5 token/字符，英文约 4 字符/token (粗略估计，但足够安全)
 - 每批预留空间给系统 prompt 和响应
-- 顺序处理批次，不并发（保证稳定性）
+- 批次的并发发送由调用方控制（quote_consolidator.LLM_MAX_CONCURRENCY）
+- 并发时批次耗时取决于响应最长的项目，按预测输出长度排序后再装箱，
+  让同一批次的响应长度接近
 """
 
 import re
-from typing import List, Dict, Any
+from functools import lru_cache
+from itertools import accumulate
+from typing import List, Dict, Any, Optional
+
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+try:
+    from numba import njit
+    NUMBA_SUPPORT = NUMPY_SUPPORT
+except ImportError:
+    NUMBA_SUPPORT = False
+
+    def njit(*args, **kwargs):
+        """numba 不可用时退化为普通 Python 函数"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+try:
+    import tiktoken
+    TIKTOKEN_SUPPORT = True
+except ImportError:
+    TIKTOKEN_SUPPORT = False
 
 
 # =============================================
@@ -26,20 +55,79 @@ MAX_BATCH_GROUPS = 20         # 每批最大组数
 CONTEXT_RESERVE = 4000        # 预留给系统 prompt 和响应
 PROMPT_OVERHEAD_PER_GROUP = 200  # 每组的 prompt 模板开销
 
+# 输出长度预测: k1 + k2 * 引用数（决策 JSON 骨架 + 合并/调整后的文本）
+OUTPUT_TOKENS_BASE = 60
+OUTPUT_TOKENS_PER_QUOTE = 40
+
 # Token 估算因子
 CHINESE_CHAR_FACTOR = 1.5     # 中文字符 -> token
 OTHER_CHAR_FACTOR = 0.25      # 其他字符 -> token (约 4 字符/token)
 
+# 中文字符统计: 短文本用正则，长文本用 numpy 码点向量化比较（省去逐个匹配对象的分配）
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf]')
+NUMPY_MIN_CHARS = 64
+
+# 精确计数: tiktoken 编码（与 DeepSeek 分词器不完全一致，但远比字符因子准确）
+USE_TOKENIZER = True
+TOKENIZER_ENCODING = "cl100k_base"
+TOKEN_COUNT_CACHE_SIZE = 50_000
+
+# 无 numpy 时的长文本路径: UTF-16 高字节落在 0x34-0x4D / 0x4E-0x9F 即为 CJK，
+# 用 bytes.translate 删掉其余高字节后取长度（C 层单次扫描）；
+# 0x4D 行只有 0x4D00-0x4DBF 属于扩展 A 区，出现时再用正则精确计数
+_CJK_HIGH_BYTES = set(range(0x34, 0x4D)) | set(range(0x4E, 0xA0))
+_NON_CJK_HIGH_BYTES = bytes(b for b in range(256) if b not in _CJK_HIGH_BYTES)
+_CJK_ROW_4D_PATTERN = re.compile(r'[\u4d00-\u4dbf]')
+
 
 # =============================================
 # Token 估算函数
 # =============================================
 
+_encoder = None
+_encoder_unavailable = not (USE_TOKENIZER and TIKTOKEN_SUPPORT)
+
+
+def _get_encoder():
+    """懒加载 tiktoken 编码器；首次加载失败（如离线无法下载词表）后不再尝试"""
+    global _encoder, _encoder_unavailable
+    if _encoder is None and not _encoder_unavailable:
+        try:
+            _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            print(f"[TokenEstimator] tiktoken unavailable, using character heuristic: {e}")
+            _encoder_unavailable = True
+    return _encoder
+
+
+@lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)
+def _count_tokens_exact(text: str) -> int:
+    """tiktoken 精确 token 数（同一引用出现在多个组/多次统计时命中缓存）"""
+    return len(_encoder.encode_ordinary(text))
+
+
+def _count_chinese_chars(text: str) -> int:
+    """统计 CJK 统一表意文字（基本区 + 扩展 A 区）数量"""
+    if NUMPY_SUPPORT and len(text) >= NUMPY_MIN_CHARS:
+        codepoints = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        return int(np.count_nonzero(
+            ((codepoints >= 0x4E00) & (codepoints <= 0x9FFF)) |
+            ((codepoints >= 0x3400) & (codepoints <= 0x4DBF))
+        ))
+    if len(text) >= NUMPY_MIN_CHARS:
+        high_bytes = text.encode("utf-16-le", "surrogatepass")[1::2]
+        count = len(high_bytes.translate(None, _NON_CJK_HIGH_BYTES))
+        if b"\x4d" in high_bytes:
+            count += len(_CJK_ROW_4D_PATTERN.findall(text))
+        return count
+    return len(_CJK_PATTERN.findall(text))
+
+
 def estimate_tokens(text: str) -> int:
     """
     估算文本的 token 数
 
-    使用粗略但安全的估算方法:
+    tiktoken 可用时返回精确计数，否则使用粗略但安全的估算方法:
     - 中文字符: 约 1.5 token/字符
     - 英文/数字/标点: 约 0.25 token/字符 (4 字符/token)
 
@@ -52,8 +140,15 @@ def estimate_tokens(text: str) -> int:
     if not text:
         return 0
 
+    if _get_encoder() is not None:
+        return _count_tokens_exact(text)
+
+    # 纯 ASCII 文本没有中文字符，跳过扫描
+    if text.isascii():
+        return max(1, int(len(text) * OTHER_CHAR_FACTOR))
+
     # 计算中文字符数量
-    chinese_chars = len(re.findall(r'[\u4e00-\u9fff\u3400-\u4dbf]', text))
+    chinese_chars = _count_chinese_chars(text)
 
     # 计算其他字符数量
     other_chars = len(text) - chinese_chars
@@ -64,6 +159,54 @@ def estimate_tokens(text: str) -> int:
     return max(1, tokens)  # 至少 1 token
 
 
+@njit(cache=True)
+def _estimate_tokens_batch(codepoints, offsets):
+    """
+    在拼接后的码点数组上一次性估算多段文本的 token 数
+
+    第 i 段文本为 codepoints[offsets[i]:offsets[i + 1]]，规则与 estimate_tokens 一致
+    """
+    n = len(offsets) - 1
+    tokens = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        start = offsets[i]
+        end = offsets[i + 1]
+        if end == start:
+            continue
+        chinese_chars = 0
+        for j in range(start, end):
+            c = codepoints[j]
+            if (c >= 0x4E00 and c <= 0x9FFF) or (c >= 0x3400 and c <= 0x4DBF):
+                chinese_chars += 1
+        other_chars = (end - start) - chinese_chars
+        count = int(chinese_chars * CHINESE_CHAR_FACTOR + other_chars * OTHER_CHAR_FACTOR)
+        tokens[i] = max(1, count)
+    return tokens
+
+
+def estimate_tokens_many(texts: List[str]) -> List[int]:
+    """
+    批量估算多段文本的 token 数，结果与逐个调用 estimate_tokens 相同
+
+    numba 可用（且未启用 tiktoken）时把所有文本拼成一个 UTF-32 码点数组，
+    只调用一次编译后的内核
+    """
+    if not NUMBA_SUPPORT or _get_encoder() is not None:
+        return [estimate_tokens(text) for text in texts]
+    if not texts:
+        return []
+
+    offsets = np.fromiter(
+        accumulate((len(text) for text in texts), initial=0),
+        dtype=np.int64,
+        count=len(texts) + 1
+    )
+    codepoints = np.frombuffer(
+        "".join(texts).encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+    )
+    return _estimate_tokens_batch(codepoints, offsets).tolist()
+
+
 def estimate_quote_tokens(quote: Dict[str, Any]) -> int:
     """
     估算单个引用的 token 数
@@ -133,6 +276,68 @@ def estimate_item_tokens(item: Dict[str, Any]) -> int:
         return estimate_group_tokens(item)
 
 
+def _item_quotes(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """项目包含的引用（独立引用视为只有一条）"""
+    if item.get("type", "group") == "single":
+        return [item.get("quote", {})]
+    return item.get("quotes", [])
+
+
+def estimate_items_tokens(items: List[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    一次性估算多个项目的 token 数
+
+    所有引用文本和相关性说明统一交给 estimate_tokens_many，结果与逐个调用
+    estimate_item_tokens 相同。
+
+    Returns:
+        id(item) -> token 数；传给 split_into_batches / estimate_batch_stats，
+        同一批项目的分批与统计不必重复估算
+    """
+    if not NUMBA_SUPPORT or _get_encoder() is not None:
+        return {id(item): estimate_item_tokens(item) for item in items}
+
+    texts = []
+    quote_counts = []
+    for item in items:
+        quotes = _item_quotes(item)
+        quote_counts.append(len(quotes))
+        for quote in quotes:
+            texts.append(quote.get("quote", "") or "")
+            texts.append(quote.get("relevance", "") or "")
+
+    text_tokens = estimate_tokens_many(texts)
+
+    token_counts = {}
+    pos = 0
+    for item, quote_count in zip(items, quote_counts):
+        end = pos + 2 * quote_count
+        # 每条引用 20 的元数据开销 + 每项目的 prompt 模板开销
+        token_counts[id(item)] = (
+            sum(text_tokens[pos:end]) + 20 * quote_count + PROMPT_OVERHEAD_PER_GROUP
+        )
+        pos = end
+    return token_counts
+
+
+def predict_output_tokens(item: Dict[str, Any]) -> int:
+    """
+    预测 LLM 对一个项目的响应 token 数
+
+    Args:
+        item: 项目字典（候选组或独立引用）
+
+    Returns:
+        预测的输出 token 数量
+    """
+    if item.get("type", "group") == "single":
+        quote_count = 1
+    else:
+        quote_count = len(item.get("quotes", []))
+
+    return OUTPUT_TOKENS_BASE + OUTPUT_TOKENS_PER_QUOTE * quote_count
+
+
 # =============================================
 # 分批逻辑
 # =============================================
@@ -140,7 +345,9 @@ def estimate_item_tokens(item: Dict[str, Any]) -> int:
 def split_into_batches(
     items: List[Dict[str, Any]],
     max_tokens: int = MAX_BATCH_TOKENS,
-    max_groups: int = MAX_BATCH_GROUPS
+    max_groups: int = MAX_BATCH_GROUPS,
+    token_counts: Optional[Dict[int, int]] = None,
+    strategy: str = "ffd"
 ) -> List[List[Dict[str, Any]]]:
     """
     将项目（候选组 + 独立引用）分成多批
@@ -148,12 +355,16 @@ def split_into_batches(
     分批策略:
     - 每批 token 数不超过 max_tokens
     - 每批项目数不超过 max_groups
-    - 尽量均匀分配
+    - "ffd": 首次适应递减（按 token 数从大到小放入第一个放得下的批次），
+      批次更满、批数更少；批内及批次间仍保持项目的原始相对顺序
+    - "sequential": 按原顺序依次装箱，放不下就开新批次
 
     Args:
         items: 项目列表（候选组和独立引用）
         max_tokens: 每批最大 token 数
         max_groups: 每批最大项目数
+        token_counts: estimate_items_tokens 的结果（可选，缺少的项目现场估算）
+        strategy: "ffd" 或 "sequential"
 
     Returns:
         批次列表，每批是一个项目列表
@@ -161,12 +372,24 @@ def split_into_batches(
     if not items:
         return []
 
+    if token_counts is None:
+        token_counts = estimate_items_tokens(items)
+
+    item_tokens_list = []
+    for item in items:
+        item_tokens = token_counts.get(id(item))
+        item_tokens_list.append(estimate_item_tokens(item) if item_tokens is None else item_tokens)
+
+    if strategy == "ffd":
+        return _split_first_fit_decreasing(items, item_tokens_list, max_tokens, max_groups)
+    if strategy != "sequential":
+        raise ValueError(f"Unknown batching strategy: {strategy}")
+
     batches = []
     current_batch = []
     current_tokens = 0
 
-    for item in items:
-        item_tokens = estimate_item_tokens(item)
+    for item, item_tokens in zip(items, item_tokens_list):
 
         # 检查是否需要开始新批次
         should_start_new_batch = (
@@ -189,12 +412,76 @@ def split_into_batches(
     return batches
 
 
-def estimate_batch_stats(batches: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+def _split_first_fit_decreasing(
+    items: List[Dict[str, Any]],
+    item_tokens_list: List[int],
+    max_tokens: int,
+    max_groups: int
+) -> List[List[Dict[str, Any]]]:
+    """首次适应递减装箱；单个项目超过 max_tokens 时独占一批"""
+    bins: List[List[int]] = []
+    bin_tokens: List[int] = []
+
+    # 稳定排序: token 数相同的项目保持原顺序
+    for idx in sorted(range(len(items)), key=lambda i: -item_tokens_list[i]):
+        tokens = item_tokens_list[idx]
+        for b, members in enumerate(bins):
+            if len(members) < max_groups and bin_tokens[b] + tokens <= max_tokens:
+                members.append(idx)
+                bin_tokens[b] += tokens
+                break
+        else:
+            bins.append([idx])
+            bin_tokens.append(tokens)
+
+    # 批内恢复原始顺序，批次按首个项目的原始位置排列
+    for members in bins:
+        members.sort()
+    bins.sort(key=lambda members: members[0])
+    return [[items[i] for i in members] for members in bins]
+
+
+def split_into_batches_by_output_length(
+    items: List[Dict[str, Any]],
+    max_tokens: int = MAX_BATCH_TOKENS,
+    max_groups: int = MAX_BATCH_GROUPS,
+    token_counts: Optional[Dict[int, int]] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    按预测输出长度分桶后再分批
+
+    先按 predict_output_tokens 稳定排序，再按顺序装箱（sequential），
+    使每批内的响应长度相近，避免一个大组拖慢整批。
+    决策按 item_id 回填，批次内顺序变化不影响最终结果。
+
+    Args:
+        items: 项目列表（候选组和独立引用）
+        max_tokens: 每批最大 token 数
+        max_groups: 每批最大项目数
+        token_counts: estimate_items_tokens 的结果（可选）
+
+    Returns:
+        批次列表，每批是一个项目列表
+    """
+    return split_into_batches(
+        sorted(items, key=predict_output_tokens),
+        max_tokens=max_tokens,
+        max_groups=max_groups,
+        token_counts=token_counts,
+        strategy="sequential"
+    )
+
+
+def estimate_batch_stats(
+    batches: List[List[Dict[str, Any]]],
+    token_counts: Optional[Dict[int, int]] = None
+) -> Dict[str, Any]:
     """
     计算批次统计信息
 
     Args:
         batches: 批次列表
+        token_counts: 分批时使用的 estimate_items_tokens 结果（可选，避免重复估算）
 
     Returns:
         统计信息字典
@@ -208,16 +495,26 @@ def estimate_batch_stats(batches: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
             "batch_details": []
         }
 
+    if token_counts is None:
+        token_counts = estimate_items_tokens([item for batch in batches for item in batch])
+
     batch_details = []
     total_items = 0
     total_tokens = 0
 
     for i, batch in enumerate(batches):
-        batch_tokens = sum(estimate_item_tokens(item) for item in batch)
+        batch_tokens = 0
+        for item in batch:
+            item_tokens = token_counts.get(id(item))
+            batch_tokens += estimate_item_tokens(item) if item_tokens is None else item_tokens
+        output_tokens = [predict_output_tokens(item) for item in batch]
         batch_details.append({
             "batch_index": i + 1,
             "item_count": len(batch),
-            "estimated_tokens": batch_tokens
+            "estimated_tokens": batch_tokens,
+            "predicted_output_tokens": sum(output_tokens),
+            # 批内预测输出长度的极差，用于调整 OUTPUT_TOKENS_BASE / PER_QUOTE
+            "output_tokens_spread": max(output_tokens) - min(output_tokens) if output_tokens else 0
         })
         total_items += len(batch)
         total_tokens += batch_tokens
@@ -262,6 +559,9 @@ def get_batch_config() -> Dict[str, Any]:
         "max_batch_groups": MAX_BATCH_GROUPS,
         "context_reserve": CONTEXT_RESERVE,
         "prompt_overhead_per_group": PROMPT_OVERHEAD_PER_GROUP,
+        "output_tokens_base": OUTPUT_TOKENS_BASE,
+        "output_tokens_per_quote": OUTPUT_TOKENS_PER_QUOTE,
+        "tokenizer": TOKENIZER_ENCODING if _get_encoder() is not None else "heuristic",
         "chinese_char_factor": CHINESE_CHAR_FACTOR,
         "other_char_factor": OTHER_CHAR_FACTOR
     }
@@ -13,24 +13,126 @@ Unified Extractor - 统一的 Snippets + Entities + Relations 提取服务
 3. 用户确认合并后生成最终关系图
 """
 
+import os
+import re
 import json
 import uuid
+import httpx
+import random
+import shutil
+import secrets
+import asyncio
+import tempfile
+from hashlib import blake2b
+from functools import lru_cache
+from contextlib import nullcontext
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
-from dataclasses import dataclass, asdict
-
-from .llm_client import call_llm
+from dataclasses import dataclass, field, asdict, is_dataclass
+
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
+try:
+    import numpy as np
+    NUMPY_SUPPORT = True
+except ImportError:
+    NUMPY_SUPPORT = False
+
+try:
+    from aiolimiter import AsyncLimiter
+    AIOLIMITER_SUPPORT = True
+except ImportError:
+    AIOLIMITER_SUPPORT = False
+
+try:
+    from jsonschema import Draft7Validator
+    JSONSCHEMA_SUPPORT = True
+except ImportError:
+    JSONSCHEMA_SUPPORT = False
+
+from .llm_client import (
+    call_llm, build_openai_request_body, submit_openai_batch, get_openai_batch,
+    fetch_openai_batch_results, is_truncated_response, BATCH_TERMINAL_STATUSES, DEEPSEEK_CHAT_MODEL
+)
 from ..core.config import settings
 
 # 数据目录
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
 PROJECTS_DIR = DATA_DIR / "projects"
 
+# 提取结果文件使用 2 空格缩进（保持与 json.dump(indent=2) 一致的可读格式）
+_ORJSON_FILE_OPTIONS = (orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS) if ORJSON_SUPPORT else 0
+
+# 重复文本的 block（每页重复的页眉/页脚等）只把第一次出现的发送给 LLM
+DEDUPE_REPEATED_BLOCKS = True
+
+# 分层置信度阈值：支持性内容（如 membership_criteria）用更低阈值
+CONFIDENCE_THRESHOLDS = {
+    "award": 0.5,
+    "membership": 0.4,
+    "membership_criteria": 0.3,      # 低阈值：标准描述都重要
+    "membership_evaluation": 0.3,    # 低阈值：评估过程都重要
+    "peer_assessment": 0.3,          # 低阈值：同行评价都有意义
+    "media_coverage": 0.4,
+    "recommendation": 0.4,
+    "contribution": 0.4,
+    "leadership": 0.4,
+}
+DEFAULT_CONFIDENCE_THRESHOLD = 0.35  # 默认阈值从 0.5 降低到 0.35
+# snippet 数达到该值时用 numpy 向量化比较阈值（数量少时 numpy 的数组构建开销大于收益）
+CONFIDENCE_FILTER_NUMPY_MIN = 256
+
+# 合并结果的统计信息另存为小的旁路文件，状态查询无需读取整个合并结果
+COMBINED_STATS_FILENAME = "combined_extraction.stats.json"
+# 流式写合并结果时的写缓冲大小：逐条记录的小写入在用户态合并，大幅减少 write 系统调用次数
+STREAM_WRITE_BUFFER_SIZE = 1 << 20
+
+# 各 exhibit 的提取请求并发发送，信号量限制同时在途的 LLM 请求数
+EXTRACTION_MAX_CONCURRENCY = 5
+
+# 提取请求速率上限（令牌桶，按账户 RPM 配置；aiolimiter 不可用时只受并发数限制）
+EXTRACTION_REQUESTS_PER_MINUTE = settings.extraction_requests_per_minute
+# 瞬时错误（网络异常、429、5xx）重试：指数退避 + 随机抖动
+EXTRACTION_MAX_ATTEMPTS = 5
+EXTRACTION_RETRY_BASE_DELAY = 1.0   # 秒
+EXTRACTION_RETRY_MAX_DELAY = 30.0   # 秒
+
+# LLM 调用参数（同步调用与 Batch API 共用）
+EXTRACTION_TEMPERATURE = 0.2   # 提高到 0.2：允许更多变化，更好地识别上下文
+EXTRACTION_MAX_TOKENS = 8000   # DeepSeek 限制 8192，使用 8000 留余量
+# 流式接收提取响应（分块累积后只解析一次；大响应在线程池中解析，不阻塞其他 exhibit 的请求）
+EXTRACTION_STREAM_RESPONSES = True
+
+# 各 provider 使用的模型（显式传给 call_llm，并计入缓存键，切换模型时缓存自动失效）
+EXTRACTION_MODELS = {
+    "deepseek": DEEPSEEK_CHAT_MODEL,
+    "openai": "gpt-4o-mini",
+}
+
+# OpenAI Batch API: 离线整项目提取时使用（费用减半，不受交互式接口 RPM 限制）；
+# exhibit 数少于阈值时批处理的排队延迟不划算，仍走并发同步调用
+EXTRACTION_BATCH_MIN_EXHIBITS = 10
+# batch 任务状态文件（项目内 extraction/ 下）：提交后即返回，之后通过状态接口轮询并收取结果
+BATCH_JOB_FILENAME = "batch_job.json"
+
+# LLM 提取结果缓存（项目内 extraction/_llm_cache/，按完整请求内容哈希；
+# 文档与申请人未变时重新提取直接复用原始响应）
+EXTRACTION_CACHE_ENABLED = True
+EXTRACTION_CACHE_DIRNAME = "_llm_cache"
+# 写入缓存前按 UNIFIED_EXTRACTION_SCHEMA 校验响应（DeepSeek 不支持 strict mode，响应可能偏离 schema）
+EXTRACTION_VALIDATE_RESPONSES = True
+
 
 # ==================== Data Models ====================
+# 处理后的 snippet / entity / relation 以 slots 数据类保存在内存中（字段顺序即输出 JSON 的键顺序），
+# 写文件时由 orjson 直接序列化
 
-@dataclass
+@dataclass(slots=True)
 class EnhancedSnippet:
     """带有 subject 归属的 snippet"""
     snippet_id: str
@@ -44,10 +146,13 @@ class EnhancedSnippet:
     # Subject Attribution
     subject: str                      # 这是谁的成就
     subject_role: str                 # applicant/recommender/colleague/mentor/other
+    recommender_name: Optional[str]   # 推荐人名称
     is_applicant_achievement: bool    # 是否是申请人的成就
 
     # Evidence Classification
     evidence_type: str                # award/membership/publication/judging/contribution/article/exhibition/leadership/other
+    evidence_purpose: str             # 证据目的
+    evidence_layer: str               # 证据层级
     confidence: float
     reasoning: str
 
@@ -56,7 +161,7 @@ class EnhancedSnippet:
     is_confirmed: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class Entity:
     """实体：人物、组织、奖项等"""
     id: str
@@ -71,12 +176,12 @@ class Entity:
     mentioned_in_blocks: List[str]
 
     # For merging
-    aliases: List[str] = None
+    aliases: List[str] = field(default_factory=list)
     is_merged: bool = False
-    merged_from: List[str] = None
+    merged_from: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class Relation:
     """实体间的关系"""
     id: str
@@ -88,7 +193,7 @@ class Relation:
     source_blocks: List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class ExhibitExtraction:
     """单个 exhibit 的提取结果"""
     exhibit_id: str
@@ -319,6 +424,18 @@ CRITICAL: Extract BOTH direct evidence AND supporting evidence!
 - Supporting evidence: Why it matters (selectivity, credibility, impact)
 Do NOT skip supporting evidence - it is ESSENTIAL for EB-1A petitions!"""
 
+# 在 {blocks_text} 处预先切分 user prompt：大段文档文本直接拼接，不参与模板扫描
+_USER_PROMPT_HEAD, _USER_PROMPT_TAIL = UNIFIED_EXTRACTION_USER_PROMPT.split("{blocks_text}")
+
+
+@lru_cache(maxsize=32)
+def _render_applicant_prompts(applicant_name: str) -> Tuple[str, str]:
+    """系统 prompt 与 user prompt 尾部只依赖申请人姓名，同一项目只渲染一次"""
+    return (
+        UNIFIED_EXTRACTION_SYSTEM_PROMPT.format(applicant_name=applicant_name),
+        _USER_PROMPT_TAIL.format(applicant_name=applicant_name)
+    )
+
 
 UNIFIED_EXTRACTION_SCHEMA = {
     "type": "object",
@@ -441,13 +558,30 @@ UNIFIED_EXTRACTION_SCHEMA = {
     "additionalProperties": False
 }
 
+# 校验器在导入时构建一次，各请求共用
+_EXTRACTION_VALIDATOR = Draft7Validator(UNIFIED_EXTRACTION_SCHEMA) if JSONSCHEMA_SUPPORT else None
+
 
 # ==================== Helper Functions ====================
 
+# snippet ID 随机后缀池：一次 secrets.token_hex 批量生成，避免每个 snippet 读取一次系统随机源
+_ID_POOL_SIZE = 256
+_id_suffix_pool: List[str] = []
+
+
+def _next_id_suffix() -> str:
+    """取出一个 8 位十六进制随机后缀，池空时批量补充（list.pop 原子，可在线程池中并发调用）"""
+    while True:
+        try:
+            return _id_suffix_pool.pop()
+        except IndexError:
+            pool = secrets.token_hex(4 * _ID_POOL_SIZE)
+            _id_suffix_pool.extend(pool[i:i + 8] for i in range(0, len(pool), 8))
+
+
 def generate_snippet_id(exhibit_id: str, block_id: str) -> str:
     """生成唯一 snippet ID"""
-    unique_suffix = uuid.uuid4().hex[:8]
-    return f"snp_{exhibit_id}_{block_id}_{unique_suffix}"
+    return f"snp_{exhibit_id}_{block_id}_{_next_id_suffix()}"
 
 
 def generate_entity_id(exhibit_id: str, index: int) -> str:
@@ -485,35 +619,106 @@ def _infer_evidence_layer(item: Dict) -> str:
     return "claim"
 
 
+def _iter_llm_blocks(pages: List[Dict]):
+    """逐个产出需要送入 LLM 的 block：(composite_id, page_num, block, text)"""
+    for page_data in pages:
+        page_num = page_data.get("page_number", 0)
+        for block in page_data.get("text_blocks", ()):
+            text = (block.get("text_content") or "").strip()
+            if len(text) < 5:
+                continue
+            yield f"p{page_num}_{block.get('block_id', '')}", page_num, block, text
+
+
 def format_blocks_for_llm(pages: List[Dict]) -> Tuple[str, Dict]:
     """将所有页的 blocks 格式化为 LLM 输入格式
 
+    DEDUPE_REPEATED_BLOCKS 开启时，文本完全相同的 block 只输出第一次出现的那个，
+    LLM 引用的也就是该 block；block_map 仍包含全部 block。
+
     Returns:
         tuple: (blocks_text, block_map)
             - blocks_text: 格式化后的文本
             - block_map: {composite_id -> (page_num, block)} 的映射
     """
-    lines = []
-    block_map = {}
+    # (composite_id, page_num, block, text)；跳过空文本或太短的文本
+    items = list(_iter_llm_blocks(pages))
+
+    # 复合 ID: p{页码}_{block_id}
+    block_map = {composite_id: (page_num, block) for composite_id, page_num, block, _ in items}
+
+    if DEDUPE_REPEATED_BLOCKS:
+        # 按首次出现的顺序保留每段文本的第一个 block
+        first_by_text = {}
+        for composite_id, _, _, text in items:
+            first_by_text.setdefault(text, composite_id)
+        lines = [f"[{composite_id}] {text}" for text, composite_id in first_by_text.items()]
+    else:
+        lines = [f"[{composite_id}] {text}" for composite_id, _, _, text in items]
+    return "\n".join(lines), block_map
 
-    for page_data in pages:
-        page_num = page_data.get("page_number", 0)
-        blocks = page_data.get("text_blocks", [])
 
-        for block in blocks:
-            block_id = block.get("block_id", "")
-            text = block.get("text_content", "").strip()
+def _read_json(path: Path):
+    """读取 JSON 文件（orjson 可用时直接解析字节）"""
+    if ORJSON_SUPPORT:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
-            # 跳过空文本或太短的文本
-            if not text or len(text) < 5:
-                continue
 
-            # 复合 ID: p{页码}_{block_id}
-            composite_id = f"p{page_num}_{block_id}"
-            block_map[composite_id] = (page_num, block)
-            lines.append(f"[{composite_id}] {text}")
+def _json_default(obj):
+    """标准库 json 回退路径：数据类转为 dict"""
+    if is_dataclass(obj):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
-    return "\n".join(lines), block_map
+
+def _dumps_json(data, indent: bool = True) -> bytes:
+    """序列化为 JSON 字节（orjson 可用时使用 C 编码器，无法序列化的数据回退到标准库）"""
+    if ORJSON_SUPPORT:
+        try:
+            return orjson.dumps(data, option=_ORJSON_FILE_OPTIONS if indent else orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(
+        data, ensure_ascii=False, indent=2 if indent else None, default=_json_default
+    ).encode("utf-8")
+
+
+def _write_json(path: Path, data, indent: bool = True):
+    """写入 JSON 文件"""
+    path.write_bytes(_dumps_json(data, indent))
+
+
+class _JsonArrayWriter:
+    """
+    向顶层 JSON 对象中流式写入一个数组字段
+
+    逐个元素序列化并写出，格式与整体 indent=2 序列化一致（元素缩进 4 格），
+    避免先在内存中拼出完整列表再一次性序列化。
+    """
+
+    def __init__(self, f, key: str, first_field: bool = False):
+        self.f = f
+        self.count = 0
+        f.write(b"" if first_field else b",")
+        f.write(b'\n  ' + _dumps_json(key) + b': [')
+
+    def write(self, item):
+        self.f.write(b",\n    " if self.count else b"\n    ")
+        self.f.write(_dumps_json(item).replace(b"\n", b"\n    "))
+        self.count += 1
+
+    def close(self):
+        self.f.write(b"\n  ]" if self.count else b"]")
+
+
+def _write_json_fields(f, fields: Dict, first_field: bool = False):
+    """写出顶层对象的若干普通字段（不含外层花括号）"""
+    for key, value in fields.items():
+        f.write(b"" if first_field else b",")
+        f.write(b'\n  ' + _dumps_json(key) + b': ' + _dumps_json(value).replace(b"\n", b"\n  "))
+        first_field = False
 
 
 def get_extraction_dir(project_id: str) -> Path:
@@ -530,33 +735,160 @@ def get_entities_dir(project_id: str) -> Path:
     return entities_dir
 
 
-# ==================== Core Functions ====================
+def _extraction_request(provider: str, prepared: Dict) -> Dict:
+    """提取请求参数（同步调用、Batch API 与缓存键共用）"""
+    return {
+        "provider": provider,
+        "model": EXTRACTION_MODELS.get(provider),
+        "system_prompt": prepared["system_prompt"],
+        "prompt": prepared["user_prompt"],
+        "json_schema": UNIFIED_EXTRACTION_SCHEMA,
+        "temperature": EXTRACTION_TEMPERATURE,
+        "max_tokens": EXTRACTION_MAX_TOKENS,
+    }
 
-async def extract_exhibit_unified(
-    project_id: str,
-    exhibit_id: str,
-    applicant_name: str,
-    provider: str = "deepseek"
-) -> Dict:
+
+def _extraction_cache_key(request: Dict) -> str:
+    """缓存键: 完整请求参数（模型、prompt、schema 等）的哈希"""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _load_cached_extraction(project_id: str, cache_key: str) -> Optional[Dict]:
+    """读取缓存的 LLM 原始响应，未命中或读取失败返回 None"""
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+
+    filepath = get_extraction_dir(project_id) / EXTRACTION_CACHE_DIRNAME / f"{cache_key}.json"
+    if not filepath.exists():
+        return None
+
+    try:
+        return _read_json(filepath).get("response")
+    except Exception:
+        return None
+
+
+def _validate_extraction_response(response: Dict) -> bool:
     """
-    统一提取单个 exhibit 的 snippets + entities + relations
+    校验 LLM 响应是否符合提取 schema
 
-    Args:
-        project_id: 项目 ID
-        exhibit_id: Exhibit ID
-        applicant_name: 申请人姓名
-        provider: LLM 提供商 ("deepseek" 或 "openai")
+    细节偏离（枚举值、多余字段等）只打印警告，后续处理对缺省字段有默认值；
+    缺少顶层必需字段（如 JSON 解析失败后的 {"content": ...}）时返回 False。
+    """
+    if not isinstance(response, dict):
+        return False
+
+    if EXTRACTION_VALIDATE_RESPONSES and _EXTRACTION_VALIDATOR is not None:
+        errors = list(_EXTRACTION_VALIDATOR.iter_errors(response))
+        if errors:
+            print(f"[UnifiedExtractor] Response deviates from extraction schema ({len(errors)} errors): {errors[0].message}")
+
+    return all(key in response for key in UNIFIED_EXTRACTION_SCHEMA["required"])
+
+
+def _save_cached_extraction(project_id: str, cache_key: str, response: Dict):
+    """保存 LLM 原始响应（临时文件 + os.replace，写入失败不影响提取；不符合 schema 的响应不缓存）"""
+    if not EXTRACTION_CACHE_ENABLED or is_truncated_response(response) or not _validate_extraction_response(response):
+        return
+
+    cache_dir = get_extraction_dir(project_id) / EXTRACTION_CACHE_DIRNAME
+    tmp_path = cache_dir / f"{cache_key}.{uuid.uuid4().hex}.tmp"
+    entry = {
+        "timestamp": datetime.now().isoformat(),
+        "response": response
+    }
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_json(tmp_path, entry, indent=False)
+        os.replace(tmp_path, cache_dir / f"{cache_key}.json")
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"[UnifiedExtractor] Failed to save extraction cache: {e}")
+
+
+def _snippet_confidence(item: Dict) -> float:
+    """snippet 置信度 - DeepSeek 可能返回 None 或非数字，此时使用默认置信度 0.5"""
+    confidence = item.get("confidence")
+    if confidence is None or not isinstance(confidence, (int, float)):
+        return 0.5
+    return confidence
+
+
+def _confident_snippet_indices(raw_snippets: List[Dict]) -> List[int]:
+    """返回置信度不低于其 evidence_type 阈值的 snippet 下标（保持原顺序）"""
+    confidences = [_snippet_confidence(item) for item in raw_snippets]
+    thresholds = [
+        CONFIDENCE_THRESHOLDS.get(item.get("evidence_type", "other"), DEFAULT_CONFIDENCE_THRESHOLD)
+        for item in raw_snippets
+    ]
+    if NUMPY_SUPPORT and len(raw_snippets) >= CONFIDENCE_FILTER_NUMPY_MIN:
+        keep = np.asarray(confidences, dtype=np.float64) >= np.asarray(thresholds, dtype=np.float64)
+        return np.flatnonzero(keep).tolist()
+    return [index for index, (confidence, threshold) in enumerate(zip(confidences, thresholds))
+            if confidence >= threshold]
+
+
+def _normalize_entity_name(name) -> str:
+    """实体名称索引键"""
+    return name.strip().lower() if isinstance(name, str) else ""
+
+
+def _link_snippets(
+    snippets: List[EnhancedSnippet],
+    entities: List[Entity],
+    relations: List[Relation],
+    block_snippet_ids: Dict[str, List[str]]
+):
+    """
+    填充 entity.snippet_ids 与 relation.source_snippet_ids（原地修改）
+
+    - entity: subject 为该实体的 snippet + 位于 mentioned_in_blocks 中的 snippet
+    - relation: 位于 source_blocks 中的 snippet
+    同名实体共用第一个出现的实体（按小写去空白后的名称）。
+    """
+    entity_by_name: Dict[str, Entity] = {}
+    for entity in entities:
+        entity_by_name.setdefault(_normalize_entity_name(entity.name), entity)
+    entity_by_name.pop("", None)
+
+    linked: Dict[str, Dict[str, None]] = {entity.id: {} for entity in entities}
+    for entity in entities:
+        for block_id in entity.mentioned_in_blocks or ():
+            linked[entity.id].update(dict.fromkeys(block_snippet_ids.get(block_id, ())))
+
+    for snippet in snippets:
+        entity = entity_by_name.get(_normalize_entity_name(snippet.subject))
+        if entity is not None:
+            linked[entity.id][snippet.snippet_id] = None
+
+    for entity in entities:
+        entity.snippet_ids = list(linked[entity.id])
+
+    for relation in relations:
+        relation.source_snippet_ids = list(dict.fromkeys(
+            snippet_id
+            for block_id in relation.source_blocks or ()
+            for snippet_id in block_snippet_ids.get(block_id, ())
+        ))
+
+
+# ==================== Core Functions ====================
+
+def _prepare_exhibit(project_id: str, exhibit_id: str, applicant_name: str) -> Dict:
+    """
+    加载 exhibit 文档并构建 prompt
 
     Returns:
-        提取结果 dict
+        {"success": True, "system_prompt", "user_prompt", "block_map"}，
+        或 {"success": False, "error", "exhibit_id"}
     """
     # 1. 加载文档
     doc_path = PROJECTS_DIR / project_id / "documents" / f"{exhibit_id}.json"
     if not doc_path.exists():
         raise FileNotFoundError(f"Document not found: {doc_path}")
 
-    with open(doc_path, 'r', encoding='utf-8') as f:
-        doc_data = json.load(f)
+    doc_data = _read_json(doc_path)
 
     pages = doc_data.get("pages", [])
     if not pages:
@@ -579,25 +911,95 @@ async def extract_exhibit_unified(
         }
 
     # 3. 构建 prompt
-    system_prompt = UNIFIED_EXTRACTION_SYSTEM_PROMPT.format(applicant_name=applicant_name)
-    user_prompt = UNIFIED_EXTRACTION_USER_PROMPT.format(
-        exhibit_id=exhibit_id,
-        applicant_name=applicant_name,
-        blocks_text=blocks_text
-    )
+    system_prompt, user_prompt_tail = _render_applicant_prompts(applicant_name)
+    user_prompt = "".join((
+        _USER_PROMPT_HEAD.format(exhibit_id=exhibit_id, applicant_name=applicant_name),
+        blocks_text,
+        user_prompt_tail
+    ))
+
+    return {
+        "success": True,
+        "system_prompt": system_prompt,
+        "user_prompt": user_prompt,
+        "block_map": block_map
+    }
+
+
+_extraction_rate_limiter = (
+    AsyncLimiter(EXTRACTION_REQUESTS_PER_MINUTE, 60.0) if AIOLIMITER_SUPPORT else None
+)
+_API_STATUS_PATTERN = re.compile(r"API error (\d{3})")
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """网络异常/超时，以及 429、5xx 状态码视为可重试"""
+    if isinstance(error, httpx.HTTPError):
+        return True
+    match = _API_STATUS_PATTERN.search(str(error))
+    if match:
+        status = int(match.group(1))
+        return status == 429 or status >= 500
+    return False
+
+
+async def _call_extraction_llm(exhibit_id: str, request: Dict) -> Dict:
+    """按令牌桶限速调用 call_llm，瞬时错误按指数退避重试，最多 EXTRACTION_MAX_ATTEMPTS 次"""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            async with _extraction_rate_limiter or nullcontext():
+                return await call_llm(**request, stream=EXTRACTION_STREAM_RESPONSES)
+        except Exception as e:
+            if attempt >= EXTRACTION_MAX_ATTEMPTS or not _is_transient_error(e):
+                raise
+            delay = random.uniform(0, min(EXTRACTION_RETRY_MAX_DELAY, EXTRACTION_RETRY_BASE_DELAY * 2 ** attempt))
+            print(f"[UnifiedExtractor] LLM call for {exhibit_id} failed ({e}), retry {attempt + 1}/{EXTRACTION_MAX_ATTEMPTS} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def extract_exhibit_unified(
+    project_id: str,
+    exhibit_id: str,
+    applicant_name: str,
+    provider: str = "deepseek",
+    return_records: bool = False
+) -> Dict:
+    """
+    统一提取单个 exhibit 的 snippets + entities + relations
+
+    Args:
+        project_id: 项目 ID
+        exhibit_id: Exhibit ID
+        applicant_name: 申请人姓名
+        provider: LLM 提供商 ("deepseek" 或 "openai")
+        return_records: 结果中附带处理后的 snippets / entities / relations（供批量汇总直接使用，无需重读文件）
+
+    Returns:
+        提取结果 dict
+    """
+    # 文件读写与结果处理放到线程池，避免阻塞其他 exhibit 在途的 LLM 请求
+    prepared = await asyncio.to_thread(_prepare_exhibit, project_id, exhibit_id, applicant_name)
+    if not prepared["success"]:
+        return prepared
+
+    request = _extraction_request(provider, prepared)
+    cache_key = _extraction_cache_key(request)
+    cached = await asyncio.to_thread(_load_cached_extraction, project_id, cache_key)
+    if cached is not None:
+        print(f"[UnifiedExtractor] Using cached LLM response for {exhibit_id}")
+        return await asyncio.to_thread(
+            _save_exhibit_extraction,
+            project_id, exhibit_id, applicant_name, cached, prepared["block_map"], return_records
+        )
 
     # 4. 调用 LLM
     print(f"[UnifiedExtractor] Calling LLM ({provider}) for {exhibit_id}...")
 
     try:
-        result = await call_llm(
-            prompt=user_prompt,
-            provider=provider,
-            system_prompt=system_prompt,
-            json_schema=UNIFIED_EXTRACTION_SCHEMA,
-            temperature=0.2,   # 提高到 0.2：允许更多变化，更好地识别上下文
-            max_tokens=8000   # DeepSeek 限制 8192，使用 8000 留余量
-        )
+        result = await _call_extraction_llm(exhibit_id, request)
+        await asyncio.to_thread(_save_cached_extraction, project_id, cache_key, result)
     except Exception as e:
         print(f"[UnifiedExtractor] LLM error for {exhibit_id}: {e}")
         return {
@@ -606,40 +1008,32 @@ async def extract_exhibit_unified(
             "exhibit_id": exhibit_id
         }
 
+    return await asyncio.to_thread(
+        _save_exhibit_extraction,
+        project_id, exhibit_id, applicant_name, result, prepared["block_map"], return_records
+    )
+
+
+def _save_exhibit_extraction(
+    project_id: str,
+    exhibit_id: str,
+    applicant_name: str,
+    result: Dict,
+    block_map: Dict,
+    return_records: bool = False
+) -> Dict:
+    """处理 LLM 提取结果（分配 ID、定位 block、过滤低置信度）并保存"""
     # 5. 处理结果
     document_summary = result.get("document_summary", {})
     raw_snippets = result.get("snippets", [])
     raw_entities = result.get("entities", [])
     raw_relations = result.get("relations", [])
 
-    # 6. 处理 snippets - 添加 ID 和 bbox
-    # 使用分层置信度阈值：支持性内容（如 membership_criteria）用更低阈值
-    CONFIDENCE_THRESHOLDS = {
-        "award": 0.5,
-        "membership": 0.4,
-        "membership_criteria": 0.3,      # 低阈值：标准描述都重要
-        "membership_evaluation": 0.3,    # 低阈值：评估过程都重要
-        "peer_assessment": 0.3,          # 低阈值：同行评价都有意义
-        "media_coverage": 0.4,
-        "recommendation": 0.4,
-        "contribution": 0.4,
-        "leadership": 0.4,
-    }
-    DEFAULT_THRESHOLD = 0.35  # 默认阈值从 0.5 降低到 0.35
-
+    # 6. 处理 snippets - 添加 ID 和 bbox（先按分层置信度阈值一次性过滤）
     processed_snippets = []
-    for item in raw_snippets:
-        evidence_type = item.get("evidence_type", "other")
-        threshold = CONFIDENCE_THRESHOLDS.get(evidence_type, DEFAULT_THRESHOLD)
-
-        # 处理 confidence - DeepSeek 可能返回 None 或非数字
-        confidence = item.get("confidence")
-        if confidence is None or not isinstance(confidence, (int, float)):
-            confidence = 0.5  # 默认置信度
-
-        if confidence < threshold:
-            continue
-
+    block_snippet_ids: Dict[str, List[str]] = {}  # composite_id -> 该 block 内的 snippet_id
+    for index in _confident_snippet_indices(raw_snippets):
+        item = raw_snippets[index]
         composite_id = item.get("block_id", "")
 
         # 处理合并的 block_id (如 "p2_p2_b1-p2_p2_b2")
@@ -675,67 +1069,66 @@ async def extract_exhibit_unified(
         original_block_id = block.get("block_id", "")
 
         snippet_id = generate_snippet_id(exhibit_id, composite_id)
+        block_snippet_ids.setdefault(composite_id, []).append(snippet_id)
 
-        processed_snippets.append({
-            "snippet_id": snippet_id,
-            "exhibit_id": exhibit_id,
-            "document_id": f"doc_{exhibit_id}",
-            "text": item.get("text", ""),
-            "page": page_num,
-            "bbox": block.get("bbox"),
-            "block_id": original_block_id,
+        processed_snippets.append(EnhancedSnippet(
+            snippet_id=snippet_id,
+            exhibit_id=exhibit_id,
+            document_id=f"doc_{exhibit_id}",
+            text=item.get("text", ""),
+            page=page_num,
+            bbox=block.get("bbox"),
+            block_id=original_block_id,
 
             # Subject Attribution
-            "subject": item.get("subject", applicant_name),
-            "subject_role": item.get("subject_role", "applicant"),
-            "recommender_name": item.get("recommender_name"),  # 新增：推荐人名称
-            "is_applicant_achievement": item.get("is_applicant_achievement", True),
+            subject=item.get("subject", applicant_name),
+            subject_role=item.get("subject_role", "applicant"),
+            recommender_name=item.get("recommender_name"),  # 新增：推荐人名称
+            is_applicant_achievement=item.get("is_applicant_achievement", True),
 
             # Evidence Classification
-            "evidence_type": item.get("evidence_type", "other"),
-            "evidence_purpose": item.get("evidence_purpose", "direct_proof"),  # 证据目的
-            "evidence_layer": item.get("evidence_layer", _infer_evidence_layer(item)),  # 证据层级
-            "confidence": item.get("confidence", 0.5),
-            "reasoning": item.get("reasoning", ""),
-
-            # Metadata
-            "is_ai_suggested": True,
-            "is_confirmed": False
-        })
+            evidence_type=item.get("evidence_type", "other"),
+            evidence_purpose=item.get("evidence_purpose", "direct_proof"),  # 证据目的
+            evidence_layer=item.get("evidence_layer", _infer_evidence_layer(item)),  # 证据层级
+            confidence=item.get("confidence", 0.5),
+            reasoning=item.get("reasoning", "")
+        ))
 
     # 7. 处理 entities - 添加 ID
     processed_entities = []
     for idx, item in enumerate(raw_entities):
         entity_id = generate_entity_id(exhibit_id, idx)
-        processed_entities.append({
-            "id": entity_id,
-            "name": item.get("name", ""),
-            "type": item.get("type", "other"),
-            "identity": item.get("identity", ""),
-            "relation_to_applicant": item.get("relation_to_applicant", "other"),
-            "snippet_ids": [],  # 将在后处理中填充
-            "exhibit_ids": [exhibit_id],
-            "mentioned_in_blocks": item.get("mentioned_in_blocks", []),
-            "aliases": [],
-            "is_merged": False,
-            "merged_from": []
-        })
+        processed_entities.append(Entity(
+            id=entity_id,
+            name=item.get("name", ""),
+            type=item.get("type", "other"),
+            identity=item.get("identity", ""),
+            relation_to_applicant=item.get("relation_to_applicant", "other"),
+            snippet_ids=[],  # 将在后处理中填充
+            exhibit_ids=[exhibit_id],
+            mentioned_in_blocks=item.get("mentioned_in_blocks", [])
+        ))
 
     # 8. 处理 relations - 添加 ID
     processed_relations = []
     for idx, item in enumerate(raw_relations):
         relation_id = generate_relation_id(exhibit_id, idx)
-        processed_relations.append({
-            "id": relation_id,
-            "from_entity": item.get("from_entity", ""),
-            "to_entity": item.get("to_entity", ""),
-            "relation_type": item.get("relation_type", ""),
-            "context": item.get("context", ""),
-            "source_snippet_ids": [],  # 将在后处理中填充
-            "source_blocks": item.get("source_blocks", [])
-        })
+        processed_relations.append(Relation(
+            id=relation_id,
+            from_entity=item.get("from_entity", ""),
+            to_entity=item.get("to_entity", ""),
+            relation_type=item.get("relation_type", ""),
+            context=item.get("context", ""),
+            source_snippet_ids=[],  # 将在后处理中填充
+            source_blocks=item.get("source_blocks", [])
+        ))
+
+    # 8.5 回填 snippet_ids: 按名称索引实体（一次构建，O(1) 查找），
+    # snippet 的 subject 或所在 block 指向实体时记入；relation 按 source_blocks 记入
+    _link_snippets(processed_snippets, processed_entities, processed_relations, block_snippet_ids)
 
     # 9. 保存提取结果
+    applicant_snippets = sum(1 for s in processed_snippets if s.is_applicant_achievement)
     extraction_result = {
         "version": "4.0",
         "exhibit_id": exhibit_id,
@@ -752,85 +1145,372 @@ async def extract_exhibit_unified(
             "snippet_count": len(processed_snippets),
             "entity_count": len(processed_entities),
             "relation_count": len(processed_relations),
-            "applicant_snippets": sum(1 for s in processed_snippets if s.get("is_applicant_achievement")),
-            "other_snippets": sum(1 for s in processed_snippets if not s.get("is_applicant_achievement"))
+            "applicant_snippets": applicant_snippets,
+            "other_snippets": len(processed_snippets) - applicant_snippets
         }
     }
 
     # 保存到文件
     extraction_dir = get_extraction_dir(project_id)
     extraction_file = extraction_dir / f"{exhibit_id}_extraction.json"
-    with open(extraction_file, 'w', encoding='utf-8') as f:
-        json.dump(extraction_result, f, ensure_ascii=False, indent=2)
+    _write_json(extraction_file, extraction_result)
 
     print(f"[UnifiedExtractor] {exhibit_id}: {len(processed_snippets)} snippets, {len(processed_entities)} entities, {len(processed_relations)} relations")
 
-    return {
+    summary = {
         "success": True,
         "exhibit_id": exhibit_id,
         **extraction_result["stats"]
     }
+    if return_records:
+        summary.update(snippets=processed_snippets, entities=processed_entities, relations=processed_relations)
+    return summary
 
 
-async def extract_all_unified(
+async def _extract_exhibits_concurrently(
     project_id: str,
+    exhibit_ids: List[str],
     applicant_name: str,
-    provider: str = "deepseek",
+    provider: str,
     progress_callback=None
-) -> Dict:
-    """
-    提取项目中所有 exhibits
+) -> List:
+    """并发提取多个 exhibit（信号量限流），返回与 exhibit_ids 对应的结果或异常"""
+    total = len(exhibit_ids)
+    semaphore = asyncio.Semaphore(EXTRACTION_MAX_CONCURRENCY)
+    completed = 0
+
+    async def _extract_one(exhibit_id: str) -> Dict:
+        nonlocal completed
+        try:
+            async with semaphore:
+                return await extract_exhibit_unified(
+                    project_id, exhibit_id, applicant_name, provider=provider, return_records=True
+                )
+        finally:
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total, f"Extracted {exhibit_id}")
 
-    Args:
-        project_id: 项目 ID
-        applicant_name: 申请人姓名
-        provider: LLM 提供商 ("deepseek" 或 "openai")
-        progress_callback: 进度回调 (current, total, message)
+    if progress_callback:
+        progress_callback(0, total, f"Extracting {total} exhibits...")
+
+    return await asyncio.gather(
+        *[_extract_one(exhibit_id) for exhibit_id in exhibit_ids],
+        return_exceptions=True
+    )
+
+
+async def _prepare_batch_requests(
+    project_id: str,
+    exhibit_ids: List[str],
+    applicant_name: str
+) -> Tuple[Dict, Dict, Dict]:
+    """
+    为 OpenAI Batch 准备各 exhibit 的请求
 
     Returns:
-        提取结果汇总
+        (prepared, cached_results, request_bodies)：exhibit_id -> 准备结果或异常、
+        命中缓存的 LLM 响应、需提交的请求体（命中缓存的 exhibit 不进入 batch）
     """
+    prepared_list = await asyncio.gather(
+        *[asyncio.to_thread(_prepare_exhibit, project_id, exhibit_id, applicant_name) for exhibit_id in exhibit_ids],
+        return_exceptions=True
+    )
+    prepared = dict(zip(exhibit_ids, prepared_list))
+
+    cached_results = {}
+    request_bodies = {}
+    for exhibit_id, item in prepared.items():
+        if not (isinstance(item, dict) and item["success"]):
+            continue
+        request = _extraction_request("openai", item)
+        cached = await asyncio.to_thread(_load_cached_extraction, project_id, _extraction_cache_key(request))
+        if cached is not None:
+            cached_results[exhibit_id] = cached
+            continue
+        request_bodies[exhibit_id] = build_openai_request_body(
+            request["prompt"],
+            request["model"],
+            system_prompt=request["system_prompt"],
+            json_schema=request["json_schema"],
+            temperature=request["temperature"],
+            max_tokens=request["max_tokens"]
+        )
+    return prepared, cached_results, request_bodies
+
+
+def list_exhibit_ids(project_id: str) -> List[str]:
+    """项目中所有 exhibit 的 ID（documents/*.json）"""
     documents_dir = PROJECTS_DIR / project_id / "documents"
+    return [exhibit_file.stem for exhibit_file in documents_dir.glob("*.json")]
+
+
+def load_batch_job(project_id: str) -> Optional[Dict]:
+    """加载项目的 batch 提取任务状态"""
+    job_file = get_extraction_dir(project_id) / BATCH_JOB_FILENAME
+    if job_file.exists():
+        return _read_json(job_file)
+    return None
 
-    if not documents_dir.exists():
-        return {
-            "success": False,
-            "error": "Documents directory not found"
-        }
 
-    exhibit_files = list(documents_dir.glob("*.json"))
-    total_exhibits = len(exhibit_files)
+def _save_batch_job(project_id: str, job: Dict) -> Dict:
+    job["updated_at"] = datetime.now().isoformat()
+    _write_json(get_extraction_dir(project_id) / BATCH_JOB_FILENAME, job)
+    return job
 
-    print(f"[UnifiedExtractor] Starting extraction for {total_exhibits} exhibits, applicant: {applicant_name}")
 
-    all_snippets = []
-    all_entities = []
-    all_relations = []
+# 当前进程中正在提交/收取的项目；进程重启后状态文件中残留的 submitting / collecting 据此识别为中断
+_active_batch_jobs: set = set()
+_batch_job_locks: Dict[str, asyncio.Lock] = {}
 
+
+def start_batch_extraction(project_id: str, applicant_name: str) -> Dict:
+    """
+    登记新的 batch 提取任务（状态 submitting），实际提交由 submit_batch_extraction 在后台完成
+
+    已有未结束的任务时抛出 ValueError。
+    """
+    job = load_batch_job(project_id)
+    if job and (job["status"] == "submitted" or project_id in _active_batch_jobs):
+        raise ValueError(f"Batch extraction already in progress ({job['status']})")
+
+    _active_batch_jobs.add(project_id)
+    return _save_batch_job(project_id, {
+        "status": "submitting",
+        "applicant_name": applicant_name,
+        "exhibit_ids": list_exhibit_ids(project_id),
+        "batch_id": None,
+        "batch_status": None,
+        "request_counts": None,
+        "created_at": datetime.now().isoformat(),
+        "error": None,
+        "result": None
+    })
+
+
+async def submit_batch_extraction(project_id: str) -> Dict:
+    """准备请求并提交 OpenAI Batch（后台任务），记录 batch_id 后返回，不等待 batch 完成"""
+    job = load_batch_job(project_id)
+    try:
+        _, _, request_bodies = await _prepare_batch_requests(
+            project_id, job["exhibit_ids"], job["applicant_name"]
+        )
+        if request_bodies:
+            batch = await submit_openai_batch(request_bodies)
+            job.update(batch_id=batch["id"], batch_status=batch.get("status"))
+        job["status"] = "submitted"
+    except Exception as e:
+        print(f"[UnifiedExtractor] OpenAI batch submit failed for {project_id}: {e}")
+        job.update(status="failed", error=str(e))
+    finally:
+        _active_batch_jobs.discard(project_id)
+    return _save_batch_job(project_id, job)
+
+
+async def refresh_batch_extraction(project_id: str) -> Tuple[Optional[Dict], bool]:
+    """
+    查询一次 batch 状态并更新任务文件
+
+    Returns:
+        (job, should_collect)：batch 已结束（或无需提交）时任务转为 collecting，
+        should_collect 为 True，调用方应安排 collect_batch_extraction；每个任务只会返回一次 True
+    """
+    lock = _batch_job_locks.setdefault(project_id, asyncio.Lock())
+    async with lock:
+        job = load_batch_job(project_id)
+        if job is None:
+            return None, False
+
+        status = job["status"]
+        if status in ("submitting", "collecting") and project_id not in _active_batch_jobs:
+            # 进程在提交/收取中途重启：未提交成功的任务失败，收取中断的任务重新收取
+            if status == "submitting":
+                job.update(status="failed", error="Batch submission interrupted")
+                return _save_batch_job(project_id, job), False
+            _active_batch_jobs.add(project_id)
+            return job, True
+
+        if status != "submitted":
+            return job, False
+
+        if job["batch_id"]:
+            batch = await get_openai_batch(job["batch_id"])
+            job.update(batch_status=batch.get("status"), request_counts=batch.get("request_counts"))
+            if job["batch_status"] not in BATCH_TERMINAL_STATUSES:
+                return _save_batch_job(project_id, job), False
+
+        job["status"] = "collecting"
+        _active_batch_jobs.add(project_id)
+        return _save_batch_job(project_id, job), True
+
+
+async def collect_batch_extraction(project_id: str, progress_callback=None) -> Dict:
+    """
+    收取已结束 batch 的结果并完成整项目提取（后台任务）
+
+    结果写入缓存后逐个 exhibit 处理保存；batch 中失败或缺少结果的 exhibit 退回并发同步调用。
+    """
+    job = load_batch_job(project_id)
+    try:
+        exhibit_ids = job["exhibit_ids"]
+        applicant_name = job["applicant_name"]
+        prepared, batch_results, request_bodies = await _prepare_batch_requests(
+            project_id, exhibit_ids, applicant_name
+        )
+
+        if job["batch_id"] and request_bodies:
+            batch = await get_openai_batch(job["batch_id"])
+            try:
+                fetched = await fetch_openai_batch_results(batch)
+            except Exception as e:
+                print(f"[UnifiedExtractor] OpenAI batch output unavailable, falling back to direct calls: {e}")
+                fetched = {}
+            for exhibit_id, result in fetched.items():
+                # 被截断的结果交给下面的同步调用（会以更大的 max_tokens 重试）
+                if exhibit_id not in request_bodies or is_truncated_response(result):
+                    continue
+                request = _extraction_request("openai", prepared[exhibit_id])
+                await asyncio.to_thread(_save_cached_extraction, project_id, _extraction_cache_key(request), result)
+                batch_results[exhibit_id] = result
+
+        fallback_ids = [exhibit_id for exhibit_id in request_bodies if exhibit_id not in batch_results]
+        fallback_results = {}
+        if fallback_ids:
+            outcomes = await _extract_exhibits_concurrently(
+                project_id, fallback_ids, applicant_name, "openai", progress_callback
+            )
+            fallback_results = dict(zip(fallback_ids, outcomes))
+
+        results = []
+        for exhibit_id in exhibit_ids:
+            item = prepared[exhibit_id]
+            if exhibit_id in batch_results:
+                try:
+                    results.append(await asyncio.to_thread(
+                        _save_exhibit_extraction,
+                        project_id, exhibit_id, applicant_name, batch_results[exhibit_id], item["block_map"], True
+                    ))
+                except Exception as e:
+                    results.append(e)
+            elif exhibit_id in fallback_results:
+                results.append(fallback_results[exhibit_id])
+            else:
+                # 文档加载失败或内容不足
+                results.append(item)
+
+        job.update(
+            status="completed",
+            result=await _finalize_extraction(project_id, applicant_name, exhibit_ids, results, progress_callback)
+        )
+    except Exception as e:
+        print(f"[UnifiedExtractor] OpenAI batch collect failed for {project_id}: {e}")
+        job.update(status="failed", error=str(e))
+    finally:
+        _active_batch_jobs.discard(project_id)
+    return _save_batch_job(project_id, job)
+
+
+def _write_combined_extraction(
+    combined_file: Path,
+    snippets_file: Path,
+    combined_head: Dict,
+    extractions: List[Dict]
+) -> Dict:
+    """
+    流式写出合并结果与 snippets 文件，返回统计信息
+
+    extractions 为各 exhibit 带记录的提取结果（return_records=True），记录逐条序列化写出，
+    不再拼接整体列表。每个 exhibit 只处理一次：snippets 同时写入两个文件，entities / relations 先序列化到
+    临时文件，snippets 数组结束后再依次拷入合并结果。两个文件先写临时路径，完成后 os.replace。
+    """
+    combined_tmp = combined_file.with_name(f"{combined_file.name}.{uuid.uuid4().hex}.tmp")
+    snippets_tmp = snippets_file.with_name(f"{snippets_file.name}.{uuid.uuid4().hex}.tmp")
+    applicant_snippets = 0
+
+    try:
+        with open(combined_tmp, 'wb', buffering=STREAM_WRITE_BUFFER_SIZE) as combined_f, \
+                open(snippets_tmp, 'wb', buffering=STREAM_WRITE_BUFFER_SIZE) as snippets_f, \
+                tempfile.TemporaryFile(buffering=STREAM_WRITE_BUFFER_SIZE) as entities_spool, \
+                tempfile.TemporaryFile(buffering=STREAM_WRITE_BUFFER_SIZE) as relations_spool:
+            combined_f.write(b"{")
+            _write_json_fields(combined_f, combined_head, first_field=True)
+            combined_snippets = _JsonArrayWriter(combined_f, "snippets")
+
+            snippets_f.write(b"{")
+            _write_json_fields(snippets_f, {
+                "version": "4.0",
+                "extracted_at": datetime.now().isoformat(),
+                "extraction_method": "unified_extraction",
+                "model": getattr(settings, 'openai_model', 'gpt-4o')
+            }, first_field=True)
+            snippets_array = _JsonArrayWriter(snippets_f, "snippets")
+
+            entities_array = _JsonArrayWriter(entities_spool, "entities")
+            relations_array = _JsonArrayWriter(relations_spool, "relations")
+
+            for extraction_data in extractions:
+                for snippet in extraction_data["snippets"]:
+                    combined_snippets.write(snippet)
+                    snippets_array.write(snippet)
+                    if snippet.is_applicant_achievement:
+                        applicant_snippets += 1
+                for entity in extraction_data["entities"]:
+                    entities_array.write(entity)
+                for relation in extraction_data["relations"]:
+                    relations_array.write(relation)
+
+            combined_snippets.close()
+            for spool, array in ((entities_spool, entities_array), (relations_spool, relations_array)):
+                array.close()
+                spool.seek(0)
+                shutil.copyfileobj(spool, combined_f, STREAM_WRITE_BUFFER_SIZE)
+
+            stats = {
+                "total_snippets": combined_snippets.count,
+                "total_entities": entities_array.count,
+                "total_relations": relations_array.count,
+                "applicant_snippets": applicant_snippets,
+                "other_snippets": combined_snippets.count - applicant_snippets
+            }
+            _write_json_fields(combined_f, {"stats": stats})
+            combined_f.write(b"\n}")
+
+            snippets_array.close()
+            _write_json_fields(snippets_f, {"snippet_count": snippets_array.count})
+            snippets_f.write(b"\n}")
+
+        os.replace(combined_tmp, combined_file)
+        os.replace(snippets_tmp, snippets_file)
+    finally:
+        combined_tmp.unlink(missing_ok=True)
+        snippets_tmp.unlink(missing_ok=True)
+
+    return stats
+
+
+async def _finalize_extraction(
+    project_id: str,
+    applicant_name: str,
+    exhibit_ids: List[str],
+    results: List,
+    progress_callback=None
+) -> Dict:
+    """汇总各 exhibit 的提取结果（与 exhibit_ids 对应的结果或异常），写出合并结果并返回汇总"""
+    total_exhibits = len(exhibit_ids)
     successful = 0
     failed = 0
+    extracted = []
 
-    for idx, exhibit_file in enumerate(exhibit_files):
-        exhibit_id = exhibit_file.stem
-
-        if progress_callback:
-            progress_callback(idx, total_exhibits, f"Extracting {exhibit_id}...")
+    for exhibit_id, result in zip(exhibit_ids, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f"[UnifiedExtractor] Exception extracting {exhibit_id}: {result}")
+            continue
 
         try:
-            result = await extract_exhibit_unified(project_id, exhibit_id, applicant_name, provider=provider)
-
             if result.get("success"):
                 successful += 1
-
-                # 加载提取结果
-                extraction_file = get_extraction_dir(project_id) / f"{exhibit_id}_extraction.json"
-                if extraction_file.exists():
-                    with open(extraction_file, 'r', encoding='utf-8') as f:
-                        extraction_data = json.load(f)
-
-                    all_snippets.extend(extraction_data.get("snippets", []))
-                    all_entities.extend(extraction_data.get("entities", []))
-                    all_relations.extend(extraction_data.get("relations", []))
+                extracted.append(result)
             else:
                 failed += 1
                 print(f"[UnifiedExtractor] Failed to extract {exhibit_id}: {result.get('error')}")
@@ -842,68 +1522,84 @@ async def extract_all_unified(
     if progress_callback:
         progress_callback(total_exhibits, total_exhibits, "Saving combined results...")
 
-    # 保存合并后的结果
-    combined_result = {
-        "version": "4.0",
-        "extracted_at": datetime.now().isoformat(),
-        "applicant_name": applicant_name,
-        "exhibit_count": total_exhibits,
-        "successful": successful,
-        "failed": failed,
-
-        "snippets": all_snippets,
-        "entities": all_entities,
-        "relations": all_relations,
-
-        "stats": {
-            "total_snippets": len(all_snippets),
-            "total_entities": len(all_entities),
-            "total_relations": len(all_relations),
-            "applicant_snippets": sum(1 for s in all_snippets if s.get("is_applicant_achievement")),
-            "other_snippets": sum(1 for s in all_snippets if not s.get("is_applicant_achievement"))
-        }
-    }
-
-    # 保存合并结果
+    # 保存合并结果：直接使用各 exhibit 返回的记录流式写出（不再重读刚保存的文件）
     extraction_dir = get_extraction_dir(project_id)
-    combined_file = extraction_dir / "combined_extraction.json"
-    with open(combined_file, 'w', encoding='utf-8') as f:
-        json.dump(combined_result, f, ensure_ascii=False, indent=2)
-
-    # 同时保存到 snippets 目录（兼容现有代码）
     snippets_dir = PROJECTS_DIR / project_id / "snippets"
     snippets_dir.mkdir(parents=True, exist_ok=True)
-    snippets_file = snippets_dir / "extracted_snippets.json"
 
-    snippets_data = {
+    combined_head = {
         "version": "4.0",
         "extracted_at": datetime.now().isoformat(),
-        "snippet_count": len(all_snippets),
-        "extraction_method": "unified_extraction",
-        "model": getattr(settings, 'openai_model', 'gpt-4o'),
-        "snippets": all_snippets
+        "applicant_name": applicant_name,
+        "exhibit_count": total_exhibits,
+        "successful": successful,
+        "failed": failed
     }
+    stats = await asyncio.to_thread(
+        _write_combined_extraction,
+        extraction_dir / "combined_extraction.json",
+        # 同时保存到 snippets 目录（兼容现有代码）
+        snippets_dir / "extracted_snippets.json",
+        combined_head,
+        extracted
+    )
+    await asyncio.to_thread(save_combined_stats, project_id, {**combined_head, "stats": stats})
 
-    with open(snippets_file, 'w', encoding='utf-8') as f:
-        json.dump(snippets_data, f, ensure_ascii=False, indent=2)
-
-    print(f"[UnifiedExtractor] Complete: {successful}/{total_exhibits} exhibits, {len(all_snippets)} snippets, {len(all_entities)} entities")
+    print(f"[UnifiedExtractor] Complete: {successful}/{total_exhibits} exhibits, {stats['total_snippets']} snippets, {stats['total_entities']} entities")
 
     return {
         "success": True,
         "exhibit_count": total_exhibits,
         "successful": successful,
         "failed": failed,
-        **combined_result["stats"]
+        **stats
     }
 
 
+async def extract_all_unified(
+    project_id: str,
+    applicant_name: str,
+    provider: str = "deepseek",
+    progress_callback=None
+) -> Dict:
+    """
+    提取项目中所有 exhibits
+
+    （OpenAI Batch API 离线提取见 start_batch_extraction / submit_batch_extraction）
+
+    Args:
+        project_id: 项目 ID
+        applicant_name: 申请人姓名
+        provider: LLM 提供商 ("deepseek" 或 "openai")
+        progress_callback: 进度回调 (current, total, message)
+
+    Returns:
+        提取结果汇总
+    """
+    documents_dir = PROJECTS_DIR / project_id / "documents"
+
+    if not documents_dir.exists():
+        return {
+            "success": False,
+            "error": "Documents directory not found"
+        }
+
+    exhibit_ids = list_exhibit_ids(project_id)
+
+    print(f"[UnifiedExtractor] Starting extraction for {len(exhibit_ids)} exhibits, applicant: {applicant_name}")
+
+    # 所有 exhibit 并发提取，结果按原顺序汇总
+    results = await _extract_exhibits_concurrently(
+        project_id, exhibit_ids, applicant_name, provider, progress_callback
+    )
+    return await _finalize_extraction(project_id, applicant_name, exhibit_ids, results, progress_callback)
+
+
 def load_combined_extraction(project_id: str) -> Optional[Dict]:
     """加载合并后的提取结果"""
     combined_file = get_extraction_dir(project_id) / "combined_extraction.json"
     if combined_file.exists():
-        with open(combined_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _read_json(combined_file)
     return None
 
 
@@ -911,27 +1607,63 @@ def load_exhibit_extraction(project_id: str, exhibit_id: str) -> Optional[Dict]:
     """加载单个 exhibit 的提取结果"""
     extraction_file = get_extraction_dir(project_id) / f"{exhibit_id}_extraction.json"
     if extraction_file.exists():
-        with open(extraction_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _read_json(extraction_file)
     return None
 
 
-def get_extraction_status(project_id: str) -> Dict:
+def save_combined_stats(project_id: str, combined: Dict):
+    """写入合并结果的统计旁路文件（每次写 combined_extraction.json 之后调用）"""
+    stats_data = {
+        "extracted_at": combined.get("extracted_at"),
+        "exhibit_count": combined.get("exhibit_count"),
+        "successful": combined.get("successful"),
+        "failed": combined.get("failed"),
+        "stats": combined.get("stats")
+    }
+    _write_json(get_extraction_dir(project_id) / COMBINED_STATS_FILENAME, stats_data)
+
+
+def _load_combined_stats(project_id: str, combined_file: Path) -> Optional[Dict]:
+    """
+    读取合并结果的统计信息
+
+    旁路文件不存在或比合并结果旧（旧项目、或合并结果被其他路径改写）时，
+    回退读取完整的合并结果并重建旁路文件。
+    """
+    stats_file = combined_file.with_name(COMBINED_STATS_FILENAME)
+    try:
+        if stats_file.stat().st_mtime_ns >= combined_file.stat().st_mtime_ns:
+            return _read_json(stats_file).get("stats")
+    except (FileNotFoundError, ValueError):
+        pass
+
+    combined = _read_json(combined_file)
+    save_combined_stats(project_id, combined)
+    return combined.get("stats")
+
+
+def _scan_stems(directory: Path, pattern: str) -> Tuple[str, ...]:
+    """
+    扫描目录下匹配的文件名（每次都实际扫描：目录 mtime 在粗粒度时间戳的文件系统上
+    可能在增删文件后不变，不能作为缓存依据）
+    """
+    return tuple(f.stem for f in directory.glob(pattern))
+
+
+async def get_extraction_status(project_id: str) -> Dict:
     """获取提取状态"""
     extraction_dir = get_extraction_dir(project_id)
     documents_dir = PROJECTS_DIR / project_id / "documents"
 
-    # 统计已提取的 exhibits
-    extracted_exhibits = []
-    if extraction_dir.exists():
-        for f in extraction_dir.glob("*_extraction.json"):
-            exhibit_id = f.stem.replace("_extraction", "")
-            extracted_exhibits.append(exhibit_id)
+    # 两个目录的扫描在线程池中并发执行
+    extracted_stems, all_exhibits = await asyncio.gather(
+        asyncio.to_thread(_scan_stems, extraction_dir, "*_extraction.json"),
+        asyncio.to_thread(_scan_stems, documents_dir, "*.json")
+    )
 
-    # 统计所有 exhibits
-    all_exhibits = []
-    if documents_dir.exists():
-        all_exhibits = [f.stem for f in documents_dir.glob("*.json")]
+    # 统计已提取的 exhibits
+    extracted_exhibits = [stem.replace("_extraction", "") for stem in extracted_stems]
+    extracted_set = set(extracted_exhibits)
 
     # 检查合并结果
     combined_file = extraction_dir / "combined_extraction.json"
@@ -939,15 +1671,13 @@ def get_extraction_status(project_id: str) -> Dict:
 
     combined_stats = None
     if has_combined:
-        with open(combined_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            combined_stats = data.get("stats")
+        combined_stats = await asyncio.to_thread(_load_combined_stats, project_id, combined_file)
 
     return {
         "total_exhibits": len(all_exhibits),
         "extracted_exhibits": len(extracted_exhibits),
         "extracted_exhibit_ids": extracted_exhibits,
-        "pending_exhibits": [e for e in all_exhibits if e not in extracted_exhibits],
+        "pending_exhibits": [e for e in all_exhibits if e not in extracted_set],
         "has_combined_extraction": has_combined,
         "combined_stats": combined_stats
     }
@@ -1,38 +1,43 @@
 """同步 composed arguments 到 generated_arguments.json"""
 import json
+from itertools import chain
 from pathlib import Path
 from datetime import datetime
 from app.services.argument_composer import compose_project_arguments
 
+LAYERS = ('claim', 'proof', 'significance', 'context')
+
+
+def to_frontend_argument(standard, idx, arg):
+    """转换单个组合论据为前端格式（snippet_ids 去重并保持首次出现的顺序）"""
+    items = chain.from_iterable(arg.get(layer, ()) for layer in LAYERS)
+    completeness = arg.get('completeness', {})
+    return {
+        'id': f'{standard}_{idx}',
+        'title': arg.get('title', ''),
+        'subject': arg.get('group_key', ''),
+        'standard_key': standard,
+        'snippet_ids': list(dict.fromkeys(sid for item in items if (sid := item.get('snippet_id')))),
+        'exhibits': arg.get('exhibits', []),
+        'confidence': completeness.get('score', 0) / 100.0,
+        'is_ai_generated': True,
+        'created_at': datetime.now().isoformat(),
+        'layers': arg.get('layers', {}),
+        'conclusion': arg.get('conclusion', ''),
+        'completeness': completeness
+    }
+
+
 def main():
-    # 生成组合论据
+    # 生成组合论据（组合过程为纯 CPU 计算，各标准共用一次组合结果）
     result = compose_project_arguments('yaruo_qu', 'Ms. Yaruo Qu')
 
     # 转换成前端格式
-    arguments = []
-    for standard, args in result.get('composed', {}).items():
-        for idx, arg in enumerate(args):
-            arg_id = f'{standard}_{idx}'
-            snippet_ids = []
-            for layer in ['claim', 'proof', 'significance', 'context']:
-                for item in arg.get(layer, []):
-                    if item.get('snippet_id'):
-                        snippet_ids.append(item['snippet_id'])
-
-            arguments.append({
-                'id': arg_id,
-                'title': arg.get('title', ''),
-                'subject': arg.get('group_key', ''),
-                'standard_key': standard,
-                'snippet_ids': snippet_ids,
-                'exhibits': arg.get('exhibits', []),
-                'confidence': arg.get('completeness', {}).get('score', 0) / 100.0,
-                'is_ai_generated': True,
-                'created_at': datetime.now().isoformat(),
-                'layers': arg.get('layers', {}),
-                'conclusion': arg.get('conclusion', ''),
-                'completeness': arg.get('completeness', {})
-            })
+    arguments = [
+        to_frontend_argument(standard, idx, arg)
+        for standard, args in result.get('composed', {}).items()
+        for idx, arg in enumerate(args)
+    ]
 
     output = {
         'project_id': 'yaruo_qu',
@@ -0,0 +1,31 @@
+"""llm_client.extract_json 的截断检测"""
+
+from app.services.llm_client import extract_json, is_truncated_response
+
+
+def test_complete_json_with_trailing_text_is_not_truncated():
+    result = extract_json('{"a": 1}\n\nNote: done')
+
+    assert result == {"a": 1}
+    assert not is_truncated_response(result)
+
+
+def test_truncated_json_object_is_repaired_and_marked():
+    result = extract_json('{"a": [1, 2], "b": {"c": ')
+
+    assert result["a"] == [1, 2]
+    assert is_truncated_response(result)
+
+
+def test_truncated_json_array_is_repaired_and_marked():
+    result = extract_json('[{"a": 1}, {"b": ')
+
+    assert result == [{"a": 1}]
+    assert is_truncated_response(result)
+
+
+def test_complete_json_array_is_not_truncated():
+    result = extract_json('[{"a": 1}]\n\nDone.')
+
+    assert result == [{"a": 1}]
+    assert not is_truncated_response(result)
@@ -0,0 +1,29 @@
+"""relationship_analyzer 实体名称别名匹配"""
+
+from app.services.relationship_analyzer import _EntityNameIndex, _normalize_name
+
+
+def _index(*names):
+    index = _EntityNameIndex()
+    for name in names:
+        index.add(_normalize_name(name))
+    return index
+
+
+def test_reordered_name_with_initial_matches():
+    index = _index("Smith, John")
+
+    assert index.find(_normalize_name("John A. Smith")) == "smith john"
+
+
+def test_distinct_entity_sharing_a_word_does_not_match():
+    index = _index("Smith")
+
+    assert index.find(_normalize_name("Smith Corp")) is None
+
+
+def test_exact_match_and_earliest_key_win():
+    index = _index("John Smith", "Smith John")
+
+    assert index.find("smith john") == "smith john"
+    assert index.find("john a smith") == "john smith"